@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Structured access log for the Python servers
+One JSON object per request (request id, route, status, bytes, duration),
+handed to a background thread through a queue so a slow terminal or disk
+never holds up a response. The file can rotate by size or by time, and
+successful static-file hits can be sampled to keep busy logs small.
+
+Worker processes forked after configure_access_log() each start their own
+writer thread; when writing to a file they append to <path>.<pid> so two
+processes never rotate the same file.
+"""
+
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024   # rotate after 50 MB (0 = never by size)
+DEFAULT_BACKUPS = 5
+ROTATE_WHEN = ('midnight', 'H', 'D', 'W0', 'W1', 'W2', 'W3', 'W4', 'W5', 'W6')
+
+# A client-supplied X-Request-Id is reused when it looks like an id
+VALID_REQUEST_ID = re.compile(r'^[\w.:-]{1,64}$')
+
+class JSONLineFormatter(logging.Formatter):
+    """Format a record's access fields as one JSON line"""
+
+    def format(self, record):
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                         + f'.{int(record.msecs):03d}Z'}
+        entry.update(record.access)
+        return json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+
+# Process-wide settings (see configure_access_log)
+_settings = None
+_settings_pid = None
+_logger = logging.getLogger('peppertree.access')
+_logger.propagate = False
+_listener = None
+_listener_pid = None
+_lock = threading.Lock()
+_ids = itertools.count(1)
+
+def configure_access_log(path=None, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS,
+                         when=None, static_sample=1.0, enabled=True):
+    """Log requests to path (None = stderr); rotate by size, or at when if given"""
+    global _settings, _settings_pid
+    close_access_log()
+    _settings = {'path': path, 'max_bytes': max_bytes, 'backups': backups, 'when': when,
+                 'static_sample': static_sample} if enabled else None
+    _settings_pid = os.getpid()
+
+def _open_handler():
+    """The handler the writer thread of this process writes through"""
+    path = _settings['path']
+    if path is None:
+        return logging.StreamHandler(sys.stderr)
+    if os.getpid() != _settings_pid:
+        path = f"{path}.{os.getpid()}"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if _settings['when']:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=_settings['when'], backupCount=_settings['backups'],
+            encoding='utf-8', utc=True)
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=_settings['max_bytes'], backupCount=_settings['backups'],
+        encoding='utf-8')
+
+def _start_listener():
+    """Start this process's writer thread on first use"""
+    global _listener, _listener_pid
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        handler = _open_handler()
+        handler.setFormatter(JSONLineFormatter())
+        records = queue.SimpleQueue()
+        for old in list(_logger.handlers):
+            _logger.removeHandler(old)
+        _logger.addHandler(logging.handlers.QueueHandler(records))
+        _logger.setLevel(logging.INFO)
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+def close_access_log():
+    """Write out queued entries and close the log file"""
+    global _listener, _listener_pid
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = None
+        _listener_pid = None
+
+def request_id(supplied=None):
+    """The client's X-Request-Id if usable, else a new id unique to this process"""
+    if supplied and VALID_REQUEST_ID.match(supplied):
+        return supplied
+    return f"{os.getpid():x}-{next(_ids):x}"
+
+def log_request(request_id, client, method, path, route, status, body_bytes, duration):
+    """Queue one access log entry"""
+    if _settings is None:
+        return
+    sample = _settings['static_sample']
+    if route == 'static' and status is not None and status < 400 and sample < 1.0:
+        if random.random() >= sample:
+            return
+    else:
+        sample = 1.0
+    if _listener_pid != os.getpid():
+        _start_listener()
+    entry = {'request_id': request_id, 'client': client, 'method': method, 'path': path,
+             'route': route, 'status': status, 'bytes': body_bytes,
+             'duration_ms': round(duration * 1000, 3)}
+    if sample < 1.0:
+        entry['sample'] = sample
+    _logger.info('', extra={'access': entry})
+
+def add_access_log_arguments(parser):
+    """Add the access log options shared by the servers to an argparse parser"""
+    group = parser.add_argument_group('access log')
+    group.add_argument('--access-log', default=None,
+                       help="JSON lines access log file (default: stderr)")
+    group.add_argument('--no-access-log', dest='access_log_enabled', action='store_false',
+                       help="Don't log requests")
+    group.add_argument('--access-log-max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                       help=f"Rotate the log file at this size, 0 = never "
+                            f"(default: {DEFAULT_MAX_BYTES})")
+    group.add_argument('--access-log-rotate', choices=ROTATE_WHEN, default=None,
+                       help="Rotate on a schedule instead of by size")
+    group.add_argument('--access-log-backups', type=int, default=DEFAULT_BACKUPS,
+                       help=f"Rotated files kept (default: {DEFAULT_BACKUPS})")
+    group.add_argument('--access-log-static-sample', type=float, default=1.0,
+                       help="Fraction of successful static-file requests logged; errors and "
+                            "API requests are always logged (default: 1.0)")
+
+def configure_access_log_from_args(args):
+    """configure_access_log() for parsed arguments"""
+    configure_access_log(args.access_log, args.access_log_max_bytes, args.access_log_backups,
+                         args.access_log_rotate, args.access_log_static_sample,
+                         args.access_log_enabled)
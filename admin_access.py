@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Access control for the admin-only JSON endpoints
+Applications hold personal data, so the API answers loopback clients only
+unless an admin token is configured, in which case the token is required
+"""
+
+import hmac
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1', '::ffff:127.0.0.1')
+
+# Set from the --admin-token command line option
+ADMIN_TOKEN = None
+
+def configure_admin_token(token):
+    """Require this token on admin endpoints (None = loopback only)"""
+    global ADMIN_TOKEN
+    ADMIN_TOKEN = token or None
+
+def is_admin_request(client_ip, supplied_token):
+    """Whether a request may use the admin endpoints"""
+    if ADMIN_TOKEN is None:
+        return client_ip in LOOPBACK_ADDRESSES
+    # compare_digest only takes ASCII str, so compare the UTF-8 bytes
+    return bool(supplied_token) and hmac.compare_digest(supplied_token.encode('utf-8'),
+                                                        ADMIN_TOKEN.encode('utf-8'))
+
+def add_admin_arguments(parser):
+    """Add the --admin-token option to an argparse parser"""
+    parser.add_argument('--admin-token', default=None,
+                        help="Token required (X-Admin-Token header or ?token=) on admin "
+                             "endpoints; without it they only answer localhost")
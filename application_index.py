@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+SQLite index of submitted applications and tour appointments
+Keeps the admin list fields in a WAL-mode database updated at write time,
+so listing applications no longer reads every file in applications/, plus
+an FTS5 full-text index for searching names, addresses, employers and
+landlords. index_watcher.py keeps it current for files written elsewhere.
+
+Run directly to rebuild the index from the JSON files:
+    python3 application_index.py rebuild
+"""
+
+import argparse
+import base64
+import contextlib
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from application_store import SUBMISSIONS_DIR
+
+INDEX_PATH = os.path.join(SUBMISSIONS_DIR, "index.sqlite3")
+APPOINTMENTS_DIR = "appointments"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# JSON field -> index column, in the order the admin list shows them
+LIST_FIELDS = (
+    ('filename', 'filename'),
+    ('submittedAt', 'submitted_at'),
+    ('firstName', 'first_name'),
+    ('lastName', 'last_name'),
+    ('email', 'email'),
+    ('cellPhone', 'cell_phone'),
+    ('homePhone', 'home_phone'),
+    ('desiredMoveIn', 'desired_move_in'),
+)
+
+FIELD_COLUMNS = dict(LIST_FIELDS)
+
+# Bump when the table layout or the indexed values change; the index is
+# derived data, so an old layout is dropped and backfilled from the JSON files
+SCHEMA_VERSION = 5
+
+# FTS5 column -> JSON fields folded into it; the column names double as
+# the search endpoint's optional field filter
+SEARCH_COLUMNS = (
+    ('names', ('firstName', 'middleName', 'lastName', 'occupant1Name', 'occupant2Name',
+               'occupant3Name', 'occupant4Name', 'emergencyName')),
+    ('addresses', ('presentAddress', 'currentCity', 'currentState', 'currentZip',
+                   'previousAddress', 'prevCity', 'prevState', 'prevZip', 'emergencyAddress')),
+    ('employment', ('currentEmployer', 'position', 'supervisorName', 'employerAddress')),
+    ('landlords', ('managementName', 'prevManagementName')),
+    ('references', ('ref1Name', 'ref2Name', 'ref3Name')),
+    ('contact', ('email', 'cellPhone', 'homePhone', 'emergencyPhone', 'managementPhone',
+                 'prevManagementPhone', 'employerPhone')),
+    ('vehicles', ('vehicle1Make', 'vehicle1Model', 'vehicle1License',
+                  'vehicle2Make', 'vehicle2Model', 'vehicle2License')),
+)
+
+SEARCH_NAMES = tuple(column for column, _ in SEARCH_COLUMNS)
+
+# Relative bm25 weights: a hit on a name outranks one in a vehicle model
+SEARCH_WEIGHTS = {'names': 10.0, 'landlords': 5.0, 'employment': 5.0, 'references': 3.0,
+                  'addresses': 3.0, 'contact': 2.0, 'vehicles': 1.0}
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+MAX_SEARCH_TERMS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    filename TEXT PRIMARY KEY,
+    submitted_at TEXT NOT NULL DEFAULT '',
+    first_name TEXT NOT NULL DEFAULT '',
+    last_name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    cell_phone TEXT NOT NULL DEFAULT '',
+    home_phone TEXT NOT NULL DEFAULT '',
+    desired_move_in TEXT NOT NULL DEFAULT '',
+    cell_digits TEXT NOT NULL DEFAULT '',
+    home_digits TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS applications_by_date
+    ON applications (submitted_at DESC, filename DESC);
+CREATE INDEX IF NOT EXISTS applications_by_first_name
+    ON applications (first_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS applications_by_last_name
+    ON applications (last_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS applications_by_email
+    ON applications (email COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS applications_by_cell ON applications (cell_digits);
+CREATE INDEX IF NOT EXISTS applications_by_home ON applications (home_digits);
+CREATE INDEX IF NOT EXISTS applications_by_move_in ON applications (desired_move_in);
+CREATE VIRTUAL TABLE IF NOT EXISTS application_search USING fts5 (
+    filename UNINDEXED,
+    %s,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    filename TEXT PRIMARY KEY,
+    id TEXT NOT NULL DEFAULT '',
+    submitted_at TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    unit TEXT NOT NULL DEFAULT '',
+    unit_text TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    time_slots TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS appointments_by_date ON appointments (submitted_at DESC);
+CREATE INDEX IF NOT EXISTS appointments_by_status ON appointments (status);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (kind, filename)
+) WITHOUT ROWID;
+""" % ',\n    '.join(f'"{column}"' for column in SEARCH_NAMES)
+
+class QueryError(ValueError):
+    """A listing request has an invalid parameter"""
+
+def digits(value):
+    """Phone number reduced to its digits for matching"""
+    return re.sub(r'\D', '', value)
+
+def list_row(filename, application):
+    """Index column values for an application, as the PHP list reads them"""
+    row = {'filename': filename}
+    for field, column in LIST_FIELDS[1:]:
+        value = application.get(field)
+        if field == 'submittedAt' and not value:
+            value = application.get('submissionDate')
+        elif field == 'desiredMoveIn' and not value:
+            # The rental application form names it moveInDate
+            value = application.get('moveInDate')
+        row[column] = '' if value is None else str(value)
+    row['cell_digits'] = digits(row['cell_phone'])
+    row['home_digits'] = digits(row['home_phone'])
+    return row
+
+DERIVED_TABLES = ('applications', 'application_search', 'appointments', 'indexed_files')
+
+# Appointment list fields, as list_appointments.php returns them
+APPOINTMENT_FIELDS = ('id', 'submitted_at', 'name', 'email', 'phone', 'unit', 'unit_text',
+                      'time_slots')
+
+def appointment_row(filename, appointment):
+    """Index column values for a tour appointment written by schedule-handler.php"""
+    contact = appointment.get('contact') or {}
+    tour = appointment.get('tour_details') or {}
+    default_id = re.sub(r'^apt_', '', os.path.splitext(filename)[0])
+    row = {
+        'filename': filename,
+        'id': appointment.get('id') or default_id,
+        'submitted_at': appointment.get('submitted_at'),
+        'name': contact.get('name'),
+        'email': contact.get('email'),
+        'phone': contact.get('phone'),
+        'unit': tour.get('unit'),
+        'unit_text': tour.get('unit_text'),
+        'status': appointment.get('status'),
+    }
+    row = {column: '' if value is None else str(value) for column, value in row.items()}
+    row['time_slots'] = json.dumps(appointment.get('time_slots') or [])
+    return row
+
+def search_row(filename, application):
+    """FTS column text for an application, one space-joined string per column"""
+    row = {'filename': filename}
+    for column, fields in SEARCH_COLUMNS:
+        row[column] = ' '.join(str(application[f]) for f in fields
+                               if application.get(f) not in (None, ''))
+    return row
+
+SEARCH_TERM = re.compile(r'\w+')
+
+def search_expression(text):
+    """Turn free text into an FTS5 query: every word must match as a prefix
+
+    Words are quoted so user input can't use FTS5 operators or column
+    filters; phone numbers match by their digit groups.
+    """
+    terms = SEARCH_TERM.findall(text)[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise QueryError("Search text must contain letters or digits")
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the row after which the next page starts"""
+    raw = json.dumps([row['submitted_at'], row['filename']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        submitted_at, filename = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError):
+        raise QueryError("Invalid cursor")
+    if not isinstance(submitted_at, str) or not isinstance(filename, str):
+        raise QueryError("Invalid cursor")
+    return submitted_at, filename
+
+def escape_like(value):
+    """Escape LIKE wildcards in a user-supplied prefix"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class ApplicationIndex:
+    """WAL-mode SQLite index of the admin list fields
+
+    Connections are opened per thread (and per process after a fork);
+    writes are single upserts so concurrent submissions never block readers.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.connection()
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for table in DERIVED_TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def connection(self):
+        """This thread's connection to the index"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run a block of writes atomically; nested blocks join the outer one"""
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _write(self, conn, filename, application):
+        """Upsert the list row and replace the search row"""
+        row = list_row(filename, application)
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{c}' for c in row)
+        updates = ', '.join(f'{c} = excluded.{c}' for c in row if c != 'filename')
+        conn.execute(
+            f"INSERT INTO applications ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(filename) DO UPDATE SET {updates}", row)
+
+        row = search_row(filename, application)
+        columns = ', '.join(f'"{c}"' for c in row)
+        placeholders = ', '.join(f':{c}' for c in row)
+        conn.execute("DELETE FROM application_search WHERE filename = ?", (filename,))
+        conn.execute(f"INSERT INTO application_search ({columns}) VALUES ({placeholders})", row)
+
+    def add(self, filename, application):
+        """Insert or update one application"""
+        with self.transaction() as conn:
+            self._write(conn, filename, application)
+
+    def remove(self, filename):
+        """Drop one application from the index"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM applications WHERE filename = ?", (filename,))
+            conn.execute("DELETE FROM application_search WHERE filename = ?", (filename,))
+
+    def add_appointment(self, filename, appointment):
+        """Insert or update one tour appointment"""
+        row = appointment_row(filename, appointment)
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{c}' for c in row)
+        self.connection().execute(
+            f"INSERT OR REPLACE INTO appointments ({columns}) VALUES ({placeholders})", row)
+
+    def remove_appointment(self, filename):
+        """Drop one tour appointment from the index"""
+        self.connection().execute("DELETE FROM appointments WHERE filename = ?", (filename,))
+
+    def list_appointments(self):
+        """Every appointment, newest first, in list_appointments.php's shape"""
+        rows = self.connection().execute(
+            f"SELECT {', '.join(APPOINTMENT_FIELDS)} FROM appointments "
+            f"ORDER BY submitted_at DESC").fetchall()
+        appointments = []
+        for row in rows:
+            appointment = dict(row)
+            appointment['time_slots'] = json.loads(appointment['time_slots'])
+            appointments.append(appointment)
+        return appointments
+
+    def file_states(self, kind):
+        """{filename: (mtime_ns, size)} as of each file's last indexing"""
+        rows = self.connection().execute(
+            "SELECT filename, mtime_ns, size FROM indexed_files WHERE kind = ?", (kind,))
+        return {filename: (mtime_ns, size) for filename, mtime_ns, size in rows}
+
+    def record_file(self, kind, filename, state):
+        """Remember the (mtime_ns, size) a file had when it was indexed"""
+        self.connection().execute(
+            "INSERT OR REPLACE INTO indexed_files (kind, filename, mtime_ns, size) "
+            "VALUES (?, ?, ?, ?)", (kind, filename) + tuple(state))
+
+    def forget_file(self, kind, filename):
+        """Drop a deleted file's recorded state"""
+        self.connection().execute(
+            "DELETE FROM indexed_files WHERE kind = ? AND filename = ?", (kind, filename))
+
+    def summary(self):
+        """Counts for the admin dashboard"""
+        conn = self.connection()
+        by_month = conn.execute(
+            "SELECT substr(submitted_at, 1, 7) AS month, COUNT(*) FROM applications "
+            "GROUP BY month ORDER BY month DESC").fetchall()
+        by_status = conn.execute(
+            "SELECT status, COUNT(*) FROM appointments GROUP BY status").fetchall()
+        return {
+            'applications': self.count(),
+            'applications_by_month': {month: n for month, n in by_month},
+            'appointments': sum(n for _, n in by_status),
+            'appointments_by_status': {status or 'unknown': n for status, n in by_status},
+        }
+
+    def count(self):
+        """Number of indexed applications"""
+        return self.connection().execute("SELECT COUNT(*) FROM applications").fetchone()[0]
+
+    def list_page(self, limit=DEFAULT_PAGE_SIZE, offset=0):
+        """One page of applications, newest first"""
+        columns = ', '.join(column for _, column in LIST_FIELDS)
+        rows = self.connection().execute(
+            f"SELECT {columns} FROM applications "
+            f"ORDER BY submitted_at DESC, filename DESC LIMIT ? OFFSET ?",
+            (limit, offset)).fetchall()
+        return [{field: row[column] for field, column in LIST_FIELDS} for row in rows]
+
+    def query(self, limit=DEFAULT_PAGE_SIZE, cursor=None, name=None, email=None, phone=None,
+              move_in_from=None, move_in_to=None, fields=None):
+        """Keyset-paginated, filtered listing, newest first
+
+        Returns (rows, next_cursor). Each page is an index range scan that
+        starts at the cursor, so its cost doesn't grow with the archive.
+        """
+        where = []
+        params = []
+        if cursor:
+            where.append("(submitted_at, filename) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        if name:
+            where.append("(first_name LIKE ? ESCAPE '\\' OR last_name LIKE ? ESCAPE '\\')")
+            prefix = escape_like(name) + '%'
+            params.extend([prefix, prefix])
+        if email:
+            where.append("email LIKE ? ESCAPE '\\'")
+            params.append(escape_like(email) + '%')
+        if phone:
+            phone_digits = digits(phone)
+            if not phone_digits:
+                raise QueryError("Phone filter must contain digits")
+            # Digit-prefix match as an index range (':' sorts right after '9')
+            where.append("((cell_digits >= ? AND cell_digits < ?) "
+                         "OR (home_digits >= ? AND home_digits < ?))")
+            params.extend([phone_digits, phone_digits + ':'] * 2)
+        if move_in_from:
+            where.append("desired_move_in >= ?")
+            params.append(move_in_from)
+        if move_in_to:
+            where.append("desired_move_in != '' AND desired_move_in <= ?")
+            params.append(move_in_to)
+
+        fields = list(fields or FIELD_COLUMNS)
+        # The keyset columns are always read to build the next cursor
+        columns = dict.fromkeys([FIELD_COLUMNS[f] for f in fields] + ['submitted_at', 'filename'])
+        sql = f"SELECT {', '.join(columns)} FROM applications"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY submitted_at DESC, filename DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self.connection().execute(sql, params).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [{f: row[FIELD_COLUMNS[f]] for f in fields} for row in rows[:limit]], next_cursor
+
+    def search(self, text, limit=DEFAULT_SEARCH_LIMIT, columns=None):
+        """Ranked full-text hits for text, best first
+
+        Each hit carries the list fields, the bm25 score and a highlighted
+        snippet from whichever column matched best. columns restricts the
+        search to some of SEARCH_NAMES.
+        """
+        match = search_expression(text)
+        if columns:
+            match = '{%s} : (%s)' % (' '.join(columns), match)
+        weights = ', '.join(str(SEARCH_WEIGHTS[c]) for c in SEARCH_NAMES)
+        list_columns = ', '.join(f'a.{column}' for _, column in LIST_FIELDS)
+        rows = self.connection().execute(
+            f"SELECT {list_columns}, bm25(application_search, 0, {weights}) AS score, "
+            f"snippet(application_search, -1, '[', ']', '…', 8) AS snippet "
+            f"FROM application_search JOIN applications a USING (filename) "
+            f"WHERE application_search MATCH ? ORDER BY score LIMIT ?",
+            (match, limit)).fetchall()
+        hits = []
+        for row in rows:
+            hit = {field: row[column] for field, column in LIST_FIELDS}
+            hit['score'] = round(-row['score'], 4)
+            hit['snippet'] = row['snippet']
+            hits.append(hit)
+        return hits
+
+    def rebuild(self, directory=SUBMISSIONS_DIR):
+        """Replace the index contents with the JSON files in directory"""
+        indexed = 0
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM applications")
+            conn.execute("DELETE FROM application_search")
+            conn.execute("DELETE FROM indexed_files WHERE kind = 'applications'")
+            for filepath in glob.glob(os.path.join(directory, '*.json')):
+                try:
+                    with open(filepath) as f:
+                        st = os.fstat(f.fileno())
+                        application = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Skipping {filepath}: {e}")
+                    continue
+                if isinstance(application, dict):
+                    filename = os.path.basename(filepath)
+                    self._write(conn, filename, application)
+                    self.record_file('applications', filename, (st.st_mtime_ns, st.st_size))
+                    indexed += 1
+        return indexed
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+def parse_int(value, default, minimum, maximum):
+    """Parse a query parameter into a clamped int"""
+    try:
+        return max(minimum, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+DATE_PARAM = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def list_applications_response(index, query):
+    """Build the /api/applications JSON body from parsed query parameters
+
+    Keyset mode (default): limit, cursor, name, email, phone, move_in_from,
+    move_in_to and fields=a,b,c; the reply carries next_cursor.
+    Page mode (page=N): the original offset pagination with a total count.
+    Raises QueryError for invalid parameters.
+    """
+    def param(name):
+        return query.get(name, [None])[0]
+
+    limit = parse_int(param('limit') or param('per_page'), DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+
+    if param('page') is not None:
+        page = parse_int(param('page'), 1, 1, 10 ** 9)
+        return {
+            'success': True,
+            'applications': index.list_page(limit, (page - 1) * limit),
+            'count': index.count(),
+            'page': page,
+            'per_page': limit,
+        }
+
+    fields = None
+    if param('fields'):
+        fields = [f.strip() for f in param('fields').split(',') if f.strip()]
+        unknown = [f for f in fields if f not in FIELD_COLUMNS]
+        if unknown:
+            raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    for name in ('move_in_from', 'move_in_to'):
+        if param(name) and not DATE_PARAM.match(param(name)):
+            raise QueryError(f"{name} must be YYYY-MM-DD")
+
+    applications, next_cursor = index.query(
+        limit, param('cursor'), param('name'), param('email'), param('phone'),
+        param('move_in_from'), param('move_in_to'), fields)
+    return {
+        'success': True,
+        'applications': applications,
+        'next_cursor': next_cursor,
+        'limit': limit,
+    }
+
+def search_applications_response(index, query):
+    """Build the /api/applications/search JSON body
+
+    q is free text (every word must match, as a prefix), limit caps the
+    hits and in=names,landlords restricts which columns are searched.
+    Raises QueryError for invalid parameters.
+    """
+    def param(name):
+        return query.get(name, [None])[0]
+
+    text = (param('q') or '').strip()
+    if not text:
+        raise QueryError("Missing search text (q=)")
+    limit = parse_int(param('limit'), DEFAULT_SEARCH_LIMIT, 1, MAX_SEARCH_LIMIT)
+    columns = None
+    if param('in'):
+        columns = [c.strip() for c in param('in').split(',') if c.strip()]
+        unknown = [c for c in columns if c not in SEARCH_NAMES]
+        if unknown:
+            raise QueryError(f"Unknown search columns: {', '.join(unknown)}")
+
+    return {
+        'success': True,
+        'query': text,
+        'applications': index.search(text, limit, columns),
+        'limit': limit,
+    }
+
+def list_appointments_response(index, query):
+    """Build the /api/appointments JSON body (same shape as list_appointments.php)"""
+    appointments = index.list_appointments()
+    return {'success': True, 'appointments': appointments, 'count': len(appointments)}
+
+def summary_response(index, query):
+    """Build the /api/summary JSON body"""
+    return dict(index.summary(), success=True)
+
+# Admin JSON endpoints answered from the index, shared by both server engines
+INDEX_ENDPOINTS = {
+    '/api/applications': list_applications_response,
+    '/api/applications/search': search_applications_response,
+    '/api/appointments': list_appointments_response,
+    '/api/summary': summary_response,
+}
+
+def add_index_arguments(parser):
+    """Add the index options shared by the servers to an argparse parser"""
+    group = parser.add_argument_group('index')
+    group.add_argument('--index-path', default=INDEX_PATH,
+                       help=f"SQLite application index (default: {INDEX_PATH})")
+    group.add_argument('--no-index', dest='index', action='store_false',
+                       help="Don't maintain the application index")
+    group.add_argument('--watch-index', action='store_true',
+                       help="Also index JSON files written by other processes (PHP handlers) "
+                            "by watching applications/ and appointments/")
+    group.add_argument('--watch-poll', action='store_true',
+                       help="Poll instead of using inotify for --watch-index")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Application index maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = subparsers.add_parser('rebuild', help="Re-index every JSON application file")
+    rebuild_parser.add_argument('--index', default=INDEX_PATH)
+    rebuild_parser.add_argument('--directory', default=SUBMISSIONS_DIR)
+    args = parser.parse_args()
+    count = ApplicationIndex(args.index).rebuild(args.directory)
+    print(f"✅ Indexed {count} applications into {args.index}")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Storage backends for submitted rental applications
+
+files - one pretty-printed JSON file per application in applications/
+        (the original layout read by the PHP admin pages)
+log   - append-only segmented log of length-prefixed, CRC-checked records
+        with group-commit fsync; export/compact turns it back into files
+
+Run directly to export the log:
+    python3 application_store.py export [--compact]
+"""
+
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+SUBMISSIONS_DIR = "applications"
+LOG_DIR = os.path.join(SUBMISSIONS_DIR, "log")
+
+STORAGE_BACKENDS = ('files', 'log')
+DEFAULT_BACKEND = 'files'
+DEFAULT_COMMIT_INTERVAL = 0.005             # seconds a commit batch stays open
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+SEGMENT_MAGIC = b'PTAPPLOG1\n'
+RECORD_HEADER = struct.Struct('>II')        # payload length, crc32(payload)
+ACTIVE_SUFFIX = '.open'
+SEALED_SUFFIX = '.log'
+RECENT_NAMES = 4096                         # filenames remembered for uniqueness
+
+class StoreError(Exception):
+    """A storage backend failed to persist an application"""
+
+def write_json_file(directory, filename, application_data, fsync=False):
+    """Create a new JSON file, adding _2, _3... if the name is taken; return its name"""
+    stem, ext = os.path.splitext(filename)
+    candidate = filename
+    counter = 1
+    while True:
+        filepath = os.path.join(directory, candidate)
+        try:
+            f = open(filepath, 'x')
+        except FileExistsError:
+            counter += 1
+            candidate = f"{stem}_{counter}{ext}"
+            continue
+        with f:
+            json.dump(application_data, f, indent=2)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        return candidate
+
+def find_json_file(directory, filename, application_data):
+    """Name of an existing file write_json_file() wrote application_data to, if any
+
+    Checks filename and the _2, _3... names it falls back to.
+    """
+    stem, ext = os.path.splitext(filename)
+    candidate = filename
+    counter = 1
+    while os.path.exists(os.path.join(directory, candidate)):
+        try:
+            with open(os.path.join(directory, candidate)) as f:
+                if json.load(f) == application_data:
+                    return candidate
+        except (OSError, ValueError):
+            pass
+        counter += 1
+        candidate = f"{stem}_{counter}{ext}"
+    return None
+
+class FileStore:
+    """One JSON file per application"""
+
+    def __init__(self, directory=SUBMISSIONS_DIR, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, filename, application_data):
+        """Write the application; return the filename actually used"""
+        return write_json_file(self.directory, filename, application_data, self.fsync)
+
+    def save_batch(self, items, fsync=None):
+        """Write several (filename, application) pairs; return the names used
+
+        With fsync the files are flushed after all of them are written and
+        the directory is synced once, so the batch shares one metadata flush.
+        """
+        fsync = self.fsync if fsync is None else fsync
+        filenames = [write_json_file(self.directory, filename, application_data)
+                     for filename, application_data in items]
+        if fsync:
+            for filename in filenames:
+                fd = os.open(os.path.join(self.directory, filename), os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return filenames
+
+    def close(self):
+        pass
+
+class LogStore:
+    """Append-only segmented application log with group commit
+
+    Each process appends to its own segment, so pre-forked workers never
+    share a file. save() returns once a background committer has fsynced
+    the batch containing the record; every submission that arrives during
+    one commit interval shares a single fsync.
+    """
+
+    def __init__(self, directory=LOG_DIR, commit_interval=DEFAULT_COMMIT_INTERVAL,
+                 segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._appended = 0
+        self._durable = 0
+        self._error = None
+        self._closed = False
+        self._recent_names = OrderedDict()
+        self._segment = None
+        self._segment_path = None
+        self._sequence = 0
+        self._open_segment()
+
+        self._committer = threading.Thread(target=self._commit_loop, name='app-log-commit',
+                                           daemon=True)
+        self._committer.start()
+
+    def _open_segment(self):
+        """Start a new active segment for this process"""
+        self._sequence += 1
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-{self._sequence:04d}"
+        self._segment_path = os.path.join(self.directory, name + ACTIVE_SUFFIX)
+        self._segment = open(self._segment_path, 'xb')
+        self._segment.write(SEGMENT_MAGIC)
+
+    def _seal_segment(self):
+        """fsync and close the active segment and mark it sealed"""
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._segment.close()
+        os.replace(self._segment_path, self._segment_path[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIX)
+        self._segment = None
+
+    def _unique_name(self, filename):
+        """Avoid handing out a recently used filename twice
+
+        Names are per-second, so pre-forked workers could pick the same one;
+        the pid keeps them apart, and _recent_names does within this process.
+        """
+        stem, ext = os.path.splitext(filename)
+        stem = f"{stem}_{os.getpid()}"
+        candidate = stem + ext
+        counter = 1
+        while candidate in self._recent_names:
+            counter += 1
+            candidate = f"{stem}_{counter}{ext}"
+        self._recent_names[candidate] = None
+        if len(self._recent_names) > RECENT_NAMES:
+            self._recent_names.popitem(last=False)
+        return candidate
+
+    def save(self, filename, application_data):
+        """Append the application and wait until it is durable"""
+        return self.save_batch([(filename, application_data)])[0]
+
+    def save_batch(self, items, fsync=None):
+        """Append several applications and wait until all are durable
+
+        Records are always committed before returning, so fsync is ignored.
+        """
+        with self._lock:
+            if self._closed:
+                raise StoreError("Application log is closed")
+            filenames = []
+            for filename, application_data in items:
+                filename = self._unique_name(filename)
+                payload = json.dumps({'filename': filename, 'application': application_data},
+                                     separators=(',', ':')).encode('utf-8')
+                self._segment.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+                self._segment.write(payload)
+                self._appended += 1
+                filenames.append(filename)
+                if self._segment.tell() >= self.segment_bytes:
+                    self._seal_segment()
+                    self._durable = self._appended
+                    self._committed.notify_all()
+                    self._open_segment()
+            sequence = self._appended
+
+            while self._durable < sequence and self._error is None:
+                self._committed.wait()
+            if self._durable < sequence:
+                raise StoreError(f"Application log commit failed: {self._error}")
+        return filenames
+
+    def _commit_loop(self):
+        """Group commit: fsync whatever was appended during each interval"""
+        while True:
+            time.sleep(self.commit_interval)
+            with self._lock:
+                if self._closed:
+                    return
+                if self._appended == self._durable:
+                    continue
+                target = self._appended
+                try:
+                    self._segment.flush()
+                    os.fsync(self._segment.fileno())
+                except OSError as e:
+                    self._error = e
+                else:
+                    self._durable = target
+                self._committed.notify_all()
+
+    def close(self):
+        """Commit outstanding records and seal the active segment"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._seal_segment()
+            self._durable = self._appended
+            self._committed.notify_all()
+        self._committer.join()
+
+def list_segments(directory=LOG_DIR):
+    """Segment paths in write order"""
+    if not os.path.isdir(directory):
+        return []
+    names = [n for n in os.listdir(directory)
+             if n.endswith(ACTIVE_SUFFIX) or n.endswith(SEALED_SUFFIX)]
+    return [os.path.join(directory, n) for n in sorted(names)]
+
+def read_segment(path):
+    """Yield (filename, application) records, stopping at a torn or corrupt tail"""
+    with open(path, 'rb') as f:
+        if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            print(f"⚠️  {path}: not an application log segment")
+            return
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) < RECORD_HEADER.size:
+                print(f"⚠️  {path}: torn record header at end of segment")
+                return
+            length, crc = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                print(f"⚠️  {path}: corrupt record at offset {f.tell() - len(payload) - RECORD_HEADER.size}")
+                return
+            record = json.loads(payload.decode('utf-8'))
+            yield record['filename'], record['application']
+
+def segment_is_sealed(path):
+    """A segment is finished once sealed or once its writer process is gone"""
+    if path.endswith(SEALED_SUFFIX):
+        return True
+    try:
+        pid = int(os.path.basename(path).split('-')[1])
+        os.kill(pid, 0)
+    except (IndexError, ValueError, ProcessLookupError):
+        return True
+    except PermissionError:
+        return False
+    return False
+
+def export_log(log_dir=LOG_DIR, output_dir=SUBMISSIONS_DIR, compact=False):
+    """Materialise logged applications as per-file JSON; optionally drop exported segments"""
+    os.makedirs(output_dir, exist_ok=True)
+    exported = 0
+    existing = 0
+    removed = 0
+    for path in list_segments(log_dir):
+        sealed = segment_is_sealed(path)
+        for filename, application in read_segment(path):
+            # An earlier export may have had to write it under a _N name
+            if find_json_file(output_dir, filename, application):
+                existing += 1
+                continue
+            written = write_json_file(output_dir, filename, application, fsync=True)
+            print(f"✓ Exported: {written}")
+            exported += 1
+        if compact and sealed:
+            os.remove(path)
+            removed += 1
+
+    print("\nExport complete!")
+    print(f"Exported: {exported} applications")
+    print(f"Already present: {existing}")
+    if compact:
+        print(f"Segments removed: {removed}")
+
+def create_store(backend=DEFAULT_BACKEND, submissions_dir=SUBMISSIONS_DIR, fsync=False,
+                 log_dir=None, commit_interval=DEFAULT_COMMIT_INTERVAL,
+                 segment_bytes=DEFAULT_SEGMENT_BYTES):
+    """Build a storage backend by name"""
+    if backend == 'files':
+        return FileStore(submissions_dir, fsync)
+    if backend == 'log':
+        return LogStore(log_dir or os.path.join(submissions_dir, 'log'),
+                        commit_interval, segment_bytes)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def add_storage_arguments(parser):
+    """Add the storage options shared by the servers to an argparse parser"""
+    group = parser.add_argument_group('storage')
+    group.add_argument('--storage', choices=STORAGE_BACKENDS, default=DEFAULT_BACKEND,
+                       help=f"Application storage backend (default: {DEFAULT_BACKEND})")
+    group.add_argument('--fsync', action='store_true',
+                       help="fsync each application file (files backend)")
+    group.add_argument('--log-dir', default=None,
+                       help=f"Segment directory for the log backend (default: {LOG_DIR})")
+    group.add_argument('--commit-interval', type=float, default=DEFAULT_COMMIT_INTERVAL,
+                       help=f"Seconds per group commit (default: {DEFAULT_COMMIT_INTERVAL})")
+    group.add_argument('--segment-bytes', type=int, default=DEFAULT_SEGMENT_BYTES,
+                       help=f"Log segment size before rolling over (default: {DEFAULT_SEGMENT_BYTES})")
+
+def storage_factory_from_args(args, submissions_dir=SUBMISSIONS_DIR):
+    """Return a zero-argument callable that builds the configured store"""
+    def factory():
+        return create_store(args.storage, submissions_dir, args.fsync, args.log_dir,
+                            args.commit_interval, args.segment_bytes)
+    return factory
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Application log maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Write logged applications as JSON files")
+    export_parser.add_argument('--log-dir', default=LOG_DIR)
+    export_parser.add_argument('--output-dir', default=SUBMISSIONS_DIR)
+    export_parser.add_argument('--compact', action='store_true',
+                               help="Delete sealed segments once exported")
+    args = parser.parse_args()
+    export_log(args.log_dir, args.output_dir, args.compact)
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Asyncio server engine: Web server + Form submission handler
+Serves the same routes as server.py and submit_application.py on a single
+event loop, so idle keep-alive connections cost a socket instead of a thread
+"""
+
+import asyncio
+import email.utils
+import json
+import mimetypes
+import os
+import posixpath
+import signal
+import sys
+import time
+from http import HTTPStatus
+from http.server import DEFAULT_ERROR_MESSAGE, DEFAULT_ERROR_CONTENT_TYPE
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from access_log import close_access_log, configure_access_log, log_request, request_id
+from admin_access import is_admin_request
+from application_index import INDEX_ENDPOINTS, QueryError
+from request_body import MAX_BODY_BYTES, RequestBodyError, read_json_body_async
+from static_files import RangeNotSatisfiable, if_range_matches, parse_byte_range
+from idempotency import IdempotencyError
+import metrics
+from profiling import capture_stacks, start_sampler, stop_sampler
+from lifecycle import DEFAULT_DRAIN_TIMEOUT, notify_ready, spawn_replacement
+from rate_limit import (CONNECTION_LIMIT_RESPONSE, check_request, close_connection,
+                        open_connection, retry_after_header)
+from submissions import (QUEUE_RETRY_AFTER, SUBMISSIONS_DIR, QueueFull, accept_application_async,
+                         close_storage, get_index)
+
+PORT = 8000
+
+# Routes that accept rental application JSON
+SUBMIT_PATHS = ('/submit_application', '/submit')
+
+# Paths reported under their own route label; everything else is 'static'
+METRIC_ROUTES = frozenset([*SUBMIT_PATHS, '/metrics', '/debug/stacks', *INDEX_ENDPOINTS])
+
+KEEPALIVE_TIMEOUT = 15      # seconds an idle connection is kept open
+MAX_KEEPALIVE_REQUESTS = 100
+MAX_HEADER_BYTES = 65536    # request line + headers
+SERVER_VERSION = "PepperTreeAsync/1.0"
+
+class HTTPError(Exception):
+    """Raised while parsing a request to answer with an error status"""
+
+    def __init__(self, status, message=None):
+        super().__init__(message)
+        self.status = HTTPStatus(status)
+        self.message = message
+
+class Request:
+    """A parsed HTTP request head"""
+
+    def __init__(self, method, target, version, headers):
+        self.method = method
+        self.target = target
+        self.path = urlsplit(target).path
+        self.version = version
+        self.headers = headers
+        self.last = False
+        self.status = None          # set once the response head is sent
+        self.body_bytes = 0
+        self.body_consumed = False  # set once handle_post has read the body
+        self.id = request_id(headers.get('x-request-id'))
+
+    @property
+    def keep_alive(self):
+        """Whether the client wants the connection kept open"""
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    @property
+    def has_unread_body(self):
+        """Whether a request body is still waiting on the connection"""
+        if self.body_consumed:
+            return False
+        # Any unread request body would be parsed as the next request
+        return (self.headers.get('content-length', '0').strip() not in ('', '0')
+                or 'transfer-encoding' in self.headers)
+
+class AsyncApplicationServer:
+    """Event-loop HTTP server for static files and application submissions"""
+
+    def __init__(self, directory=None, store=None,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, max_requests=MAX_KEEPALIVE_REQUESTS,
+                 max_body_bytes=MAX_BODY_BYTES):
+        self.directory = os.path.abspath(directory or os.getcwd())
+        self.store = store
+        self.keepalive_timeout = keepalive_timeout
+        self.max_requests = max_requests
+        self.max_body_bytes = max_body_bytes
+        self.draining = False
+        self.connections = {}       # task -> whether it is idle between keep-alive requests
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes or goes idle"""
+        peer = writer.get_extra_info('peername') or ('-', 0)
+        if not open_connection(peer[0]):
+            writer.write(CONNECTION_LIMIT_RESPONSE)
+            writer.close()
+            return
+        handled = 0
+        task = asyncio.current_task()
+        self.connections[task] = False
+        try:
+            while handled < self.max_requests and not self.draining:
+                self.connections[task] = handled > 0
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader),
+                                                     self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    await self.send_error(writer, None, peer, e.status, e.message, close=True)
+                    self.log_error(peer, e.status, e.message)
+                    break
+                if request is None:
+                    break
+
+                self.connections[task] = False
+                handled += 1
+                request.last = handled >= self.max_requests
+                started = metrics.request_started()
+                try:
+                    keep_alive = await self.dispatch(request, reader, writer, peer)
+                finally:
+                    self.record_request(request, peer, started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # drain() closing an idle or overdue connection
+            if not self.draining:
+                raise
+        finally:
+            self.connections.pop(task, None)
+            close_connection(peer[0])
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def drain(self, timeout):
+        """Finish in-flight requests, cutting off connections still open after timeout
+
+        Idle keep-alive connections are closed at once; connections that
+        haven't sent their first request yet are still served. Returns how
+        many connections had to be cut off.
+        """
+        self.draining = True
+        for task, idle in list(self.connections.items()):
+            if idle:
+                task.cancel()
+        pending = set(self.connections)
+        if pending:
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        return len(pending)
+
+    def record_request(self, request, peer, started):
+        """Count a finished request and write its access log entry"""
+        route = metrics.route_label(request.path, METRIC_ROUTES)
+        duration = metrics.request_finished(started, route, request.method, request.status,
+                                            request.body_bytes)
+        log_request(request.id, peer[0], request.method, request.path, route, request.status,
+                    request.body_bytes, duration)
+
+    async def read_request(self, reader):
+        """Read and parse a request line and headers"""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+
+        lines = head.decode('iso-8859-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Bad request syntax ({lines[0]!r})")
+        method, target, version = parts
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed header line")
+            headers[name.strip().lower()] = value.strip()
+        return Request(method, target, version, headers)
+
+    async def dispatch(self, request, reader, writer, peer):
+        """Route a request; return whether the connection may stay open"""
+        if request.method == 'OPTIONS':
+            return await self.handle_options(request, writer, peer)
+        wait = check_request(peer[0], 'submit' if request.method == 'POST' else 'static')
+        if wait:
+            return await self.send_error(writer, request, peer, HTTPStatus.TOO_MANY_REQUESTS,
+                                         "Too many requests",
+                                         headers=[('Retry-After', retry_after_header(wait))])
+        if request.method == 'POST':
+            return await self.handle_post(request, reader, writer, peer)
+        if request.method in ('GET', 'HEAD'):
+            if request.path in INDEX_ENDPOINTS:
+                return await self.handle_index_query(INDEX_ENDPOINTS[request.path], request,
+                                                     writer, peer)
+            if request.path == '/metrics':
+                return await self.handle_metrics(request, writer, peer)
+            if request.path == '/debug/stacks':
+                return await self.handle_stack_capture(request, writer, peer)
+            return await self.handle_static(request, writer, peer)
+        return await self.send_error(writer, request, peer, HTTPStatus.NOT_IMPLEMENTED,
+                                     f"Unsupported method ({request.method!r})")
+
+    async def handle_options(self, request, writer, peer):
+        """Handle CORS preflight"""
+        return await self.send_response(writer, request, peer, HTTPStatus.OK, [
+            ('Access-Control-Allow-Methods', 'POST, OPTIONS'),
+            ('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key'),
+        ])
+
+    async def handle_post(self, request, reader, writer, peer):
+        """Handle POST requests for form submission"""
+        if request.path not in SUBMIT_PATHS:
+            return await self.send_error(writer, request, peer, HTTPStatus.NOT_FOUND,
+                                         "Endpoint not found")
+        try:
+            application_data = await read_json_body_async(reader, request.headers,
+                                                           self.max_body_bytes)
+        except RequestBodyError as e:
+            print(f"❌ Rejected submission: {e.message}")
+            return await self.send_error(writer, request, peer, e.status, e.message, close=True)
+        except ValueError as e:
+            # JSONDecodeError and UnicodeDecodeError are both ValueErrors
+            request.body_consumed = True
+            print(f"❌ JSON Error: {e}")
+            return await self.send_error(writer, request, peer, HTTPStatus.BAD_REQUEST,
+                                         f"Invalid JSON: {str(e)}")
+        request.body_consumed = True
+
+        try:
+            status, response, replayed = await accept_application_async(
+                application_data, peer[0], request.headers.get('idempotency-key'), self.store)
+        except IdempotencyError as e:
+            print(f"❌ Rejected submission: {e.message}")
+            return await self.send_error(writer, request, peer, e.status, e.message)
+        except QueueFull as e:
+            print(f"⚠️  Submission refused: {e}")
+            body = json.dumps({'success': False, 'message': str(e)}).encode('utf-8')
+            return await self.send_response(writer, request, peer, HTTPStatus.SERVICE_UNAVAILABLE, [
+                ('Content-Type', 'application/json'),
+                ('Retry-After', str(QUEUE_RETRY_AFTER)),
+            ], body)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return await self.send_error(writer, request, peer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                         f"Server error: {str(e)}")
+
+        status = HTTPStatus(status)
+        headers = [('Content-Type', 'application/json')]
+        if replayed:
+            print(f"♻️  Duplicate submission answered from cache: {response['filename']}")
+            headers.append(('Idempotent-Replayed', 'true'))
+        else:
+            action = 'queued' if status == HTTPStatus.ACCEPTED else 'saved'
+            print(f"✅ Application {action}: {response['filename']}")
+        body = json.dumps(response).encode('utf-8')
+        return await self.send_response(writer, request, peer, status, headers, body)
+
+    async def handle_index_query(self, build_response, request, writer, peer):
+        """Answer an admin list or search request from the SQLite index"""
+        query = parse_qs(urlsplit(request.target).query)
+        token = request.headers.get('x-admin-token') or query.get('token', [None])[0]
+        if not is_admin_request(peer[0], token):
+            return await self.send_error(writer, request, peer, HTTPStatus.FORBIDDEN,
+                                         "Admin access required")
+        index = get_index()
+        if index is None:
+            return await self.send_error(writer, request, peer, HTTPStatus.SERVICE_UNAVAILABLE,
+                                         "Application index is disabled")
+        loop = asyncio.get_running_loop()
+        try:
+            payload = await loop.run_in_executor(None, build_response, index, query)
+        except QueryError as e:
+            return await self.send_error(writer, request, peer, HTTPStatus.BAD_REQUEST, str(e))
+        return await self.send_json(writer, request, peer, HTTPStatus.OK, payload)
+
+    async def handle_metrics(self, request, writer, peer):
+        """Answer an admin Prometheus scrape"""
+        query = parse_qs(urlsplit(request.target).query)
+        token = request.headers.get('x-admin-token') or query.get('token', [None])[0]
+        if not is_admin_request(peer[0], token):
+            return await self.send_error(writer, request, peer, HTTPStatus.FORBIDDEN,
+                                         "Admin access required")
+        body = metrics.render().encode('utf-8')
+        return await self.send_response(writer, request, peer, HTTPStatus.OK, [
+            ('Content-Type', metrics.CONTENT_TYPE),
+            ('Cache-Control', 'no-store'),
+        ], body)
+
+    async def handle_stack_capture(self, request, writer, peer):
+        """Sample every thread's stack for ?seconds=N and answer with collapsed stacks
+
+        Sampling runs on an executor thread, so it sees the event loop's
+        thread at work rather than waiting on the capture.
+        """
+        query = parse_qs(urlsplit(request.target).query)
+        token = request.headers.get('x-admin-token') or query.get('token', [None])[0]
+        if not is_admin_request(peer[0], token):
+            return await self.send_error(writer, request, peer, HTTPStatus.FORBIDDEN,
+                                         "Admin access required")
+        try:
+            seconds = float(query.get('seconds', ['5'])[0])
+        except ValueError:
+            seconds = -1
+        if not 0 < seconds:
+            return await self.send_error(writer, request, peer, HTTPStatus.BAD_REQUEST,
+                                         "seconds must be a positive number")
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(None, capture_stacks, seconds)
+        return await self.send_response(writer, request, peer, HTTPStatus.OK, [
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Cache-Control', 'no-store'),
+        ], text.encode('utf-8'))
+
+    async def send_json(self, writer, request, peer, status, payload):
+        """Send a JSON response"""
+        body = json.dumps(payload).encode('utf-8')
+        return await self.send_response(writer, request, peer, status, [
+            ('Content-Type', 'application/json'),
+            ('Cache-Control', 'no-store'),
+        ], body)
+
+    def translate_path(self, path):
+        """Map a URL path onto the served directory, or None if it escapes it"""
+        path = posixpath.normpath(unquote(path))
+        parts = [part for part in path.split('/') if part and part not in ('.', '..')]
+        fs_path = os.path.join(self.directory, *parts)
+        if os.path.commonpath([self.directory, os.path.abspath(fs_path)]) != self.directory:
+            return None
+        return fs_path
+
+    async def handle_static(self, request, writer, peer):
+        """Serve a file from the site directory"""
+        fs_path = self.translate_path(request.path)
+        if fs_path and os.path.isdir(fs_path):
+            if not request.path.endswith('/'):
+                return await self.send_response(writer, request, peer,
+                                                HTTPStatus.MOVED_PERMANENTLY,
+                                                [('Location', request.path + '/')])
+            fs_path = os.path.join(fs_path, 'index.html')
+        if not fs_path or not os.path.isfile(fs_path):
+            return await self.send_error(writer, request, peer, HTTPStatus.NOT_FOUND,
+                                         "File not found")
+
+        try:
+            f = open(fs_path, 'rb')
+        except OSError:
+            return await self.send_error(writer, request, peer, HTTPStatus.NOT_FOUND,
+                                         "File not found")
+        with f:
+            st = os.fstat(f.fileno())
+            last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+
+            # Use browser cache if possible
+            since = request.headers.get('if-modified-since')
+            if since and 'if-none-match' not in request.headers:
+                try:
+                    since_ts = email.utils.parsedate_to_datetime(since).timestamp()
+                except (TypeError, ValueError, IndexError, OverflowError):
+                    since_ts = None
+                if since_ts is not None and int(st.st_mtime) <= since_ts:
+                    return await self.send_response(writer, request, peer,
+                                                    HTTPStatus.NOT_MODIFIED, [])
+
+            byte_range = None
+            if if_range_matches(request.headers.get('if-range'), last_modified):
+                try:
+                    byte_range = parse_byte_range(request.headers.get('range'), st.st_size)
+                except RangeNotSatisfiable:
+                    return await self.send_response(
+                        writer, request, peer, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                        [('Content-Range', f'bytes */{st.st_size}')])
+
+            content_type = mimetypes.guess_type(fs_path)[0] or 'application/octet-stream'
+            headers = [
+                ('Content-Type', content_type),
+                ('Last-Modified', last_modified),
+                ('Accept-Ranges', 'bytes'),
+            ]
+            if byte_range:
+                start, end = byte_range
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers.append(('Content-Range', f'bytes {start}-{end}/{st.st_size}'))
+                offset, count = start, end - start + 1
+            else:
+                status = HTTPStatus.OK
+                offset, count = 0, st.st_size
+
+            keep_alive = await self.send_head(writer, request, peer, status, headers, count)
+            if request.method != 'HEAD' and count:
+                loop = asyncio.get_running_loop()
+                await loop.sendfile(writer.transport, f, offset, count)
+            return keep_alive
+
+    async def send_head(self, writer, request, peer, status, headers, content_length, close=False):
+        """Write the status line and headers; return whether to keep the connection"""
+        keep_alive = bool(request and request.keep_alive and not request.last and not close
+                          and not request.has_unread_body and not self.draining)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Server: {SERVER_VERSION}",
+                 f"Date: {email.utils.formatdate(usegmt=True)}",
+                 "Access-Control-Allow-Origin: *"]
+        if request is not None:
+            lines.append(f"X-Request-Id: {request.id}")
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        lines.append(f"Content-Length: {content_length}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'strict'))
+        if request is not None:
+            request.status = status.value
+            request.body_bytes = content_length if request.method != 'HEAD' else 0
+        await writer.drain()
+        return keep_alive
+
+    async def send_response(self, writer, request, peer, status, headers, body=b'', close=False):
+        """Send a complete response with an in-memory body"""
+        keep_alive = await self.send_head(writer, request, peer, status, headers,
+                                          len(body), close)
+        if body and (request is None or request.method != 'HEAD'):
+            writer.write(body)
+            await writer.drain()
+        return keep_alive
+
+    async def send_error(self, writer, request, peer, status, message=None, close=False,
+                         headers=()):
+        """Send an HTML error page in the same format as http.server"""
+        status = HTTPStatus(status)
+        body = (DEFAULT_ERROR_MESSAGE % {
+            'code': status.value,
+            'message': message or status.phrase,
+            'explain': status.description,
+        }).encode('UTF-8', 'replace')
+        return await self.send_response(writer, request, peer, status,
+                                        [('Content-Type', DEFAULT_ERROR_CONTENT_TYPE)]
+                                        + list(headers), body, close)
+
+    def log_error(self, peer, status, message):
+        """Log a request that couldn't be parsed, in the same format as http.server"""
+        timestamp = time.strftime('%d/%b/%Y %H:%M:%S')
+        sys.stderr.write(f'{peer[0]} - - [{timestamp}] code {status.value}, '
+                         f'message {message or status.phrase}\n')
+
+async def serve(host='', port=PORT, directory=None, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                max_requests=MAX_KEEPALIVE_REQUESTS, max_body_bytes=MAX_BODY_BYTES,
+                drain_timeout=DEFAULT_DRAIN_TIMEOUT, sockets=()):
+    """Run the asyncio engine until SIGINT/SIGTERM, or SIGHUP hands it to a replacement
+
+    sockets are already listening sockets to serve instead of binding new ones.
+    """
+    app = AsyncApplicationServer(directory, keepalive_timeout=keepalive_timeout,
+                                 max_requests=max_requests, max_body_bytes=max_body_bytes)
+    if sockets:
+        servers = [await asyncio.start_server(app.handle_connection, sock=sock,
+                                              limit=MAX_HEADER_BYTES) for sock in sockets]
+    else:
+        servers = [await asyncio.start_server(app.handle_connection, host or None, port,
+                                              limit=MAX_HEADER_BYTES)]
+    listening = [sock for server in servers for sock in server.sockets]
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    stopping = set()
+
+    async def stop(reason):
+        if reason == 'reload':
+            # Waiting for the replacement to start blocks, so keep it off the loop
+            process = await loop.run_in_executor(None, spawn_replacement, listening)
+            if process is None:
+                stopping.clear()
+                return
+        if not stopped.done():
+            stopped.set_result(reason)
+
+    def handle_signal(reason):
+        if not stopping:
+            stopping.add(asyncio.ensure_future(stop(reason)))
+
+    loop.add_signal_handler(signal.SIGINT, handle_signal, 'shutdown')
+    loop.add_signal_handler(signal.SIGTERM, handle_signal, 'shutdown')
+    loop.add_signal_handler(signal.SIGHUP, handle_signal, 'reload')
+    notify_ready()
+
+    reason = await stopped
+    print(f"\n🛑 {'Reloading' if reason == 'reload' else 'Shutting down'}: "
+          f"draining in-flight requests")
+    for server in servers:
+        server.close()
+    cut = await app.drain(drain_timeout)
+    if cut:
+        print(f"⚠️  Cut off {cut} connection(s) still open after {drain_timeout:g}s")
+    for server in servers:
+        await server.wait_closed()
+
+def run_server(host='', port=PORT, keepalive_timeout=KEEPALIVE_TIMEOUT,
+               max_requests=MAX_KEEPALIVE_REQUESTS, max_body_bytes=MAX_BODY_BYTES,
+               drain_timeout=DEFAULT_DRAIN_TIMEOUT, sockets=()):
+    """Start the asyncio web server"""
+    print("=" * 70)
+    print("🏢 PepperTree Townhomes - Application Submission Server (asyncio)")
+    print("=" * 70)
+    print(f"✅ Server running on port {port}")
+    print(f"🌐 Website: http://localhost:{port}")
+    print(f"📝 Application Form: http://localhost:{port}/rental-application-form.html")
+    print(f"🔗 Endpoints: {', '.join(SUBMIT_PATHS)}")
+    print(f"📁 Applications saved to: {os.path.abspath(SUBMISSIONS_DIR)}/")
+    print("=" * 70)
+    print("\nPress Ctrl+C to stop (SIGHUP reloads without dropping connections)\n")
+
+    start_sampler()
+    try:
+        asyncio.run(serve(host, port, keepalive_timeout=keepalive_timeout,
+                          max_requests=max_requests, max_body_bytes=max_body_bytes,
+                          drain_timeout=drain_timeout, sockets=sockets))
+    except KeyboardInterrupt:
+        print("\n\n🛑 Server stopped")
+    finally:
+        close_storage()
+        close_access_log()
+        stop_sampler()
+
+if __name__ == '__main__':
+    configure_access_log()
+    run_server()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+HTTP load test harness for the PepperTree servers
+Simulated visitors replay a traffic mix against a running server over
+keep-alive connections, using nothing but asyncio:
+
+    page    GET index.html, then its stylesheets, scripts and images
+    poll    GET units-data.json, revalidating with If-Modified-Since
+    submit  POST /submit_application with a payload shaped like the
+            applications in applications/
+
+Throughput, p50/p95/p99 latency and error rates are printed per request
+type and saved as JSON, so runs against different server modes can be
+compared:
+
+    python3 server.py --mode prefork                 (in a scratch copy of the site)
+    python3 bench/loadtest.py --label prefork --concurrency 64 --duration 30
+    python3 bench/loadtest.py --compare bench/results/*.json
+
+Submissions are really stored, so run the server under test from a scratch
+copy of the site. The rate limiter exempts loopback clients by default;
+from another host, start the server with --no-rate-limit or the 429s will
+show up as errors.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SITE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+DEFAULT_URL = 'http://localhost:8000'
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 20.0     # seconds measured
+DEFAULT_WARMUP = 2.0        # seconds run before measuring
+DEFAULT_MIX = 'page=60,poll=35,submit=5'
+SCENARIOS = ('page', 'poll', 'submit')
+REQUEST_TIMEOUT = 30
+
+# Fields the server stamps on saved applications
+STAMPED_FIELDS = ('submissionDate', 'submissionTimestamp', 'submittedAt', 'submittedFrom',
+                  'serverTime', 'ipAddress')
+
+# Subresources a browser fetches while loading a page
+ASSET_PATTERN = re.compile(r'<(?:link[^>]+href|script[^>]+src|img[^>]+src)="([^"]+)"', re.I)
+ASSET_EXTENSIONS = ('.css', '.js', '.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg', '.ico')
+
+class Connection:
+    """One keep-alive HTTP/1.1 client connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers=(), body=b''):
+        """Send a request; return (status, response headers, body bytes)"""
+        reused = self.writer is not None
+        try:
+            return await self._exchange(method, path, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive connection; retry on a new one
+            return await self._exchange(method, path, headers, body)
+
+    async def _exchange(self, method, path, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 "User-Agent: peppertree-loadtest", "Accept-Encoding: gzip"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        if body or method == 'POST':
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b'\r\n')
+        if not status_line.strip():
+            raise ConnectionResetError("Empty response")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get('content-length', 0))
+        if method != 'HEAD' and length:
+            await self.reader.readexactly(length)
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, length
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+class Recorder:
+    """Latencies and outcomes per request type"""
+
+    def __init__(self):
+        self.recording = False
+        self.samples = {}           # name -> [latency seconds]
+        self.statuses = {}          # name -> {status or error name: count}
+        self.bytes = {}
+        self.server = None
+
+    def record(self, name, started, outcome, nbytes=0):
+        if not self.recording:
+            return
+        self.samples.setdefault(name, []).append(time.perf_counter() - started)
+        counts = self.statuses.setdefault(name, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+        self.bytes[name] = self.bytes.get(name, 0) + nbytes
+
+def is_error(outcome):
+    """Whether a recorded outcome (status code or exception name) failed"""
+    return not isinstance(outcome, int) or outcome >= 400
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(recorder, elapsed):
+    """Per request type statistics for a finished run"""
+    summary = {}
+    for name, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        statuses = recorder.statuses[name]
+        errors = sum(count for outcome, count in statuses.items() if is_error(outcome))
+        summary[name] = {
+            'requests': len(ordered),
+            'errors': errors,
+            'error_rate': round(errors / len(ordered), 4),
+            'throughput_rps': round(len(ordered) / elapsed, 1),
+            'bytes': recorder.bytes[name],
+            'latency_ms': {
+                'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+                'p50': round(percentile(ordered, 0.50) * 1000, 3),
+                'p95': round(percentile(ordered, 0.95) * 1000, 3),
+                'p99': round(percentile(ordered, 0.99) * 1000, 3),
+                'max': round(ordered[-1] * 1000, 3),
+            },
+            'statuses': {str(outcome): count for outcome, count in sorted(statuses.items(),
+                                                                          key=str)},
+        }
+    return summary
+
+def load_payloads(directory):
+    """Application payloads shaped like the saved ones, without server stamps"""
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json')))[:50]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(document, dict) and 'firstName' in document:
+            payloads.append({k: v for k, v in document.items() if k not in STAMPED_FIELDS})
+    if not payloads:
+        payloads.append({'firstName': 'Bench', 'lastName': 'Loadtest', 'email': 'bench@example.com',
+                         'cellPhone': '555-555-0100', 'presentAddress': '1 Test Way',
+                         'currentCity': 'Testville', 'currentState': 'CA',
+                         'moveInDate': '2026-01-01', 'leaseLength': '12 months'})
+    return payloads
+
+def page_assets(html, page_path):
+    """Same-site stylesheets, scripts and images referenced by a page"""
+    assets = []
+    for ref in ASSET_PATTERN.findall(html):
+        if '${' in ref or ref.startswith(('data:', '#', 'mailto:', 'tel:')):
+            continue
+        url = urlsplit(urljoin(page_path, ref))
+        if url.scheme or url.netloc or not url.path.lower().endswith(ASSET_EXTENSIONS):
+            continue
+        if url.path not in assets:
+            assets.append(url.path)
+    return assets
+
+class LoadTest:
+    """Virtual visitors replaying the traffic mix"""
+
+    def __init__(self, url, mix, payloads, assets, page='/index.html', think=0.0, seed=None):
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self.mix = mix
+        self.payloads = payloads
+        self.assets = assets
+        self.page = page
+        self.think = think
+        self.seed = seed
+        self.recorder = Recorder()
+        self.stopping = False
+
+    async def timed(self, conn, name, method, path, headers=(), body=b''):
+        """Make one request and record it under name"""
+        started = time.perf_counter()
+        try:
+            status, response_headers, nbytes = await asyncio.wait_for(
+                conn.request(method, path, headers, body), REQUEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            conn.close()
+            self.recorder.record(name, started, type(e).__name__)
+            return None
+        if self.recorder.server is None:
+            self.recorder.server = response_headers.get('server')
+        self.recorder.record(name, started, status, nbytes)
+        return response_headers
+
+    async def load_page(self, conn, state):
+        started = time.perf_counter()
+        await self.timed(conn, 'page', 'GET', self.page)
+        for asset in self.assets:
+            await self.timed(conn, 'asset', 'GET', asset)
+        await self.poll(conn, state)
+        self.recorder.record('page_load', started, 200)
+
+    async def poll(self, conn, state):
+        headers = []
+        if state.get('units_modified'):
+            headers.append(('If-Modified-Since', state['units_modified']))
+        response_headers = await self.timed(conn, 'poll', 'GET', '/units-data.json', headers)
+        if response_headers and 'last-modified' in response_headers:
+            state['units_modified'] = response_headers['last-modified']
+
+    async def submit(self, conn, rng):
+        application = dict(rng.choice(self.payloads))
+        # Distinct content per post, so duplicate detection doesn't collapse them
+        suffix = uuid.uuid4().hex[:8]
+        application['firstName'] = f"Bench{suffix}"
+        application['lastName'] = 'Loadtest'
+        application['email'] = f"bench+{suffix}@example.com"
+        body = json.dumps(application).encode('utf-8')
+        await self.timed(conn, 'submit', 'POST', '/submit_application', [
+            ('Content-Type', 'application/json'),
+            ('Idempotency-Key', str(uuid.uuid4())),
+        ], body)
+
+    async def visitor(self, number):
+        """One simulated visitor on its own connection"""
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        conn = Connection(self.host, self.port)
+        state = {}
+        try:
+            while not self.stopping:
+                scenario = rng.choices(names, weights)[0]
+                if scenario == 'page':
+                    await self.load_page(conn, state)
+                elif scenario == 'poll':
+                    await self.poll(conn, state)
+                else:
+                    await self.submit(conn, rng)
+                if self.think:
+                    await asyncio.sleep(rng.expovariate(1 / self.think))
+        finally:
+            conn.close()
+
+    async def run(self, concurrency, duration, warmup):
+        """Run the visitors; return the measured wall time"""
+        tasks = [asyncio.create_task(self.visitor(i)) for i in range(concurrency)]
+        await asyncio.sleep(warmup)
+        self.recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.sleep(duration)
+        self.recorder.recording = False
+        elapsed = time.perf_counter() - started
+        self.stopping = True
+        await asyncio.wait(tasks, timeout=REQUEST_TIMEOUT)
+        for task in tasks:
+            task.cancel()
+        return elapsed
+
+def parse_mix(text):
+    """{scenario: weight} from 'page=60,poll=35,submit=5'"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r} "
+                                             f"(choose from {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Bad weight for {name}: {weight!r}")
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise argparse.ArgumentTypeError("The mix needs at least one positive weight")
+    return mix
+
+def print_summary(summary):
+    print(f"{'request':<10} {'count':>8} {'req/s':>9} {'errors':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in summary.items():
+        latency = stats['latency_ms']
+        print(f"{name:<10} {stats['requests']:>8} {stats['throughput_rps']:>9} "
+              f"{stats['error_rate']:>7.2%} {latency['p50']:>9} {latency['p95']:>9} "
+              f"{latency['p99']:>9} {latency['max']:>9}")
+
+def compare(paths):
+    """Print saved runs side by side"""
+    runs = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            runs.append(json.load(f))
+    names = sorted({name for run in runs for name in run['requests']})
+    for name in names:
+        print(f"\n{name}")
+        print(f"  {'run':<24} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for run in runs:
+            stats = run['requests'].get(name)
+            if stats is None:
+                continue
+            latency = stats['latency_ms']
+            print(f"  {run['label'][:24]:<24} {stats['throughput_rps']:>9} "
+                  f"{stats['error_rate']:>7.2%} {latency['p50']:>9} {latency['p95']:>9} "
+                  f"{latency['p99']:>9}")
+
+def discover_assets(page):
+    """Assets of the page, read from the site directory next to bench/"""
+    path = os.path.join(SITE_DIR, page.lstrip('/'))
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return page_assets(f.read(), page)
+    except OSError:
+        print(f"⚠️  {path} not found; page loads fetch the HTML only")
+        return []
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running PepperTree server")
+    parser.add_argument('--url', default=DEFAULT_URL, help=f"Server to test (default: {DEFAULT_URL})")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Simultaneous visitors (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f"Seconds to measure (default: {DEFAULT_DURATION})")
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP,
+                        help=f"Seconds to run before measuring (default: {DEFAULT_WARMUP})")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--think', type=float, default=0.0,
+                        help="Mean pause in seconds between a visitor's actions (default: 0)")
+    parser.add_argument('--page', default='/index.html', help="Page loaded by 'page' visits")
+    parser.add_argument('--applications', default=os.path.join(SITE_DIR, 'applications'),
+                        help="Directory of sample applications to shape submissions on")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for repeatable mixes")
+    parser.add_argument('--label', default=None,
+                        help="Name for this run, e.g. the server mode (default: the URL)")
+    parser.add_argument('--output', default=None,
+                        help="Results file (default: bench/results/<label>-<time>.json)")
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help="Print saved result files side by side instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.compare)
+        return
+    if args.concurrency < 1 or args.duration <= 0 or args.warmup < 0:
+        parser.error("--concurrency and --duration must be positive")
+
+    label = args.label or urlsplit(args.url).netloc
+    test = LoadTest(args.url, args.mix, load_payloads(args.applications),
+                    discover_assets(args.page), args.page, args.think, args.seed)
+    print(f"🚦 {label}: {args.concurrency} visitors for {args.duration}s "
+          f"(+{args.warmup}s warm-up), mix {args.mix}")
+    started_at = datetime.now().astimezone()
+    try:
+        elapsed = asyncio.run(test.run(args.concurrency, args.duration, args.warmup))
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted")
+        sys.exit(1)
+
+    summary = summarize(test.recorder, elapsed)
+    requests = sum(stats['requests'] for name, stats in summary.items() if name != 'page_load')
+    errors = sum(stats['errors'] for name, stats in summary.items() if name != 'page_load')
+    results = {
+        'label': label,
+        'url': args.url,
+        'server': test.recorder.server,
+        'started': started_at.isoformat(timespec='seconds'),
+        'duration': round(elapsed, 3),
+        'concurrency': args.concurrency,
+        'mix': args.mix,
+        'think': args.think,
+        'totals': {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'throughput_rps': round(requests / elapsed, 1),
+        },
+        'requests': summary,
+    }
+    print_summary(summary)
+    print(f"\n📊 {requests} requests, {results['totals']['throughput_rps']} req/s, "
+          f"{results['totals']['error_rate']:.2%} errors")
+
+    safe_label = re.sub(r'[^\w.-]+', '_', label)
+    output = args.output or os.path.join(RESULTS_DIR,
+                                         f"{safe_label}-{started_at:%Y%m%d_%H%M%S}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+if __name__ == '__main__':
+    main()
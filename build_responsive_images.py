@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Build responsive derivatives of the unit photos
+Each photo named in units-data.json is written at several widths as JPEG
+and WebP (and AVIF when this Pillow build can encode it) into
+images/responsive/, and images/responsive/manifest.json maps every photo
+name to srcset strings ready for <picture><source type srcset> markup:
+
+    "720C_Kitchen.jpg": {"width": 4032, "height": 3024,
+                         "fallback": "images/responsive/720C_Kitchen-jpg-800.jpg",
+                         "sources": [{"type": "image/webp",
+                                      "srcset": "images/responsive/720C_Kitchen-jpg-400.webp 400w, ..."},
+                                     ...]}
+
+Derivative names keep the source's extension, so 720C_Kitchen.jpg and
+720C_Kitchen.png don't overwrite each other's files.
+
+Photos are processed in parallel, one per worker process, and the image
+build manifest (image_manifest.py) skips photos whose derivatives are
+already up to date, so adding a photo only costs that photo's work. Each
+run updates the entries of the photos it was given and keeps the rest.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from image_manifest import BuildManifest
+
+TOOL = 'responsive_images'
+WIDTHS = (400, 800, 1200, 1600)
+FALLBACK_WIDTH = 800        # <img src> for browsers without srcset support
+OUTPUT_DIR = os.path.join('images', 'responsive')
+SRCSET_MANIFEST = 'manifest.json'
+
+# format -> (file extension, MIME type, save options), best compression first
+FORMATS = {
+    'avif': ('avif', 'image/avif', {'quality': 60, 'speed': 6}),
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)     # EXIF orientations that swap width and height
+
+def available_formats():
+    """The FORMATS this Pillow build can write"""
+    from PIL import Image
+    Image.init()
+    return [name for name in FORMATS if name.upper() in Image.SAVE]
+
+def unit_photos(data_file='units-data.json'):
+    """Photo names used in units-data.json, in order of first use"""
+    with open(data_file, encoding='utf-8') as f:
+        data = json.load(f)
+    names = []
+    for unit in data.get('units', []):
+        for name in unit.get('photos', []):
+            if name not in names:
+                names.append(name)
+    return names
+
+def target_widths(width, widths):
+    """The widths to build for a photo width pixels wide; never upscale"""
+    sizes = [w for w in widths if w <= width]
+    if width not in sizes and width < max(widths):
+        sizes.append(width)
+    return sizes
+
+def build_derivatives(source, output_dir, widths, formats):
+    """Write the derivatives of one photo; return its srcset manifest entry and files
+
+    Runs in a worker process. The photo is decoded once, at the smallest
+    scale JPEG's draft mode allows for the largest width, and every width
+    is resized from that.
+    """
+    from PIL import Image, ImageOps
+    started = time.perf_counter()
+    source = Path(source)
+    files = []
+    prefix = f"{source.stem}-{source.suffix.lstrip('.').lower()}"
+    with Image.open(source) as image:
+        rotated = image.getexif().get(0x0112) in ROTATED_ORIENTATIONS
+        raw_width, raw_height = image.size[::-1] if rotated else image.size
+        sizes = target_widths(raw_width, widths)
+        largest = max(sizes)
+        draft_size = (largest, round(largest * raw_height / raw_width))
+        image.draft('RGB', draft_size[::-1] if rotated else draft_size)
+        icc_profile = image.info.get('icc_profile')
+        decoded = ImageOps.exif_transpose(image)
+        has_alpha = decoded.mode in ('RGBA', 'LA', 'PA') or 'transparency' in decoded.info
+        decoded = decoded.convert('RGBA' if has_alpha else 'RGB')
+
+    sources = {name: [] for name in formats}
+    for width in sorted(sizes, reverse=True):
+        height = round(width * raw_height / raw_width)
+        resized = decoded.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for name in formats:
+            extension, _, options = FORMATS[name]
+            variant = resized
+            if name == 'jpeg' and has_alpha:
+                variant = Image.new('RGB', resized.size, (255, 255, 255))
+                variant.paste(resized, mask=resized.split()[-1])
+            path = Path(output_dir) / f"{prefix}-{width}.{extension}"
+            temp_path = path.with_name(path.name + '.tmp')
+            extra = {'icc_profile': icc_profile} if icc_profile else {}
+            variant.save(temp_path, name.upper(), **options, **extra)
+            os.replace(temp_path, path)
+            files.append(str(path))
+            sources[name].insert(0, (path.as_posix(), width))
+
+    jpegs = sources.get('jpeg') or next(iter(sources.values()))
+    fallback = min(jpegs, key=lambda item: abs(item[1] - FALLBACK_WIDTH))[0]
+    entry = {
+        'width': raw_width,
+        'height': raw_height,
+        'fallback': fallback,
+        'sources': [{'type': FORMATS[name][1],
+                     'srcset': ', '.join(f"{path} {width}w" for path, width in sources[name])}
+                    for name in formats],
+    }
+    return entry, files, time.perf_counter() - started
+
+def load_srcsets(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('images', {})
+    except (OSError, ValueError):
+        return {}
+
+def build_responsive_images(names=None, images_dir='images', output_dir=OUTPUT_DIR,
+                            widths=WIDTHS, workers=None, force=False):
+    """Build derivatives for the named photos (default: those in units-data.json)"""
+    names = names or unit_photos()
+    formats = available_formats()
+    widths = tuple(sorted(set(widths)))
+    os.makedirs(output_dir, exist_ok=True)
+    srcset_path = os.path.join(output_dir, SRCSET_MANIFEST)
+    previous = load_srcsets(srcset_path)
+
+    manifest = BuildManifest()
+    params = {'widths': widths, 'formats': formats, 'output_dir': Path(output_dir).as_posix(),
+              'options': {name: FORMATS[name][2] for name in formats}}
+    images = {}
+    jobs = []
+    missing = []
+    for name in names:
+        source = Path(images_dir) / name
+        if not source.exists():
+            missing.append(name)
+            continue
+        entry = None if force else manifest.lookup(TOOL, [source], params)
+        if entry is not None:
+            # Same content may be known under another name; reuse that name's srcsets
+            known = [Path(s).name for s in entry['sources'] if Path(s).name in previous]
+            if known:
+                images[name] = previous[known[0]]
+                manifest.skipped(source, entry)
+                continue
+        jobs.append((name, source))
+
+    print(f"{len(names)} photos: {len(images)} up to date, {len(jobs)} to build, "
+          f"{len(missing)} missing (formats: {', '.join(formats)})")
+    for name in missing:
+        print(f"⚠️  Not found: {Path(images_dir) / name}")
+
+    built = 0
+    failed = 0
+    started = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    try:
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(build_derivatives, source, output_dir, widths, formats)
+                           for _, source in jobs]
+                for index, ((name, source), future) in enumerate(zip(jobs, futures), 1):
+                    progress = f"[{index}/{len(jobs)}]"
+                    try:
+                        entry, files, seconds = future.result()
+                    except Exception as e:
+                        print(f"{progress} ✗ Failed: {name}: {e}")
+                        failed += 1
+                        continue
+                    images[name] = entry
+                    manifest.record(TOOL, [source], params, files)
+                    print(f"{progress} ✓ {name}: {len(files)} files ({seconds:.1f}s)")
+                    built += 1
+    finally:
+        manifest.save()
+        # Photos not built this run keep their entries from earlier runs
+        merged = dict(previous)
+        merged.update(images)
+        temp_path = f"{srcset_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'widths': widths, 'formats': formats, 'images': merged}, f, indent=2)
+        os.replace(temp_path, srcset_path)
+
+    print(f"\nResponsive images complete in {time.perf_counter() - started:.1f}s!")
+    print(f"Built: {built} photos, failed: {failed}")
+    print(f"Srcset manifest: {srcset_path}")
+    manifest.report()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build multi-width JPEG/WebP/AVIF unit photos")
+    parser.add_argument('names', nargs='*',
+                        help="Photo names in images/ (default: every photo in units-data.json)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR,
+                        help=f"Where derivatives are written (default: {OUTPUT_DIR})")
+    parser.add_argument('--widths', type=int, nargs='+', default=list(WIDTHS),
+                        help=f"Widths in pixels (default: {' '.join(map(str, WIDTHS))})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: one per CPU core)")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild even photos the build manifest says are up to date")
+    args = parser.parse_args()
+    build_responsive_images(args.names, output_dir=args.output_dir, widths=args.widths,
+                            workers=args.workers, force=args.force)
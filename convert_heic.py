@@ -1,11 +1,31 @@
 """
 Convert HEIC images to JPEG format and move originals to archive
+Files are decoded and encoded in a pool of worker processes (one per core
+by default), so a phone dump converts in parallel. Progress is reported in
+input order, a file that fails doesn't stop the others, and an original is
+only archived once its JPEG has been written completely.
+
+Conversions are recorded in the image build manifest (image_manifest.py):
+a HEIC whose content was already converted with the same settings is just
+archived, and a different photo reusing a converted file's name gets a
+numbered JPEG instead of overwriting it.
+
+Each file's peak resident memory is reported, and --low-memory decodes
+with fewer full-size copies of the pixels (see decode_low_memory), for
+small machines or many workers at once.
 """
+import argparse
 import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
+from image_manifest import MANIFEST_NAME, BuildManifest
+
 try:
-    from PIL import Image
     import pillow_heif
     pillow_heif.register_heif_opener()
     HAS_HEIF = True
@@ -13,6 +33,14 @@ except ImportError:
     HAS_HEIF = False
     print("pillow-heif not installed. Attempting to install...")
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+JPEG_QUALITY = 95
+TOOL = 'convert_heic'
+
 def install_dependencies():
     """Install required packages"""
     import subprocess
@@ -24,79 +52,281 @@ def install_dependencies():
         print("Failed to install pillow-heif")
         return False
 
-def convert_heic_to_jpeg(images_dir='images', archive_dir='images/ImgArch'):
+def register_heif():
+    """Let Pillow open HEIC files in this process (also the pool's worker initializer)"""
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+
+def find_heic_files(images_path):
+    """HEIC files directly in images_path (not in subdirectories), sorted by name"""
+    # A set, as case-insensitive filesystems match both patterns
+    return sorted({path for pattern in ('*.HEIC', '*.heic') for path in images_path.glob(pattern)})
+
+def flatten(image):
+    """RGB version of image, with any transparency composited onto white"""
+    from PIL import Image
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        # getchannel() copies only the alpha band, where split() copies every band
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+def reset_peak_rss():
+    """Start a new peak memory measurement for this process where the OS allows it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, since reset_peak_rss() on Linux"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # Lifetime peak elsewhere; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def decode_image(heic_file, max_size=None):
+    """Flattened RGB image of heic_file and its metadata, through Pillow's HEIF opener"""
+    from PIL import Image
+    source = Image.open(heic_file)
+    if max_size:
+        # Decodes an embedded thumbnail instead when one is large enough
+        source.thumbnail((max_size, max_size), Image.LANCZOS)
+    return flatten(source), source.info
+
+def decode_low_memory(heic_file, max_size=None):
+    """Like decode_image(), holding as few full-size copies of the pixels as possible
+
+    The opener path keeps libheif's decoded buffer and Pillow's copy of it
+    until loading ends, then flattening allocates more. Here the decoded
+    buffer is wrapped rather than copied where Pillow allows it (RGBA and L;
+    RGB has to be widened to Pillow's 4 bytes a pixel), alpha is composited
+    straight from that buffer, and the buffer is dropped as soon as the
+    flattened image exists. With max_size, an embedded thumbnail that is
+    large enough is used without decoding the full image, and otherwise the
+    image is reduced by an integer factor before anything else is allocated.
+    """
+    import pillow_heif
+    from PIL import Image
+    if max_size:
+        source = Image.open(heic_file)
+        scale = min(max_size / source.width, max_size / source.height, 1)
+        if source.draft('RGB', (round(source.width * scale), round(source.height * scale))):
+            source.thumbnail((max_size, max_size), Image.LANCZOS)
+            return flatten(source), source.info
+        source.close()
+
+    heif_file = pillow_heif.open_heif(heic_file, remove_stride=False)
+    frame = heif_file[heif_file.primary_index]
+    info = frame.info
+    image = Image.frombuffer(frame.mode, frame.size, frame.data, 'raw', frame.mode,
+                             frame.stride, 1)
+    del frame, heif_file
+    if max_size:
+        # Keep twice the target size for a good-quality final resize
+        factor = max(image.size) // (max_size * 2)
+        if factor > 1:
+            image = image.reduce(factor)
+    image = flatten(image)
+    if max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    return image, info
+
+def convert_file(heic_file, output_path, quality=JPEG_QUALITY, optimize=False, max_size=None,
+                 low_memory=False):
+    """Write heic_file as a JPEG at output_path; return (seconds, peak RSS bytes)
+
+    Runs in a worker process. The JPEG is written to a temporary name and
+    renamed into place, so a failed encode never leaves a partial file.
+    max_size limits the longer side of the JPEG.
+    """
+    reset_peak_rss()
+    started = time.perf_counter()
+    decode = decode_low_memory if low_memory else decode_image
+    image, info = decode(heic_file, max_size)
+    save_options = {key: info[key] for key in ('exif', 'icc_profile') if info.get(key)}
+    temp_path = output_path.with_name(output_path.name + '.tmp')
+    try:
+        image.save(temp_path, 'JPEG', quality=quality, optimize=optimize, **save_options)
+        os.replace(temp_path, output_path)
+    finally:
+        image.close()
+        if temp_path.exists():
+            temp_path.unlink()
+    return time.perf_counter() - started, peak_rss()
+
+def output_path_for(heic_file, digest, manifest, claimed):
+    """<stem>.jpg, or <stem>_1.jpg... if that name holds a conversion of other content"""
+    output_path = heic_file.with_name(heic_file.stem + '.jpg')
+    counter = 1
+    while output_path in claimed or other_conversion(output_path, digest, manifest):
+        output_path = heic_file.with_name(f"{heic_file.stem}_{counter}.jpg")
+        counter += 1
+    claimed.add(output_path)
+    return output_path
+
+def other_conversion(output_path, digest, manifest):
+    entry = manifest.owner(output_path)
+    return (entry is not None and output_path.exists()
+            and digest not in entry['sources'].values())
+
+def archive_original(heic_file, archive_path):
+    """Move heic_file into archive_path, numbering it if the name is taken"""
+    archive_file = archive_path / heic_file.name
+    counter = 1
+    while archive_file.exists():
+        archive_file = archive_path / f"{heic_file.stem}_{counter}{heic_file.suffix}"
+        counter += 1
+    shutil.move(str(heic_file), str(archive_file))
+    return archive_file
+
+def archive_quietly(heic_file, archive_path):
+    """archive_original(), reporting rather than raising a failure"""
+    try:
+        archive_original(heic_file, archive_path)
+    except OSError as e:
+        print(f"⚠️  Couldn't archive {heic_file.name}: {e}")
+
+def run_jobs(jobs, workers, options):
+    """Convert (heic_file, output_path) jobs with convert_file(**options)
+
+    Yields (job, (seconds, peak RSS), error) in job order.
+    """
+    if workers <= 1:
+        for job in jobs:
+            try:
+                yield job, convert_file(*job, **options), None
+            except Exception as e:
+                yield job, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=register_heif) as executor:
+        futures = [executor.submit(convert_file, *job, **options) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                yield job, future.result(), None
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); the pool is unusable from here
+                yield job, None, RuntimeError("worker process died")
+            except Exception as e:
+                yield job, None, e
+
+def convert_heic_to_jpeg(images_dir='images', archive_dir='images/ImgArch', workers=None,
+                         quality=JPEG_QUALITY, optimize=False, force=False, max_size=None,
+                         low_memory=False):
     """Convert all HEIC files to JPEG and move originals"""
     if not HAS_HEIF:
         if install_dependencies():
             # Re-import after installation
-            from PIL import Image
-            import pillow_heif
-            pillow_heif.register_heif_opener()
+            register_heif()
         else:
             print("Cannot proceed without pillow-heif")
             return
-    
-    from PIL import Image
-    import pillow_heif
-    
+
     images_path = Path(images_dir)
     archive_path = Path(archive_dir)
-    
+
     # Ensure archive directory exists
     archive_path.mkdir(parents=True, exist_ok=True)
-    
-    # Find all HEIC files
-    heic_files = list(images_path.glob('*.HEIC')) + list(images_path.glob('*.heic'))
-    
+
+    heic_files = find_heic_files(images_path)
+
     if not heic_files:
         print("No HEIC files found in images directory")
         return
-    
-    print(f"Found {len(heic_files)} HEIC files to convert")
-    
+
+    print(f"Found {len(heic_files)} HEIC files")
+
+    manifest = BuildManifest(images_path / MANIFEST_NAME)
+    params = {'quality': quality, 'optimize': optimize}
+    if max_size:
+        params['max_size'] = max_size
+    jobs = []
+    copies = {}         # file being converted -> later files with the same content
+    first_copy = {}     # content digest -> file being converted
+    claimed = set()
+    for heic_file in heic_files:
+        entry = None if force else manifest.lookup(TOOL, [heic_file], params)
+        if entry is not None:
+            print(f"= {heic_file.name}: already converted to {', '.join(entry['outputs'])}")
+            manifest.skipped(heic_file, entry)
+            archive_quietly(heic_file, archive_path)
+            continue
+        digest = manifest.file_hash(heic_file)
+        if digest in first_copy:
+            copies[first_copy[digest]].append(heic_file)
+            continue
+        first_copy[digest] = heic_file
+        copies[heic_file] = []
+        jobs.append((heic_file, output_path_for(heic_file, digest, manifest, claimed)))
+
     converted = 0
     failed = 0
-    
-    for heic_file in heic_files:
-        try:
-            # Read HEIC file using pillow_heif
-            heif_file = pillow_heif.read_heif(str(heic_file))
-            
-            # Convert to PIL Image
-            image = Image.frombytes(
-                heif_file.mode,
-                heif_file.size,
-                heif_file.data,
-                "raw",
-            )
-            
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'LA', 'P'):
-                image = image.convert('RGB')
-            
-            # Create output filename
-            output_name = heic_file.stem + '.jpg'
-            output_path = images_path / output_name
-            
-            # Save as JPEG
-            image.save(output_path, 'JPEG', quality=95)
-            image.close()
-            
-            # Move original to archive
-            archive_file = archive_path / heic_file.name
-            heic_file.rename(archive_file)
-            
-            print(f"✓ Converted: {heic_file.name} -> {output_name}")
+    started = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if jobs:
+        print(f"Converting {len(jobs)} files ({workers} worker processes)")
+
+    try:
+        options = dict(params, low_memory=low_memory)
+        for index, ((heic_file, output_path), result, error) in enumerate(
+                run_jobs(jobs, workers, options), 1):
+            progress = f"[{index}/{len(jobs)}]"
+            if error is not None:
+                print(f"{progress} ✗ Failed to convert {heic_file.name}: {error}")
+                failed += 1 + len(copies[heic_file])
+                continue
+            # Record before archiving: the manifest hashes the source where it is now
+            entry = manifest.record(TOOL, [heic_file], params, [output_path])
+            archive_quietly(heic_file, archive_path)
+            seconds, peak = result
+            memory = f", peak RSS {peak / 2**20:.0f} MB" if peak else ""
+            print(f"{progress} ✓ Converted: {heic_file.name} -> {output_path.name} "
+                  f"({seconds:.1f}s{memory})")
             converted += 1
-            
-        except Exception as e:
-            print(f"✗ Failed to convert {heic_file.name}: {str(e)}")
-            failed += 1
-    
-    print(f"\nConversion complete!")
+            for copy in copies[heic_file]:
+                print(f"= {copy.name}: same content as {heic_file.name}")
+                manifest.skipped(copy, entry)
+                archive_quietly(copy, archive_path)
+    finally:
+        manifest.save()
+
+    print(f"\nConversion complete in {time.perf_counter() - started:.1f}s!")
     print(f"Successfully converted: {converted} files")
     print(f"Failed: {failed} files")
     print(f"Originals moved to: {archive_path}")
+    manifest.report()
 
 if __name__ == '__main__':
-    convert_heic_to_jpeg()
+    parser = argparse.ArgumentParser(description="Convert HEIC images to JPEG in parallel")
+    parser.add_argument('images_dir', nargs='?', default='images',
+                        help="Directory holding the HEIC files (default: images)")
+    parser.add_argument('--archive-dir', default='images/ImgArch',
+                        help="Where converted originals are moved (default: images/ImgArch)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: one per CPU core; 1 = no pool)")
+    parser.add_argument('--quality', type=int, default=JPEG_QUALITY,
+                        help=f"JPEG quality (default: {JPEG_QUALITY})")
+    parser.add_argument('--force', action='store_true',
+                        help="Convert even files the build manifest says are already converted")
+    parser.add_argument('--max-size', type=int, default=None, metavar='PX',
+                        help="Scale JPEGs down to fit PX x PX (default: full size)")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="Decode with fewer full-size copies of each image in memory")
+    args = parser.parse_args()
+    convert_heic_to_jpeg(args.images_dir, args.archive_dir, args.workers, args.quality,
+                         force=args.force, max_size=args.max_size, low_memory=args.low_memory)
@@ -107,4 +107,10 @@ def create_for_rent_banner():
     print(f"Banner saved successfully to {output_path}")
 
 if __name__ == "__main__":
-    create_for_rent_banner()
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_for_rent_banner,
+        inputs=[os.path.join("images", "760_Outside.jpg")],
+        outputs=[os.path.join("images", "for_rent_banner.jpg")]
+    )
@@ -226,7 +226,11 @@ def create_brand_authentic_sign(output_path, banner_width_ft, banner_height_ft,
         print(f"✗ ERROR: {e}")
 
 if __name__ == "__main__":
-    create_brand_authentic_sign(
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_brand_authentic_sign,
+        outputs=[os.path.join("images", "for_rent_sign_brand_authentic_8x4.jpg")],
         output_path=os.path.join("images", "for_rent_sign_brand_authentic_8x4.jpg"),
         banner_width_ft=8,
         banner_height_ft=4,
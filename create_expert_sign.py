@@ -126,7 +126,12 @@ def create_expert_sign(inspiration_image_path, output_path, banner_width_ft, ban
         print(f"ERROR: Failed to save the image. {e}")
 
 if __name__ == "__main__":
-    create_expert_sign(
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_expert_sign,
+        inputs=["images/IMG_3858.png"],
+        outputs=[os.path.join("images", "for_rent_sign_expert_8x4.jpg")],
         inspiration_image_path="images/IMG_3858.png",
         output_path=os.path.join("images", "for_rent_sign_expert_8x4.jpg"),
         banner_width_ft=8,
@@ -98,7 +98,12 @@ def create_final_sign_fixed(inspiration_image_path, output_path, banner_width_ft
         print(f"ERROR: Failed to save the image. {e}")
 
 if __name__ == "__main__":
-    create_final_sign_fixed(
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_final_sign_fixed,
+        inputs=["images/IMG_3858.png"],
+        outputs=[os.path.join("images", "for_rent_sign_final_fixed_8x4.jpg")],
         inspiration_image_path="images/IMG_3858.png",
         output_path=os.path.join("images", "for_rent_sign_final_fixed_8x4.jpg"),
         banner_width_ft=8,
@@ -75,4 +75,15 @@ if __name__ == "__main__":
     BANNER_HEIGHT_FEET = 4
     PRINT_DPI = 150 # 150 is a good balance for large banners viewed from a distance
 
-    create_hires_banner(SOURCE_IMAGE, OUTPUT_IMAGE, BANNER_WIDTH_FEET, BANNER_HEIGHT_FEET, PRINT_DPI)
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_hires_banner,
+        inputs=[SOURCE_IMAGE],
+        outputs=[OUTPUT_IMAGE],
+        source_path=SOURCE_IMAGE,
+        output_path=OUTPUT_IMAGE,
+        banner_width_ft=BANNER_WIDTH_FEET,
+        banner_height_ft=BANNER_HEIGHT_FEET,
+        dpi=PRINT_DPI
+    )
@@ -251,7 +251,12 @@ def create_ultra_professional_sign(output_path, banner_width_ft, banner_height_f
         print(f"✗ ERROR: Failed to save image. {e}")
 
 if __name__ == "__main__":
-    create_ultra_professional_sign(
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_ultra_professional_sign,
+        inputs=[os.path.join("images", "730_750_Outside2.jpg")],
+        outputs=[os.path.join("images", "for_rent_sign_professional_v3_8x4.jpg")],
         output_path=os.path.join("images", "for_rent_sign_professional_v3_8x4.jpg"),
         banner_width_ft=8,
         banner_height_ft=4,
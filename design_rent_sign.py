@@ -133,7 +133,12 @@ def create_for_rent_sign(output_path, banner_width_ft, banner_height_ft, dpi):
         print(f"ERROR: Failed to save the image. {e}")
 
 if __name__ == "__main__":
-    create_for_rent_sign(
+    from image_manifest import build_once
+
+    build_once(
+        __file__, create_for_rent_sign,
+        inputs=[os.path.join("images", "730_750_Outside2.jpg")],
+        outputs=[os.path.join("images", "for_rent_sign_8x4.jpg")],
         output_path=os.path.join("images", "for_rent_sign_8x4.jpg"),
         banner_width_ft=8,
         banner_height_ft=4,
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Idempotent application submission
+Double-clicks and mobile retries resend the same application; the first
+response is remembered for a while and replayed to every retry instead of
+storing the application again.
+
+A retry is recognised by its Idempotency-Key header or, without one, by a
+hash of the application content (ignoring the per-click timestamps the
+form adds). Recent keys live in a bounded in-memory TTL cache; an optional
+SQLite tier shares them between pre-forked workers and across restarts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_TTL = 600               # seconds a response is replayed for
+DEFAULT_MAX_ENTRIES = 10000
+WAIT_TIMEOUT = 30               # seconds a retry waits for the original to finish
+
+# Fields that differ between clicks of the same form submission
+VOLATILE_FIELDS = ('submissionDate', 'submissionTimestamp', 'serverTime')
+
+VALID_KEY = re.compile(r'^[\x21-\x7e]{1,255}$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_by_expiry ON idempotency_keys (expires);
+"""
+
+class IdempotencyError(Exception):
+    """An idempotency key can't be honoured; answer with status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def content_digest(application_data):
+    """Stable hash of an application, ignoring per-click timestamps"""
+    content = {k: v for k, v in application_data.items() if k not in VOLATILE_FIELDS}
+    raw = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class Claim:
+    """One submission's place in the cache
+
+    The owner does the work and calls finish() or abandon(); everyone
+    else waits on future for the owner's (status, response).
+    """
+
+    def __init__(self, key, digest, future, owner):
+        self.key = key
+        self.digest = digest
+        self.future = future
+        self.owner = owner
+
+class IdempotencyCache:
+    """Bounded TTL cache of recent submission responses"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires, digest, status, response)
+        self._inflight = {}             # key -> Claim
+        self._local = threading.local()
+        self._writes = 0
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """This thread's connection to the persistent tier"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    def _cached(self, key, now):
+        """In-memory (expires, digest, status, response) for key, or None
+
+        Call with the lock held.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry
+            del self._entries[key]
+        return None
+
+    def _stored(self, key, now):
+        """(expires, digest, status, response) for key from the SQLite tier, or None
+
+        Called without the lock so unrelated submissions don't wait on disk.
+        """
+        try:
+            row = self.connection().execute(
+                "SELECT expires, digest, status, response FROM idempotency_keys "
+                "WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️  Idempotency lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        return (row[0], row[1], row[2], json.loads(row[3]))
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _existing_claim(self, key, digest, now):
+        """A non-owner Claim if key is cached or in flight, else None
+
+        Call with the lock held.
+        """
+        entry = self._cached(key, now)
+        if entry is not None:
+            if entry[1] != digest:
+                raise IdempotencyError(422, "Idempotency-Key was already used for a "
+                                            "different application")
+            future = Future()
+            future.set_result((entry[2], entry[3]))
+            return Claim(key, digest, future, owner=False)
+        claim = self._inflight.get(key)
+        if claim is not None:
+            if claim.digest != digest:
+                raise IdempotencyError(422, "Idempotency-Key is in use for a "
+                                            "different application")
+            return Claim(key, digest, claim.future, owner=False)
+        return None
+
+    def begin(self, idempotency_key, application_data):
+        """Claim a submission, or find the response it already got
+
+        Raises IdempotencyError for a malformed key or a key reused with a
+        different application.
+        """
+        if idempotency_key is not None and not VALID_KEY.match(idempotency_key):
+            raise IdempotencyError(400, "Invalid Idempotency-Key")
+        digest = content_digest(application_data)
+        key = f"key:{idempotency_key}" if idempotency_key else f"sha256:{digest}"
+
+        now = time.time()
+        if self.path:
+            with self._lock:
+                claim = self._existing_claim(key, digest, now)
+            if claim is not None:
+                return claim
+            entry = self._stored(key, now)
+        else:
+            entry = None
+        with self._lock:
+            if entry is not None and key not in self._entries:
+                self._remember(key, entry)
+            # Another thread may have claimed or finished key while SQLite was queried
+            claim = self._existing_claim(key, digest, now)
+            if claim is not None:
+                return claim
+            claim = Claim(key, digest, Future(), owner=True)
+            self._inflight[key] = claim
+            return claim
+
+    def finish(self, claim, status, response):
+        """Record the owner's response and release anyone waiting on it"""
+        entry = (time.time() + self.ttl, claim.digest, status, response)
+        with self._lock:
+            self._remember(claim.key, entry)
+            del self._inflight[claim.key]
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        claim.future.set_result((status, response))
+        if self.path:
+            try:
+                conn = self.connection()
+                conn.execute("INSERT OR REPLACE INTO idempotency_keys "
+                             "(key, digest, status, response, expires) VALUES (?, ?, ?, ?, ?)",
+                             (claim.key, claim.digest, status, json.dumps(response), entry[0]))
+                if prune:
+                    conn.execute("DELETE FROM idempotency_keys WHERE expires <= ?", (time.time(),))
+            except sqlite3.Error as e:
+                print(f"⚠️  Idempotency record failed: {e}")
+
+    def abandon(self, claim, error):
+        """The owner failed; waiting retries get the error, later ones start over"""
+        with self._lock:
+            del self._inflight[claim.key]
+        claim.future.set_exception(error)
+
+    def __len__(self):
+        return len(self._entries)
+
+# Process-wide cache (see configure_idempotency)
+_cache = None
+
+def configure_idempotency(ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+    """Remember submission responses for ttl seconds (ttl=0 disables)"""
+    global _cache
+    _cache = IdempotencyCache(ttl, max_entries, path) if ttl > 0 else None
+    return _cache
+
+def get_idempotency_cache():
+    """The submission response cache, or None when deduplication is off"""
+    return _cache
+
+def add_idempotency_arguments(parser):
+    """Add the duplicate-submission options shared by the servers to an argparse parser"""
+    group = parser.add_argument_group('duplicate submissions')
+    group.add_argument('--idempotency-ttl', type=float, default=DEFAULT_TTL,
+                       help="Seconds a submission's response is replayed to retries with the "
+                            f"same Idempotency-Key or content; 0 disables (default: {DEFAULT_TTL})")
+    group.add_argument('--idempotency-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                       help=f"Responses kept in memory (default: {DEFAULT_MAX_ENTRIES})")
+    group.add_argument('--idempotency-db', default=None,
+                       help="SQLite file that also keeps them, shared by workers and restarts")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Content-addressed build manifest for the image tools
+Each build step is keyed by the tool, the SHA-256 of its source files and
+its processing parameters, and remembers the outputs it wrote (with their
+hashes). A step whose key is known and whose outputs are still on disk
+unchanged is skipped, whatever the sources are called now - so re-running
+a tool only redoes new or changed work, and a re-uploaded copy of a photo
+is recognised as a duplicate rather than converted again.
+
+The manifest lives at images/.build-manifest.json. It also caches file
+hashes by size and mtime, so unchanged files aren't re-read on every run.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_PATH = os.path.join('images', MANIFEST_NAME)
+MANIFEST_VERSION = 1
+MISSING = 'missing'     # digest recorded for a source that doesn't exist
+
+def path_key(path):
+    return Path(path).as_posix()
+
+def read_manifest(path):
+    """The (builds, hashes) stored at path; empty if there is no usable manifest"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}, {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Ignoring unreadable build manifest {path}: {e}")
+        return {}, {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}, {}
+    return data.get('builds', {}), data.get('hashes', {})
+
+class BuildManifest:
+    """Build steps recorded in a manifest file, plus what this run did"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.builds, self.hashes = read_manifest(path)
+        # builds: key -> {tool, sources, params, outputs, built}
+        # hashes: path -> [size, mtime_ns, digest]
+        self.rebuilt = []       # outputs written this run
+        self.unchanged = []     # sources skipped as already built
+        self.duplicates = []    # (source, earlier source with the same content)
+        self._dirty = set()     # keys added or removed since loading
+
+    def file_hash(self, path):
+        """SHA-256 of a file's content, from the cache when size and mtime match"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return MISSING
+        name = path_key(path)
+        cached = self.hashes.get(name)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            # hashlib.file_digest() would need Python 3.11
+            for block in iter(lambda: f.read(1 << 16), b''):
+                sha256.update(block)
+        digest = sha256.hexdigest()
+        self.hashes[name] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    @staticmethod
+    def build_key(tool, digests, params):
+        material = json.dumps([tool, digests, params], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def lookup(self, tool, sources, params):
+        """The recorded build of sources with params, if its outputs are all still current"""
+        entry = self.builds.get(self.build_key(tool, [self.file_hash(s) for s in sources], params))
+        if entry is None:
+            return None
+        for output, digest in entry['outputs'].items():
+            if self.file_hash(output) != digest:
+                return None
+        return entry
+
+    def owner(self, output):
+        """The recorded build that wrote output, if any"""
+        name = path_key(output)
+        for entry in self.builds.values():
+            if name in entry['outputs']:
+                return entry
+        return None
+
+    def record(self, tool, sources, params, outputs):
+        """Remember that sources were built into outputs with params; return the entry"""
+        digests = [self.file_hash(s) for s in sources]
+        key = self.build_key(tool, digests, params)
+        names = {path_key(output) for output in outputs}
+        # An output belongs to one build; drop it from older builds that wrote it
+        for old_key, entry in list(self.builds.items()):
+            if old_key != key and names & set(entry['outputs']):
+                del self.builds[old_key]
+                self._dirty.add(old_key)
+        self.builds[key] = {
+            'tool': tool,
+            'sources': {path_key(s): d for s, d in zip(sources, digests)},
+            'params': params,
+            'outputs': {path_key(output): self.file_hash(output) for output in outputs},
+            'built': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        self._dirty.add(key)
+        self.rebuilt.extend(sorted(names))
+        return self.builds[key]
+
+    def skipped(self, source, entry):
+        """Note a source that wasn't rebuilt because entry already covers it"""
+        earlier = [s for s in entry['sources'] if s != path_key(source)]
+        if path_key(source) in entry['sources'] or not earlier:
+            self.unchanged.append(path_key(source))
+        else:
+            self.duplicates.append((path_key(source), earlier[0]))
+
+    def save(self):
+        """Write the manifest, merging builds recorded meanwhile by other runs"""
+        builds, hashes = read_manifest(self.path)
+        for key in self._dirty:
+            if key in self.builds:
+                builds[key] = self.builds[key]
+            else:
+                builds.pop(key, None)
+        hashes.update(self.hashes)
+        hashes = {name: cached for name, cached in hashes.items() if os.path.exists(name)}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'builds': builds, 'hashes': hashes},
+                      f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.builds = builds
+        self.hashes = hashes
+        self._dirty.clear()
+
+    def report(self):
+        """Print what this run rebuilt and what it skipped"""
+        print(f"📋 Build manifest: {len(self.rebuilt)} rebuilt, "
+              f"{len(self.unchanged)} up to date, {len(self.duplicates)} duplicates")
+        for output in self.rebuilt:
+            print(f"   rebuilt:   {output}")
+        for source, earlier in self.duplicates:
+            print(f"   duplicate: {source} (same content as {earlier})")
+
+def build_once(script, build, inputs=(), outputs=(), **params):
+    """Call build(**params) unless the manifest has outputs current for these inputs
+
+    The script itself counts as an input, so editing it triggers a rebuild.
+    Returns True if build() ran.
+    """
+    manifest = BuildManifest()
+    tool = os.path.basename(script)
+    sources = [script] + list(inputs)
+    entry = manifest.lookup(tool, sources, params)
+    if entry is not None:
+        manifest.skipped(script, entry)
+        print(f"= Up to date: {', '.join(entry['outputs'])} (delete it to force a rebuild)")
+        return False
+
+    before = {output: os.stat(output).st_mtime_ns if os.path.exists(output) else None
+              for output in outputs}
+    build(**params)
+    # The sign scripts report their own failures without raising
+    if outputs and all(os.path.exists(output) and os.stat(output).st_mtime_ns != before[output]
+                       for output in outputs):
+        manifest.record(tool, sources, params, outputs)
+        manifest.save()
+    manifest.report()
+    return True
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+On-demand image resizing for server.py
+/img/<name>?w=800&fmt=webp serves images/<name> scaled to 800 px wide,
+resized on its first request and kept in a size-capped disk cache after
+that. Only whitelisted widths are accepted, so clients can't fill the cache
+with arbitrary sizes, and requests for a variant that is being resized wait
+for that resize instead of starting their own. fmt may be jpeg, webp, avif
+(when Pillow can encode it) or auto (the default), which picks the best
+format the client's Accept header allows.
+
+The cache's LRU index is kept in memory and rebuilt from the directory at
+start-up, oldest access first. Pre-forked workers share the directory, and
+each picks up variants the others wrote, but each enforces the size cap
+with its own index.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http import HTTPStatus
+from urllib.parse import unquote
+
+import metrics
+from build_responsive_images import FORMATS, ROTATED_ORIENTATIONS
+
+try:
+    from PIL import Image, ImageOps
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+IMAGE_PREFIX = '/img/'
+IMAGES_DIR = 'images'
+DEFAULT_CACHE_DIR = '.image-cache'
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+ALLOWED_WIDTHS = (320, 400, 640, 800, 1200, 1600)
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+CACHE_MAX_AGE = 7 * 24 * 3600   # variants of a changed source get a new ETag anyway
+
+class ImageRequestError(Exception):
+    """An /img/ request can't be served; answer with status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def encodable_formats():
+    """The FORMATS this Pillow build can write, best compression first"""
+    Image.init()
+    return tuple(name for name in FORMATS if name.upper() in Image.SAVE)
+
+def negotiate_format(accept, formats):
+    """The best of formats the Accept header allows; JPEG when it names none"""
+    accepted = set()
+    for item in (accept or '').split(','):
+        media_type, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(media_type.strip().lower())
+    for name in formats:
+        if FORMATS[name][1] in accepted:
+            return name
+    return 'jpeg'
+
+class ImageVariant:
+    """One width and format of a source image"""
+
+    def __init__(self, source, stat, width, image_format, negotiated):
+        self.source = source
+        self.stat = stat
+        self.width = width
+        self.format = image_format
+        self.negotiated = negotiated
+        extension, self.content_type, options = FORMATS[image_format]
+        key = '\0'.join(map(str, (os.path.basename(source), stat.st_mtime_ns, stat.st_size,
+                                  width, image_format, sorted(options.items()))))
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        self.filename = f"{digest}.{extension}"
+        self.etag = f'"{digest}"'
+
+    def build(self, path):
+        """Write the variant to path, never scaling the source up"""
+        started = time.perf_counter()
+        extension, _, options = FORMATS[self.format]
+        with Image.open(self.source) as image:
+            rotated = image.getexif().get(0x0112) in ROTATED_ORIENTATIONS
+            source_width, source_height = image.size[::-1] if rotated else image.size
+            width = min(self.width, source_width)
+            size = (width, max(1, round(width * source_height / source_width)))
+            # JPEG sources decode straight to a reduced scale
+            image.draft('RGB', size[::-1] if rotated else size)
+            icc_profile = image.info.get('icc_profile')
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        resized = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        if has_alpha and self.format == 'jpeg':
+            flattened = Image.new('RGB', resized.size, (255, 255, 255))
+            flattened.paste(resized, mask=resized.split()[-1])
+            resized = flattened
+        extra = {'icc_profile': icc_profile} if icc_profile else {}
+        resized.save(path, self.format.upper(), **options, **extra)
+        metrics.observe('image_resize_duration_seconds', time.perf_counter() - started,
+                        (('format', self.format),))
+
+def parse_image_request(path, query, accept, widths=ALLOWED_WIDTHS, images_dir=IMAGES_DIR):
+    """The ImageVariant an /img/<name>?w=&fmt= request asks for"""
+    if not HAS_PIL:
+        raise ImageRequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Image resizing needs Pillow")
+    name = unquote(path[len(IMAGE_PREFIX):])
+    if (not name or '/' in name or '\\' in name or '\0' in name or name.startswith('.')
+            or not name.lower().endswith(SOURCE_EXTENSIONS)):
+        raise ImageRequestError(HTTPStatus.NOT_FOUND, "Image not found")
+    try:
+        width = int(query.get('w', [''])[0])
+    except ValueError:
+        width = None
+    if width not in widths:
+        raise ImageRequestError(HTTPStatus.BAD_REQUEST,
+                                f"w must be one of {', '.join(map(str, widths))}")
+    formats = encodable_formats()
+    image_format = query.get('fmt', ['auto'])[0].lower()
+    if image_format == 'jpg':
+        image_format = 'jpeg'
+    negotiated = image_format == 'auto'
+    if negotiated:
+        image_format = negotiate_format(accept, formats)
+    elif image_format not in formats:
+        raise ImageRequestError(HTTPStatus.BAD_REQUEST,
+                                f"fmt must be auto or one of {', '.join(formats)}")
+    source = os.path.join(images_dir, name)
+    try:
+        st = os.stat(source)
+    except OSError:
+        raise ImageRequestError(HTTPStatus.NOT_FOUND, "Image not found")
+    return ImageVariant(source, st, width, image_format, negotiated)
+
+class ImageVariantCache:
+    """Size-capped LRU directory of resized images with single-flight creation"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES,
+                 widths=ALLOWED_WIDTHS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.widths = tuple(sorted(widths))
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self._entries = OrderedDict()   # filename -> size, least recently used first
+        self._building = {}             # filename -> Future of its path
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        """Index the files already in the directory, least recently used first"""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    found.append((max(st.st_atime, st.st_mtime), entry.name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.current_bytes += size
+        self._evict()
+
+    def _touch(self, name, size):
+        old = self._entries.pop(name, None)
+        if old is not None:
+            self.current_bytes -= old
+        self._entries[name] = size
+        self.current_bytes += size
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits (keeping the newest)"""
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def path(self, variant):
+        """Path of the cached file for variant, resizing the source first on a miss"""
+        path = os.path.join(self.directory, variant.filename)
+        with self._lock:
+            building = self._building.get(variant.filename)
+            if building is None:
+                try:
+                    # Also finds variants another worker process wrote
+                    size = os.stat(path).st_size
+                except FileNotFoundError:
+                    size = None
+                if size is not None:
+                    self._touch(variant.filename, size)
+                    self.hits += 1
+                    return path
+                old = self._entries.pop(variant.filename, None)
+                if old is not None:
+                    # Evicted by another worker process
+                    self.current_bytes -= old
+                self.misses += 1
+                building = self._building[variant.filename] = Future()
+                leader = True
+            else:
+                self.waits += 1
+                leader = False
+        if not leader:
+            metrics.inc('image_resize_waits_total')
+            return building.result()
+
+        temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            try:
+                variant.build(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+            size = os.stat(path).st_size
+            with self._lock:
+                self._touch(variant.filename, size)
+                self._evict()
+            building.set_result(path)
+            return path
+        except BaseException as e:
+            building.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._building[variant.filename]
+
+    def open(self, variant):
+        """Open the cached file for variant, resizing first on a miss"""
+        try:
+            return open(self.path(variant), 'rb')
+        except FileNotFoundError:
+            # Evicted between lookup and open; create it again
+            return open(self.path(variant), 'rb')
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+def add_image_arguments(parser):
+    """Add the /img/ resizing options to an argparse parser"""
+    group = parser.add_argument_group('image resizing')
+    group.add_argument('--image-cache-dir', default=DEFAULT_CACHE_DIR,
+                       help=f"Where resized /img/ variants are kept (default: {DEFAULT_CACHE_DIR})")
+    group.add_argument('--image-cache-bytes', type=int, default=DEFAULT_CACHE_BYTES,
+                       help=f"Size cap of the variant cache, 0 disables /img/ "
+                            f"(default: {DEFAULT_CACHE_BYTES})")
+    group.add_argument('--image-widths', type=int, nargs='+', default=list(ALLOWED_WIDTHS),
+                       help=f"Widths /img/ accepts for ?w= "
+                            f"(default: {' '.join(map(str, ALLOWED_WIDTHS))})")
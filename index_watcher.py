@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Filesystem-watch indexer for applications/ and appointments/
+Applications and appointments are also written by the PHP handlers, so this
+keeps the SQLite index current no matter who writes: inotify (or polling
+where inotify isn't available) reports which JSON files were created,
+modified or deleted, and only those files are re-parsed.
+
+Run it alongside the web servers:
+    python3 index_watcher.py [--poll] [--interval 2]
+or start it inside server.py with --watch-index.
+"""
+
+import argparse
+import ctypes
+import errno
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+from application_index import APPOINTMENTS_DIR, INDEX_PATH, ApplicationIndex
+from application_store import SUBMISSIONS_DIR
+
+DEFAULT_POLL_INTERVAL = 2.0     # seconds between polling scans
+DEBOUNCE = 0.1                  # seconds to gather a burst of events into one batch
+
+# kind -> (directory, filename prefix); only *.json files directly inside count
+SOURCES = {
+    'applications': (SUBMISSIONS_DIR, ''),
+    'appointments': (APPOINTMENTS_DIR, 'apt_'),
+}
+
+# Returned by a watcher instead of a batch when it lost track of changes
+RESYNC = None
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+INOTIFY_EVENT = struct.Struct('iIII')   # wd, mask, cookie, name length
+
+def is_source_file(kind, name):
+    """Whether a directory entry is one of the JSON documents for kind"""
+    prefix = SOURCES[kind][1]
+    return name.endswith('.json') and name.startswith(prefix) and not name.startswith('.')
+
+def file_state(st):
+    """What decides whether a file needs re-parsing"""
+    return st.st_mtime_ns, st.st_size
+
+def scan_directory(kind, directory):
+    """{filename: state} for every source file in directory"""
+    states = {}
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return states
+    with entries:
+        for entry in entries:
+            if is_source_file(kind, entry.name):
+                try:
+                    if entry.is_file():
+                        states[entry.name] = file_state(entry.stat())
+                except FileNotFoundError:
+                    pass
+    return states
+
+class InotifyWatcher:
+    """Report changed files using Linux inotify"""
+
+    def __init__(self, sources):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.sources = sources
+        self._kinds = {}
+        try:
+            for kind in sources:
+                self._watch(kind)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _watch(self, kind):
+        directory = self.sources[kind][0]
+        os.makedirs(directory, exist_ok=True)
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+        self._kinds[wd] = kind
+
+    def rewatch(self):
+        """Watch again any directory whose watch the kernel dropped
+
+        A deleted (or unmounted) directory loses its watch, so one created
+        again at the same path has to be added anew.
+        """
+        for kind, (directory, _) in self.sources.items():
+            if kind not in self._kinds.values():
+                print(f"👀 Watching {directory} again")
+                self._watch(kind)
+
+    def wait(self, timeout=None):
+        """Block until something changes; return {(kind, name)} or RESYNC"""
+        changed = set()
+        deadline = None
+        while True:
+            remaining = timeout if deadline is None else max(0, deadline - time.monotonic())
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return changed
+            data = os.read(self._fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+                offset += length
+                if mask & (IN_DELETE_SELF | IN_IGNORED):
+                    # The kernel has dropped (or is about to drop) this watch
+                    self._kinds.pop(wd, None)
+                    return RESYNC
+                if mask & IN_Q_OVERFLOW:
+                    return RESYNC
+                kind = self._kinds.get(wd)
+                if kind and is_source_file(kind, name):
+                    changed.add((kind, name))
+            if changed and deadline is None:
+                deadline = time.monotonic() + DEBOUNCE
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Report changed files by comparing directory listings
+
+    The fallback where inotify is unavailable (other platforms, some network
+    filesystems). Each scan only stats entries; files are still re-parsed
+    only when their mtime or size changed.
+    """
+
+    def __init__(self, sources, interval=DEFAULT_POLL_INTERVAL):
+        self.sources = sources
+        self.interval = interval
+        self._states = {kind: scan_directory(kind, directory)
+                        for kind, (directory, _) in sources.items()}
+
+    def wait(self, timeout=None):
+        """Sleep one interval and return the {(kind, name)} that changed"""
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        changed = set()
+        for kind, (directory, _) in self.sources.items():
+            states = scan_directory(kind, directory)
+            previous = self._states[kind]
+            changed.update((kind, name) for name in states.keys() | previous.keys()
+                           if states.get(name) != previous.get(name))
+            self._states[kind] = states
+        return changed
+
+    def rewatch(self):
+        pass
+
+    def close(self):
+        pass
+
+def create_watcher(sources=SOURCES, poll=False, interval=DEFAULT_POLL_INTERVAL):
+    """inotify watcher when possible, else a polling one"""
+    if not poll:
+        try:
+            return InotifyWatcher(sources)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify unavailable ({e}); polling every {interval}s")
+    return PollingWatcher(sources, interval)
+
+class IndexWatcher:
+    """Apply changed application and appointment files to the index"""
+
+    def __init__(self, index, sources=SOURCES):
+        self.index = index
+        self.sources = sources
+        self._states = {}
+        self._stopped = threading.Event()
+
+    def reconcile(self):
+        """Catch up with changes made while nobody was watching
+
+        Compares each directory listing with the recorded file states and
+        re-parses only the files that differ.
+        """
+        changed = set()
+        for kind, (directory, _) in self.sources.items():
+            self._states[kind] = self.index.file_states(kind)
+            on_disk = scan_directory(kind, directory)
+            known = self._states[kind]
+            changed.update((kind, name) for name in on_disk.keys() | known.keys()
+                           if on_disk.get(name) != known.get(name))
+        return self.apply(changed)
+
+    def apply(self, changed):
+        """Re-index the given (kind, name) files in one transaction"""
+        updated = removed = 0
+        with self.index.transaction():
+            for kind, name in sorted(changed):
+                path = os.path.join(self.sources[kind][0], name)
+                known = self._states[kind]
+                try:
+                    with open(path, 'rb') as f:
+                        state = file_state(os.fstat(f.fileno()))
+                        if known.get(name) == state:
+                            continue
+                        document = json.load(f)
+                except FileNotFoundError:
+                    if name in known:
+                        self._remove(kind, name)
+                        removed += 1
+                    continue
+                except (OSError, ValueError) as e:
+                    # Probably caught mid-write; its next write brings it back here
+                    print(f"⚠️  Skipping {path}: {e}")
+                    continue
+                if not isinstance(document, dict):
+                    continue
+                if kind == 'applications':
+                    self.index.add(name, document)
+                else:
+                    self.index.add_appointment(name, document)
+                self.index.record_file(kind, name, state)
+                known[name] = state
+                updated += 1
+        return updated, removed
+
+    def _remove(self, kind, name):
+        if kind == 'applications':
+            self.index.remove(name)
+        else:
+            self.index.remove_appointment(name)
+        self.index.forget_file(kind, name)
+        del self._states[kind][name]
+
+    def run(self, watcher):
+        """Reconcile, then follow watcher until stop() is called"""
+        updated, removed = self.reconcile()
+        print(f"🗂️  Index reconciled: {updated} updated, {removed} removed")
+        while not self._stopped.is_set():
+            changed = watcher.wait(timeout=1.0)
+            if changed is RESYNC:
+                print("⚠️  Lost track of file events; reconciling")
+                try:
+                    watcher.rewatch()
+                except OSError as e:
+                    print(f"❌ Can't watch again, index may go stale: {e}")
+                updated, removed = self.reconcile()
+            elif changed:
+                updated, removed = self.apply(changed)
+            else:
+                continue
+            if updated or removed:
+                print(f"🗂️  Index: {updated} updated, {removed} removed")
+
+    def stop(self):
+        self._stopped.set()
+
+def start_watcher(index, poll=False, interval=DEFAULT_POLL_INTERVAL):
+    """Run an IndexWatcher in a daemon thread of this process"""
+    watcher = create_watcher(SOURCES, poll, interval)
+    indexer = IndexWatcher(index)
+    thread = threading.Thread(target=indexer.run, args=(watcher,), name='index-watcher',
+                              daemon=True)
+    thread.start()
+    return indexer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Keep the application index in sync with "
+                                                 "applications/ and appointments/")
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--poll', action='store_true', help="Poll instead of using inotify")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Polling interval in seconds (default: {DEFAULT_POLL_INTERVAL})")
+    args = parser.parse_args()
+
+    watcher = create_watcher(SOURCES, args.poll, args.interval)
+    indexer = IndexWatcher(ApplicationIndex(args.index))
+    print(f"👀 Watching {', '.join(d for d, _ in SOURCES.values())} "
+          f"({type(watcher).__name__})")
+    try:
+        indexer.run(watcher)
+    except KeyboardInterrupt:
+        print("\n\n✅ Index watcher stopped")
+    finally:
+        watcher.close()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Graceful shutdown and zero-downtime reload support for server.py
+SIGTERM stops accepting, lets in-flight requests finish (up to a drain
+deadline), flushes queued submissions and exits. SIGHUP first starts a
+fresh copy of the server, with the same command line, that inherits the
+listening socket; once the new process reports it is serving, the old one
+drains and exits the same way. Connections are never refused in between.
+
+The replacement is a new process with a new PID, so supervisors that
+track the PID should reload with their own mechanism instead of SIGHUP.
+"""
+
+import os
+import select
+import socket
+import subprocess
+import sys
+
+LISTEN_FDS_ENV = 'PEPPERTREE_LISTEN_FDS'
+READY_FD_ENV = 'PEPPERTREE_READY_FD'
+DEFAULT_DRAIN_TIMEOUT = 30.0    # seconds in-flight requests get to finish
+READY_TIMEOUT = 30.0            # seconds a replacement gets to start serving
+
+def inherited_sockets():
+    """The listening sockets handed over by the process being replaced, if any"""
+    fds = os.environ.pop(LISTEN_FDS_ENV, '')
+    return [socket.socket(fileno=int(fd)) for fd in fds.split(',') if fd]
+
+def notify_ready():
+    """Tell the process being replaced that this one is serving"""
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is None:
+        return
+    try:
+        os.write(int(fd), b'1')
+    except OSError:
+        pass
+    finally:
+        os.close(int(fd))
+
+def spawn_replacement(listen_sockets, timeout=READY_TIMEOUT):
+    """Start a new copy of this server on listen_sockets; return it once it's serving
+
+    Returns None, leaving this process in charge, if the new one exits or
+    doesn't report ready within timeout (e.g. the new code doesn't start).
+    """
+    ready_read, ready_write = os.pipe()
+    fds = [sock.fileno() for sock in listen_sockets]
+    env = dict(os.environ, **{LISTEN_FDS_ENV: ','.join(map(str, fds)),
+                              READY_FD_ENV: str(ready_write)})
+    try:
+        process = subprocess.Popen([sys.executable] + sys.argv, env=env,
+                                   pass_fds=(*fds, ready_write))
+    except OSError as e:
+        print(f"❌ Reload failed: {e}")
+        os.close(ready_read)
+        os.close(ready_write)
+        return None
+    os.close(ready_write)
+    try:
+        readable = select.select([ready_read], [], [], timeout)[0]
+        ready = bool(readable) and os.read(ready_read, 1) == b'1'
+    finally:
+        os.close(ready_read)
+    if not ready:
+        print(f"❌ Reload failed: replacement (pid {process.pid}) didn't start serving")
+        if process.poll() is None:
+            process.terminate()
+        return None
+    print(f"🔄 Replacement serving as pid {process.pid}; draining this process")
+    return process
+
+def add_lifecycle_arguments(parser):
+    """Add the shutdown options to an argparse parser"""
+    parser.add_argument('--drain-timeout', type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help=f"Seconds in-flight requests get to finish on SIGTERM/SIGHUP "
+                             f"before their connections are cut (default: {DEFAULT_DRAIN_TIMEOUT})")
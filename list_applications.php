@@ -60,7 +60,7 @@ try {
             'email' => $data['email'] ?? '',
             'cellPhone' => $data['cellPhone'] ?? '',
             'homePhone' => $data['homePhone'] ?? '',
-            'desiredMoveIn' => $data['desiredMoveIn'] ?? ''
+            'desiredMoveIn' => $data['desiredMoveIn'] ?? ($data['moveInDate'] ?? '')
         ];
     }
 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for the Python servers
+Counters and histograms are kept in per-thread shards, so the hot path is
+a couple of dict updates with no lock; shards are summed when /metrics is
+scraped. Gauges that already live elsewhere (queue depth, cache sizes) are
+read at scrape time through collector callbacks.
+
+Counts are per process: in pre-forked mode each scrape is answered by, and
+describes, one worker.
+"""
+
+import bisect
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers cached static hits (~100µs) through slow fsyncs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+class Registry:
+    """Metric families and the per-thread shards holding their values"""
+
+    def __init__(self):
+        self._families = {}         # name -> (type, help, buckets)
+        self._shards = []
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def declare(self, name, kind, help_text, buckets=DEFAULT_BUCKETS):
+        """Describe a metric family (kind: counter, gauge or histogram)"""
+        self._families[name] = (kind, help_text, buckets)
+
+    def add_collector(self, collect):
+        """Call collect() at scrape time; it returns [(name, labels, value)] for declared gauges"""
+        self._collectors.append(collect)
+
+    def _shard(self):
+        """This thread's value dicts, registered on first use"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})        # counters, histograms
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Add to a counter (or a gauge kept as a running sum)"""
+        counters = self._shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Record one histogram sample"""
+        histograms = self._shard()[1]
+        key = (name, labels)
+        state = histograms.get(key)
+        if state is None:
+            buckets = self._families[name][2]
+            state = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self._families[name][2], value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _merged(self):
+        """Sum every shard's values"""
+        with self._lock:
+            shards = list(self._shards)
+        counters = {}
+        histograms = {}
+        for shard_counters, shard_histograms in shards:
+            # dict.copy() is atomic under the GIL, so writers never need a lock
+            for key, value in shard_counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, (bucket_counts, total, count) in shard_histograms.copy().items():
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                for i, n in enumerate(list(bucket_counts)):
+                    merged[0][i] += n
+                merged[1] += total
+                merged[2] += count
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    counters[(name, labels)] = value
+            except Exception as e:
+                print(f"⚠️  Metrics collector failed: {e}")
+        return counters, histograms
+
+    def render(self):
+        """The Prometheus text exposition of every family"""
+        counters, histograms = self._merged()
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._families.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (family, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                    if family != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(buckets + (float('inf'),), bucket_counts):
+                        cumulative += n
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {total!r}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+            else:
+                for (family, labels), value in sorted(counters.items()):
+                    if family == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels):
+    """{a="b",...} for a tuple of (name, value) pairs"""
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+REGISTRY = Registry()
+
+REGISTRY.declare('http_requests_total', 'counter', "HTTP requests answered, by route, method and status")
+REGISTRY.declare('http_request_duration_seconds', 'histogram',
+                 "Time from parsed request to response sent, by route")
+REGISTRY.declare('http_response_bytes_total', 'counter', "Response body bytes sent, by route")
+REGISTRY.declare('http_requests_in_flight', 'gauge', "Requests currently being handled")
+REGISTRY.declare('application_save_duration_seconds', 'histogram',
+                 "Time to persist applications, per inline save or queued batch")
+REGISTRY.declare('applications_saved_total', 'counter', "Applications persisted")
+REGISTRY.declare('idempotent_replays_total', 'counter',
+                 "Duplicate submissions answered from the idempotency cache")
+REGISTRY.declare('rate_limited_total', 'counter', "Requests refused by the rate limiter, by budget")
+REGISTRY.declare('submission_queue_depth', 'gauge', "Applications waiting for the writer thread")
+REGISTRY.declare('cache_hits_total', 'counter', "In-memory response cache hits, by cache")
+REGISTRY.declare('cache_misses_total', 'counter', "In-memory response cache misses, by cache")
+REGISTRY.declare('cache_hit_ratio', 'gauge', "Hits / lookups since start, by cache")
+REGISTRY.declare('cache_bytes', 'gauge', "Bytes held, by cache")
+REGISTRY.declare('image_resize_duration_seconds', 'histogram',
+                 "Time to resize and encode one /img/ variant, by format")
+REGISTRY.declare('image_resize_waits_total', 'counter',
+                 "/img/ requests that waited for another request's resize of the same variant")
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+add_collector = REGISTRY.add_collector
+render = REGISTRY.render
+
+# Methods reported by name; anything else a client sends is 'other'
+METHOD_LABELS = frozenset(['GET', 'HEAD', 'POST', 'OPTIONS'])
+
+def request_started():
+    """Mark a request in flight; pass the result to request_finished()"""
+    inc('http_requests_in_flight')
+    return time.perf_counter()
+
+def request_finished(started, route, method, status, body_bytes):
+    """Record a finished request started with request_started(); return its duration"""
+    duration = time.perf_counter() - started
+    inc('http_requests_in_flight', value=-1)
+    inc('http_requests_total', (('route', route), ('method', method_label(method)),
+                                ('status', str(status))))
+    observe('http_request_duration_seconds', duration, (('route', route),))
+    if body_bytes:
+        inc('http_response_bytes_total', (('route', route),), body_bytes)
+    return duration
+
+def route_label(path, routes):
+    """Bounded route label: a known endpoint, else 'static'"""
+    return path if path in routes else 'static'
+
+def method_label(method):
+    """Bounded method label: a method the servers handle, else 'other'"""
+    return method if method in METHOD_LABELS else 'other'
+
+def cache_collector(name, get_cache):
+    """Collector exposing the counters of the StaticFileCache get_cache() returns"""
+    labels = (('cache', name),)
+
+    def collect():
+        cache = get_cache()
+        if cache is None:
+            return []
+        stats = cache.stats()
+        return [('cache_hits_total', labels, stats['hits']),
+                ('cache_misses_total', labels, stats['misses']),
+                ('cache_hit_ratio', labels, stats['hit_ratio']),
+                ('cache_bytes', labels, stats['bytes'])]
+    return collect
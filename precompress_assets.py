@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Write precompressed .gz (and .br when brotli is installed) siblings for the
+site's text assets so server.py can send them without compressing per request
+"""
+
+import argparse
+import gzip
+import os
+from pathlib import Path
+
+from static_files import COMPRESSIBLE_EXTENSIONS
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+# Directories that never hold served text assets
+SKIP_DIRS = {'.git', '__pycache__', 'applications', 'appointments', 'images', 'videos'}
+
+def find_assets(root):
+    """Yield text assets under root that should have compressed siblings"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+        for name in sorted(filenames):
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                yield Path(dirpath) / name
+
+def write_variant(source, data, suffix, compress):
+    """Write one compressed sibling if it is missing or stale; return True if written"""
+    target = source.with_name(source.name + suffix)
+    source_stat = source.stat()
+    if target.exists() and target.stat().st_mtime_ns >= source_stat.st_mtime_ns:
+        return False
+
+    compressed = compress(data)
+    if len(compressed) >= len(data):
+        # Not worth it - drop any stale sibling so the original is served
+        if target.exists():
+            target.unlink()
+        return False
+
+    tmp = target.with_name(target.name + '.tmp')
+    tmp.write_bytes(compressed)
+    os.replace(tmp, target)
+    # Match the source mtime so the server sees the sibling as up to date
+    os.utime(target, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return True
+
+def precompress(root='.', level=9):
+    """Compress every text asset under root"""
+    written = 0
+    skipped = 0
+    for source in find_assets(root):
+        data = source.read_bytes()
+        variants = [('.gz', lambda d: gzip.compress(d, compresslevel=level, mtime=0))]
+        if HAS_BROTLI:
+            variants.append(('.br', lambda d: brotli.compress(d, quality=11)))
+        for suffix, compress in variants:
+            if write_variant(source, data, suffix, compress):
+                print(f"✓ {source}{suffix}")
+                written += 1
+            else:
+                skipped += 1
+
+    print("\nPrecompression complete!")
+    print(f"Written: {written} files")
+    print(f"Up to date / not worth compressing: {skipped}")
+    if not HAS_BROTLI:
+        print("brotli not installed - only .gz variants were written")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompress text assets for server.py")
+    parser.add_argument('root', nargs='?', default='.', help="Site directory (default: .)")
+    parser.add_argument('--level', type=int, default=9, help="gzip compression level (default: 9)")
+    args = parser.parse_args()
+    precompress(args.root, args.level)
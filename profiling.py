@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for the Python servers
+Two tools for finding out where a slow request spends its time:
+
+- Per-request cProfile: with --profile-requests, an admin request carrying
+  an X-Profile: 1 header (or ?profile=1) runs under cProfile and its stats
+  are written to profiles/<request id>.prof (and a .txt summary).
+- Stack sampler: a background thread that snapshots every thread's stack
+  at a fixed interval and counts identical stacks. The result is in the
+  collapsed format flamegraph.pl and speedscope read:
+      thread;outer (file:line);inner (file:line) count
+
+Inspect a .prof file with: python3 -m pstats profiles/<id>.prof
+"""
+
+import collections
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+
+PROFILE_DIR = 'profiles'
+DEFAULT_SAMPLE_INTERVAL = 0.01  # seconds between stack samples
+FLUSH_INTERVAL = 10             # seconds between collapsed-stack file rewrites
+MAX_CAPTURE_SECONDS = 60        # longest on-demand capture
+SUMMARY_LINES = 40
+SAMPLER_THREAD = 'stack-sampler'
+
+_profile_requests = False
+_profile_lock = threading.Lock()    # one cProfile at a time; profilers don't nest
+
+def configure_profiling(profile_requests=False, directory=PROFILE_DIR):
+    """Allow admin requests to ask for a cProfile of themselves"""
+    global _profile_requests, PROFILE_DIR
+    _profile_requests = profile_requests
+    PROFILE_DIR = directory
+
+def wants_profile(header, query_string):
+    """Whether a request asked to be profiled (admin access is checked by the caller)"""
+    if not _profile_requests:
+        return False
+    return header == '1' or parse_qs(query_string).get('profile', [None])[0] == '1'
+
+class RequestProfile:
+    """cProfile of one request on the current thread"""
+
+    def __init__(self, name):
+        self.name = re.sub(r'[^\w.-]+', '_', name)
+        self.path = os.path.join(PROFILE_DIR, f"{self.name}.prof")
+        self.profiler = cProfile.Profile()
+
+    @classmethod
+    def start(cls, name):
+        """Begin profiling, or return None if another request is being profiled"""
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        try:
+            profile = cls(name)
+            profile.profiler.enable()
+        except BaseException:
+            _profile_lock.release()
+            raise
+        return profile
+
+    def finish(self, label=''):
+        """Stop profiling and write the .prof file and a text summary"""
+        self.profiler.disable()
+        _profile_lock.release()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self.profiler.dump_stats(self.path)
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=summary)
+        stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        with open(os.path.join(PROFILE_DIR, f"{self.name}.txt"), 'w', encoding='utf-8') as f:
+            if label:
+                f.write(label + '\n')
+            f.write(summary.getvalue())
+        print(f"🔬 Profiled {label or self.name}: {self.path}")
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def thread_group(name):
+    """Thread name without the pool index, so a pool's workers aggregate together"""
+    return re.sub(r'[_-]\d+$', '', name)
+
+class StackSampler:
+    """Count the stacks of all threads, sampled every interval seconds"""
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, path=None):
+        self.interval = interval
+        self.path = path
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._labels = {}   # code object -> label, so each frame is formatted once
+
+    def sample(self):
+        """Take one snapshot of every other thread's stack"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        labels = self._labels
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, 'thread')
+            if ident == threading.get_ident() or name == SAMPLER_THREAD:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(thread_group(name))
+            stack.reverse()
+            self.counts[';'.join(stack)] += 1
+        self.samples += 1
+
+    def run(self, duration=None):
+        """Sample until stop() (or for duration seconds)"""
+        deadline = None if duration is None else time.monotonic() + duration
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        while not self._stopped.wait(self.interval):
+            self.sample()
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if self.path and now >= next_flush:
+                self.write()
+                next_flush = now + FLUSH_INTERVAL
+
+    def collapsed(self):
+        """The samples as collapsed-stack text"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def write(self):
+        """Rewrite the collapsed-stack file with the counts so far"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=SAMPLER_THREAD, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and write the file one last time"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.path:
+            self.write()
+
+def capture_stacks(seconds, interval=DEFAULT_SAMPLE_INTERVAL):
+    """Sample for seconds on the calling thread and return the collapsed stacks"""
+    sampler = StackSampler(interval)
+    sampler.run(min(seconds, MAX_CAPTURE_SECONDS))
+    return sampler.collapsed()
+
+# Continuous sampler for this process (see start_sampler)
+_sampler_settings = None
+_sampler = None
+
+def configure_sampler(path, interval=DEFAULT_SAMPLE_INTERVAL):
+    """Sample stacks into path from start_sampler() until stop_sampler()"""
+    global _sampler_settings
+    _sampler_settings = (path, interval, os.getpid()) if path else None
+
+def start_sampler():
+    """Start this process's sampler if one is configured
+
+    Called in each pre-forked worker too; workers write <path>.<pid>.
+    """
+    global _sampler
+    if _sampler_settings is None:
+        return None
+    path, interval, configured_pid = _sampler_settings
+    if os.getpid() != configured_pid:
+        path = f"{path}.{os.getpid()}"
+    _sampler = StackSampler(interval, path).start()
+    print(f"🔬 Sampling stacks every {interval * 1000:g}ms into {path}")
+    return _sampler
+
+def stop_sampler():
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+
+def add_profiling_arguments(parser):
+    """Add the profiling options to an argparse parser"""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile-requests', action='store_true',
+                       help="Let admin requests with X-Profile: 1 (or ?profile=1) run under "
+                            f"cProfile; stats go to {PROFILE_DIR}/")
+    group.add_argument('--profile-dir', default=PROFILE_DIR,
+                       help=f"Where request profiles are written (default: {PROFILE_DIR})")
+    group.add_argument('--sample-stacks', metavar='FILE', default=None,
+                       help="Sample all threads' stacks while running and write collapsed "
+                            "stacks (flamegraph input) to FILE")
+    group.add_argument('--sample-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                       help=f"Seconds between stack samples (default: {DEFAULT_SAMPLE_INTERVAL})")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Per-client request rate limits and connection caps
+Token buckets keyed by client IP, with separate budgets for static files
+(GET/HEAD) and submissions (POST), plus a cap on simultaneous connections
+per IP. Bookkeeping is O(1) per request and bounded: buckets live in an LRU
+of at most max_clients entries and idle ones are dropped as they refill.
+
+Limits are per process, so pre-forked workers each enforce them.
+Loopback clients are exempt by default because behind a local reverse
+proxy every request appears to come from 127.0.0.1.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from admin_access import LOOPBACK_ADDRESSES
+import metrics
+
+DEFAULT_STATIC_RATE = 50.0      # requests per second
+DEFAULT_STATIC_BURST = 200
+DEFAULT_SUBMIT_RATE = 0.1       # one submission per 10 seconds
+DEFAULT_SUBMIT_BURST = 5
+DEFAULT_MAX_CONNECTIONS = 32    # simultaneous connections per IP without a worker pool
+DEFAULT_MAX_CLIENTS = 10000     # buckets tracked per budget
+
+REQUEST_KINDS = ('static', 'submit')
+
+# Sent before closing a connection from a client over its connection cap
+CONNECTION_LIMIT_RESPONSE = (b"HTTP/1.1 429 Too Many Requests\r\n"
+                             b"Retry-After: 1\r\n"
+                             b"Content-Length: 0\r\n"
+                             b"Connection: close\r\n\r\n")
+
+class TokenBucketLimiter:
+    """Token bucket per client in a bounded LRU"""
+
+    def __init__(self, rate, burst, max_clients=DEFAULT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # A bucket idle this long is full again, the same as a fresh one
+        self.idle_expiry = burst / rate
+        self._buckets = OrderedDict()   # client -> (tokens, last update), oldest first
+        self._lock = threading.Lock()
+
+    def take(self, client, now=None):
+        """Spend a token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._buckets.pop(client, None)
+            if state is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            self._expire(now)
+        return wait
+
+    def _expire(self, now):
+        """Drop the least recently seen buckets if full again or over capacity"""
+        # At most two per call keeps this O(1) while still draining idle clients
+        for _ in range(2):
+            client, (_, last) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_clients and now - last < self.idle_expiry:
+                return
+            del self._buckets[client]
+            if not self._buckets:
+                return
+
+    def __len__(self):
+        return len(self._buckets)
+
+class ConnectionLimiter:
+    """Count open connections per client"""
+
+    def __init__(self, max_per_client=DEFAULT_MAX_CONNECTIONS):
+        self.max_per_client = max_per_client
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, client):
+        """Register a new connection; False if the client is at its cap"""
+        with self._lock:
+            count = self._open.get(client, 0)
+            if count >= self.max_per_client:
+                return False
+            self._open[client] = count + 1
+            return True
+
+    def release(self, client):
+        with self._lock:
+            count = self._open.get(client, 0) - 1
+            if count > 0:
+                self._open[client] = count
+            else:
+                self._open.pop(client, None)
+
+class RateLimits:
+    """The request budgets and connection cap a server enforces"""
+
+    def __init__(self, static_rate=DEFAULT_STATIC_RATE, static_burst=DEFAULT_STATIC_BURST,
+                 submit_rate=DEFAULT_SUBMIT_RATE, submit_burst=DEFAULT_SUBMIT_BURST,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, max_clients=DEFAULT_MAX_CLIENTS,
+                 exempt=LOOPBACK_ADDRESSES):
+        self.buckets = {}
+        if static_rate > 0:
+            self.buckets['static'] = TokenBucketLimiter(static_rate, static_burst, max_clients)
+        if submit_rate > 0:
+            self.buckets['submit'] = TokenBucketLimiter(submit_rate, submit_burst, max_clients)
+        self.connections = ConnectionLimiter(max_connections) if max_connections > 0 else None
+        self.exempt = frozenset(exempt)
+
+    def check_request(self, client, kind):
+        """0 if the request may proceed, else the Retry-After in seconds"""
+        limiter = self.buckets.get(kind)
+        if limiter is None or client in self.exempt:
+            return 0
+        wait = limiter.take(client)
+        if wait:
+            metrics.inc('rate_limited_total', (('budget', kind),))
+        return wait
+
+    def open_connection(self, client):
+        """Whether client may open another connection (pair with close_connection)"""
+        if self.connections is None or client in self.exempt:
+            return True
+        if self.connections.acquire(client):
+            return True
+        metrics.inc('rate_limited_total', (('budget', 'connections'),))
+        return False
+
+    def close_connection(self, client):
+        if self.connections is not None and client not in self.exempt:
+            self.connections.release(client)
+
+# Process-wide limits (see configure_rate_limits); None disables limiting
+_limits = None
+
+def configure_rate_limits(limits):
+    """Install a RateLimits instance (None turns limiting off)"""
+    global _limits
+    _limits = limits
+
+def get_rate_limits():
+    return _limits
+
+def check_request(client, kind):
+    """0 if the request may proceed, else the Retry-After in seconds"""
+    return _limits.check_request(client, kind) if _limits is not None else 0
+
+def open_connection(client):
+    return _limits.open_connection(client) if _limits is not None else True
+
+def close_connection(client):
+    if _limits is not None:
+        _limits.close_connection(client)
+
+def retry_after_header(wait):
+    """Retry-After value (whole seconds, at least 1) for a wait time"""
+    return str(max(1, int(wait + 0.999)))
+
+def max_connections_for_workers(workers):
+    """Default per-IP connection cap for a server with a fixed number of worker slots
+
+    Idle keep-alive connections hold a slot each, so one client may only
+    take a quarter of them.
+    """
+    return max(1, workers // 4)
+
+def add_rate_limit_arguments(parser, connection_limit=True):
+    """Add the rate limiting options shared by the servers to an argparse parser
+
+    Servers that handle one connection at a time pass connection_limit=False,
+    since they never hold more than one connection for a client to exceed.
+    """
+    group = parser.add_argument_group('rate limiting')
+    group.add_argument('--no-rate-limit', dest='rate_limit', action='store_false',
+                       help="Don't limit request rates or connections per client")
+    group.add_argument('--static-rate', type=float, default=DEFAULT_STATIC_RATE,
+                       help=f"GET/HEAD requests per second per IP; 0 = unlimited "
+                            f"(default: {DEFAULT_STATIC_RATE})")
+    group.add_argument('--static-burst', type=int, default=DEFAULT_STATIC_BURST,
+                       help=f"GET/HEAD burst allowance per IP (default: {DEFAULT_STATIC_BURST})")
+    group.add_argument('--submit-rate', type=float, default=DEFAULT_SUBMIT_RATE,
+                       help=f"Submissions per second per IP; 0 = unlimited "
+                            f"(default: {DEFAULT_SUBMIT_RATE})")
+    group.add_argument('--submit-burst', type=int, default=DEFAULT_SUBMIT_BURST,
+                       help=f"Submission burst allowance per IP (default: {DEFAULT_SUBMIT_BURST})")
+    if connection_limit:
+        group.add_argument('--max-connections-per-ip', type=int,
+                           help=f"Simultaneous connections per IP; 0 = unlimited (default: a "
+                                f"quarter of the worker threads, or {DEFAULT_MAX_CONNECTIONS} "
+                                f"without a worker pool)")
+    group.add_argument('--rate-limit-clients', type=int, default=DEFAULT_MAX_CLIENTS,
+                       help=f"Client IPs tracked per budget (default: {DEFAULT_MAX_CLIENTS})")
+    group.add_argument('--rate-limit-loopback', action='store_true',
+                       help="Also limit loopback clients (off by default so a local reverse "
+                            "proxy isn't throttled as one client)")
+
+def rate_limits_from_args(args):
+    """RateLimits for parsed arguments, or None when limiting is off"""
+    if not args.rate_limit:
+        return None
+    return RateLimits(args.static_rate, args.static_burst, args.submit_rate, args.submit_burst,
+                      getattr(args, 'max_connections_per_ip', None) or 0, args.rate_limit_clients,
+                      () if args.rate_limit_loopback else LOOPBACK_ADDRESSES)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Streaming, size-bounded request body reading
+Shared by the server engines so memory per in-flight submission is bounded
+by MAX_BODY_BYTES no matter what Content-Length a client claims
+"""
+
+import codecs
+import json
+import re
+from http import HTTPStatus
+
+MAX_BODY_BYTES = 1024 * 1024    # rental applications are a few KB of JSON
+CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_LINE = 1024           # chunk-size line incl. extensions
+
+# int(x, 16) alone would also take signs, '0x' prefixes and underscores
+CHUNK_SIZE_FIELD = re.compile(rb'[0-9A-Fa-f]+')
+
+class RequestBodyError(Exception):
+    """The request body can't be read; answer with status and close"""
+
+    def __init__(self, status, message=None):
+        super().__init__(message)
+        self.status = HTTPStatus(status)
+        self.message = message or self.status.phrase
+
+def body_framing(headers, max_bytes):
+    """Return ('chunked', None) or ('length', n) for a request, rejecting early
+
+    headers only needs a .get() that accepts lowercase names, so both
+    http.server's message objects and the asyncio engine's dict work.
+    """
+    transfer_encoding = headers.get('transfer-encoding')
+    if transfer_encoding:
+        codings = [c.strip().lower() for c in transfer_encoding.split(',')]
+        if codings != ['chunked']:
+            raise RequestBodyError(HTTPStatus.NOT_IMPLEMENTED,
+                                   f"Unsupported Transfer-Encoding: {transfer_encoding}")
+        return 'chunked', None
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length < 0:
+        raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > max_bytes:
+        raise RequestBodyError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Request body exceeds {max_bytes} bytes")
+    return 'length', length
+
+def parse_chunk_size(line):
+    """Parse a chunk-size line, ignoring chunk extensions"""
+    if not line.endswith(b'\n'):
+        raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+    size = line.split(b';', 1)[0].strip()
+    if not CHUNK_SIZE_FIELD.fullmatch(size):
+        raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Malformed chunk size")
+    return int(size, 16)
+
+def iter_body(rfile, headers, max_bytes=MAX_BODY_BYTES):
+    """Yield the request body in chunks of at most CHUNK_SIZE bytes"""
+    framing, length = body_framing(headers, max_bytes)
+
+    if framing == 'length':
+        remaining = length
+        while remaining:
+            data = rfile.read(min(remaining, CHUNK_SIZE))
+            if not data:
+                raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+            remaining -= len(data)
+            yield data
+        return
+
+    total = 0
+    while True:
+        size = parse_chunk_size(rfile.readline(MAX_CHUNK_LINE))
+        if size == 0:
+            break
+        total += size
+        if total > max_bytes:
+            raise RequestBodyError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                   f"Request body exceeds {max_bytes} bytes")
+        while size:
+            data = rfile.read(min(size, CHUNK_SIZE))
+            if not data:
+                raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+            size -= len(data)
+            yield data
+        if rfile.readline(MAX_CHUNK_LINE) not in (b'\r\n', b'\n'):
+            raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Malformed chunk terminator")
+
+    # Skip trailer fields
+    while True:
+        line = rfile.readline(MAX_CHUNK_LINE)
+        if not line:
+            raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+        if line in (b'\r\n', b'\n'):
+            break
+
+async def _readline(reader):
+    """Read a body framing line, treating an overlong line as a bad request"""
+    try:
+        return await reader.readline()
+    except ValueError:
+        raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Chunk line too long")
+
+async def aiter_body(reader, headers, max_bytes=MAX_BODY_BYTES):
+    """asyncio counterpart of iter_body for an asyncio.StreamReader"""
+    framing, length = body_framing(headers, max_bytes)
+
+    if framing == 'length':
+        remaining = length
+        while remaining:
+            data = await reader.read(min(remaining, CHUNK_SIZE))
+            if not data:
+                raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+            remaining -= len(data)
+            yield data
+        return
+
+    total = 0
+    while True:
+        size = parse_chunk_size(await _readline(reader))
+        if size == 0:
+            break
+        total += size
+        if total > max_bytes:
+            raise RequestBodyError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                   f"Request body exceeds {max_bytes} bytes")
+        while size:
+            data = await reader.read(min(size, CHUNK_SIZE))
+            if not data:
+                raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+            size -= len(data)
+            yield data
+        if await _readline(reader) not in (b'\r\n', b'\n'):
+            raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Malformed chunk terminator")
+
+    while True:
+        line = await _readline(reader)
+        if not line:
+            raise RequestBodyError(HTTPStatus.BAD_REQUEST, "Request body truncated")
+        if line in (b'\r\n', b'\n'):
+            break
+
+class TextAccumulator:
+    """Decode UTF-8 incrementally as body chunks arrive
+
+    Invalid UTF-8 is reported by text(), not feed(), so callers still read
+    the rest of the body and the connection stays usable for the next
+    request.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._parts = []
+        self._error = None
+
+    def feed(self, data):
+        if self._error is not None:
+            return
+        try:
+            self._parts.append(self._decoder.decode(data))
+        except UnicodeDecodeError as e:
+            self._error = e
+            self._parts = []
+
+    def text(self):
+        if self._error is None:
+            try:
+                self._parts.append(self._decoder.decode(b'', final=True))
+            except UnicodeDecodeError as e:
+                self._error = e
+        if self._error is not None:
+            raise self._error
+        return ''.join(self._parts)
+
+def read_text_body(rfile, headers, max_bytes=MAX_BODY_BYTES):
+    """Read and decode a UTF-8 request body"""
+    text = TextAccumulator()
+    for data in iter_body(rfile, headers, max_bytes):
+        text.feed(data)
+    return text.text()
+
+def read_json_body(rfile, headers, max_bytes=MAX_BODY_BYTES):
+    """Read a UTF-8 JSON request body"""
+    return json.loads(read_text_body(rfile, headers, max_bytes))
+
+async def read_json_body_async(reader, headers, max_bytes=MAX_BODY_BYTES):
+    """asyncio counterpart of read_json_body"""
+    text = TextAccumulator()
+    async for data in aiter_body(reader, headers, max_bytes):
+        text.feed(data)
+    return json.loads(text.text())
@@ -4,19 +4,242 @@ Single-server solution: Web server + Form submission handler
 Saves rental applications as JSON files - No email functionality
 """
 
+from http import HTTPStatus
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import email.utils
+import html
 import json
 import os
-from datetime import datetime
+import signal
+import socket
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from request_body import MAX_BODY_BYTES, RequestBodyError, read_json_body
+from static_files import (DEFAULT_CACHE_BYTES, DEFAULT_COMPRESSED_CACHE_BYTES,
+                          DEFAULT_MAX_OBJECT_BYTES, MIN_COMPRESS_BYTES, MemoryBody,
+                          RangeNotSatisfiable, StaticFileCache, etag_matches, find_precompressed,
+                          gzip_body, if_range_matches, is_compressible, make_etag,
+                          parse_accept_encoding, parse_byte_range, send_file)
+from access_log import (add_access_log_arguments, close_access_log,
+                        configure_access_log_from_args, log_request, request_id)
+from admin_access import add_admin_arguments, configure_admin_token, is_admin_request
+from image_resize import (CACHE_MAX_AGE, HAS_PIL, IMAGE_PREFIX, ImageRequestError,
+                          ImageVariantCache, add_image_arguments, parse_image_request)
+import metrics
+from profiling import (RequestProfile, add_profiling_arguments, capture_stacks,
+                       configure_profiling, configure_sampler, start_sampler, stop_sampler,
+                       wants_profile)
+from application_index import INDEX_ENDPOINTS, QueryError, add_index_arguments
+from application_store import add_storage_arguments, storage_factory_from_args
+from lifecycle import (DEFAULT_DRAIN_TIMEOUT, add_lifecycle_arguments, inherited_sockets,
+                       notify_ready, spawn_replacement)
+from idempotency import (IdempotencyError, add_idempotency_arguments,
+                         configure_idempotency)
+from rate_limit import (CONNECTION_LIMIT_RESPONSE, DEFAULT_MAX_CONNECTIONS,
+                        add_rate_limit_arguments, check_request, close_connection,
+                        configure_rate_limits, max_connections_for_workers, open_connection,
+                        rate_limits_from_args, retry_after_header)
+from submissions import (QUEUE_RETRY_AFTER, SUBMISSIONS_DIR, QueueFull, accept_application,
+                         add_queue_arguments, close_storage, configure_index, configure_queue,
+                         configure_storage, get_index)
 
-SUBMISSIONS_DIR = "applications"
 PORT = 8000
 
+# Concurrency defaults (overridable from the command line)
+ENGINES = ('http.server', 'asyncio')
+DEFAULT_ENGINE = 'http.server'
+SERVER_MODES = ('single', 'threaded', 'prefork')
+DEFAULT_MODE = 'threaded'
+DEFAULT_WORKERS = 16
+DEFAULT_PROCESSES = os.cpu_count() or 1
+
+# Persistent connection defaults; an idle keep-alive connection holds a
+# worker thread, so the idle timeout is kept short
+KEEPALIVE_TIMEOUT = 5
+MAX_KEEPALIVE_REQUESTS = 100
+
+# Paths reported under their own route label; everything else is 'static'
+METRIC_ROUTES = frozenset(['/submit_application', '/metrics', '/debug/stacks', *INDEX_ENDPOINTS])
+
 class ApplicationHTTPHandler(SimpleHTTPRequestHandler):
     """Handles both static files AND form submissions"""
     
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK of the headers (~40ms per response)
+    disable_nagle_algorithm = True
+    timeout = KEEPALIVE_TIMEOUT
+    max_keepalive_requests = MAX_KEEPALIVE_REQUESTS
+    max_body_bytes = MAX_BODY_BYTES
+    static_cache = StaticFileCache()
+    compression = True
+    compressed_cache = StaticFileCache(DEFAULT_COMPRESSED_CACHE_BYTES)
+    image_cache = None
+    
+    def setup(self):
+        """Start the per-connection request counter"""
+        super().setup()
+        self.requests_handled = 0
+    
+    def handle_one_request(self):
+        """Handle one request and count it against the keep-alive cap"""
+        self.body_consumed = False
+        self.byte_range = None
+        self.metrics_started = None
+        self.request_id = None
+        self.profile = None
+        self.response_status = None
+        self.response_bytes = 0
+        try:
+            super().handle_one_request()
+        finally:
+            if self.profile is not None:
+                self.profile.finish(f"{self.command} {urlsplit(self.path).path} "
+                                    f"-> {self.response_status}")
+            if self.metrics_started is not None:
+                self.record_request()
+        self.requests_handled += 1
+    
+    def parse_request(self):
+        """Parse the request line and headers, then start timing the request"""
+        if not super().parse_request():
+            return False
+        self.metrics_started = metrics.request_started()
+        self.request_id = request_id(self.headers.get('X-Request-Id'))
+        url = urlsplit(self.path)
+        if (wants_profile(self.headers.get('X-Profile'), url.query)
+                and self.is_admin(parse_qs(url.query))):
+            self.profile = RequestProfile.start(self.request_id)
+        return True
+    
+    def is_admin(self, query):
+        """Whether the request may use the admin endpoints"""
+        token = self.headers.get('X-Admin-Token') or query.get('token', [None])[0]
+        return is_admin_request(self.client_address[0], token)
+    
+    def record_request(self):
+        """Count the finished request and write its access log entry"""
+        path = urlsplit(self.path).path
+        if path.startswith(IMAGE_PREFIX):
+            route = IMAGE_PREFIX
+        else:
+            route = metrics.route_label(path, METRIC_ROUTES)
+        duration = metrics.request_finished(self.metrics_started, route, self.command,
+                                            self.response_status, self.response_bytes)
+        log_request(self.request_id, self.client_address[0], self.command, path, route,
+                    self.response_status, self.response_bytes, duration)
+    
+    def log_request(self, code='-', size='-'):
+        """Access entries are written by record_request() once the response is sent"""
+    
+    def send_response(self, code, message=None):
+        """Send the status line, remembering the status for metrics"""
+        self.response_status = code
+        super().send_response(code, message)
+    
+    def send_header(self, keyword, value):
+        """Send a header, noting the body size it announces"""
+        if keyword.lower() == 'content-length' and self.command != 'HEAD':
+            self.response_bytes = int(value)
+        super().send_header(keyword, value)
+    
+    def rate_limited(self, kind):
+        """Answer 429 and return True when the client is over its budget"""
+        wait = check_request(self.client_address[0], kind)
+        if not wait:
+            return False
+        self.send_error(429, "Too many requests",
+                        headers=[('Retry-After', retry_after_header(wait))])
+        return True
+    
+    def do_GET(self):
+        """Route JSON API requests; everything else is a static file"""
+        if self.rate_limited('static'):
+            return
+        url = urlsplit(self.path)
+        if url.path in INDEX_ENDPOINTS:
+            self.handle_index_query(INDEX_ENDPOINTS[url.path], parse_qs(url.query))
+        elif url.path == '/metrics':
+            self.handle_metrics(parse_qs(url.query))
+        elif url.path == '/debug/stacks':
+            self.handle_stack_capture(parse_qs(url.query))
+        else:
+            super().do_GET()
+    
+    def handle_index_query(self, build_response, query):
+        """Answer an admin list or search request from the SQLite index"""
+        if not self.is_admin(query):
+            self.send_error(403, "Admin access required")
+            return
+        index = get_index()
+        if index is None:
+            self.send_error(503, "Application index is disabled")
+            return
+        try:
+            payload = build_response(index, query)
+        except QueryError as e:
+            self.send_error(400, str(e))
+            return
+        self.send_json(200, payload)
+    
+    def handle_metrics(self, query):
+        """Answer an admin Prometheus scrape"""
+        if not self.is_admin(query):
+            self.send_error(403, "Admin access required")
+            return
+        self.send_text(metrics.render(), metrics.CONTENT_TYPE)
+    
+    def handle_stack_capture(self, query):
+        """Sample every thread's stack for ?seconds=N and answer with collapsed stacks"""
+        if not self.is_admin(query):
+            self.send_error(403, "Admin access required")
+            return
+        try:
+            seconds = float(query.get('seconds', ['5'])[0])
+        except ValueError:
+            seconds = -1
+        if not 0 < seconds:
+            self.send_error(400, "seconds must be a positive number")
+            return
+        self.send_text(capture_stacks(seconds), 'text/plain; charset=utf-8')
+    
+    def send_text(self, text, content_type):
+        """Send an uncached text response"""
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_json(self, code, payload, headers=()):
+        """Send a JSON response framed with Content-Length"""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def do_HEAD(self):
+        """Serve static file headers, within the client's budget"""
+        if not self.rate_limited('static'):
+            super().do_HEAD()
+    
     def do_POST(self):
         """Handle POST requests for form submission"""
+        if self.rate_limited('submit'):
+            return
         if self.path == '/submit_application':
             self.handle_form_submission()
         else:
@@ -27,83 +250,712 @@ class ApplicationHTTPHandler(SimpleHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def handle_form_submission(self):
         """Process form submission - Save to JSON file only"""
         try:
-            # Get content length and read POST data
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
-            application_data = json.loads(post_data.decode('utf-8'))
-            
-            # Add metadata
-            application_data['submittedAt'] = datetime.now().isoformat()
-            application_data['submittedFrom'] = self.client_address[0]
-            
-            # Create submissions directory
-            if not os.path.exists(SUBMISSIONS_DIR):
-                os.makedirs(SUBMISSIONS_DIR)
+            # Stream and parse the POST data, bounded by max_body_bytes
+            try:
+                application_data = read_json_body(self.rfile, self.headers, self.max_body_bytes)
+            except RequestBodyError as e:
+                print(f"❌ Rejected submission: {e.message}")
+                self.send_error(e.status, e.message)
+                return
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                # The whole body was read, so the connection can stay open
+                self.body_consumed = True
+                print(f"❌ JSON Error: {e}")
+                self.send_error(400, f"Invalid JSON: {str(e)}")
+                return
+            self.body_consumed = True
             
-            # Generate filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            first_name = application_data.get('firstName', 'Unknown').replace(' ', '_')
-            last_name = application_data.get('lastName', 'Unknown').replace(' ', '_')
-            filename = f"{timestamp}_{first_name}_{last_name}.json"
-            filepath = os.path.join(SUBMISSIONS_DIR, filename)
+            # Stamp metadata and save to JSON file (possibly via the queue)
+            try:
+                code, response, replayed = accept_application(
+                    application_data, self.client_address[0], self.headers.get('Idempotency-Key'))
+            except IdempotencyError as e:
+                print(f"❌ Rejected submission: {e.message}")
+                self.send_error(e.status, e.message)
+                return
+            except QueueFull as e:
+                print(f"⚠️  Submission refused: {e}")
+                self.send_json(503, {'success': False, 'message': str(e)},
+                               [('Retry-After', str(QUEUE_RETRY_AFTER))])
+                return
+            filename = response['filename']
             
-            # Save to JSON file
-            with open(filepath, 'w') as f:
-                json.dump(application_data, f, indent=2)
+            if replayed:
+                print(f"♻️  Duplicate submission answered from cache: {filename}")
+                self.send_json(code, response, [('Idempotent-Replayed', 'true')])
+                return
             
-            print(f"✅ Application saved: {filename}")
+            print(f"✅ Application {'queued' if code == 202 else 'saved'}: {filename}")
             
             # Send success response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            response = {
-                'success': True,
-                'message': 'Application submitted successfully',
-                'filename': filename,
-                'timestamp': application_data['submittedAt']
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            self.send_json(code, response)
             
         except Exception as e:
             print(f"❌ Error: {e}")
             self.send_error(500, f"Server error: {str(e)}")
     
+    def send_head(self):
+        """Send headers for a static file, honouring validators and Range
+        
+        Directories (redirects, listings) are left to the base class; a
+        directory's index.html is served through the file path. Text assets
+        are sent as a precompressed sibling or gzipped on the fly when the
+        client accepts it. Small bodies come from the in-memory caches,
+        larger files are sent with sendfile.
+        """
+        if urlsplit(self.path).path.startswith(IMAGE_PREFIX):
+            return self.send_image_head()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split('?', 1)[0].split('#', 1)[0].endswith('/'):
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                index_path = os.path.join(path, index)
+                if os.path.isfile(index_path):
+                    path = index_path
+                    break
+            else:
+                return super().send_head()
+        if path.endswith('/'):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        
+        # Pick the representation: precompressed sibling, on-the-fly gzip or identity
+        ctype = self.guess_type(path)
+        compressible = self.compression and is_compressible(ctype)
+        encoding = None
+        dynamic_gzip = False
+        rep_path, rep_st = path, st
+        if compressible:
+            encodings = parse_accept_encoding(self.headers.get('Accept-Encoding'))
+            variant = find_precompressed(path, st, encodings)
+            if variant:
+                encoding, rep_path, rep_st = variant
+            elif ('gzip' in encodings and self.compressed_cache is not None
+                  and MIN_COMPRESS_BYTES <= st.st_size
+                  and self.compressed_cache.cacheable(st)):
+                encoding = 'gzip'
+                dynamic_gzip = True
+        etag = make_etag(rep_st, '-gzip' if dynamic_gzip else '')
+        
+        # Use browser cache if possible, without opening the file
+        if self.send_not_modified(rep_st, etag, 'Accept-Encoding' if compressible else None):
+            return None
+        
+        cache = self.compressed_cache if dynamic_gzip else self.static_cache
+        cache_key = rep_path + ':gzip' if dynamic_gzip else rep_path
+        body = None
+        if cache is not None and cache.cacheable(rep_st):
+            body = cache.get(cache_key, rep_st)
+        f = None
+        if body is None:
+            try:
+                f = open(rep_path, 'rb')
+            except OSError:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                return None
+        try:
+            if f is not None:
+                fst = os.fstat(f.fileno())
+                if (fst.st_mtime_ns, fst.st_size) != (rep_st.st_mtime_ns, rep_st.st_size):
+                    # Changed since the stat above; keep the validators consistent
+                    rep_st = fst
+                    etag = make_etag(rep_st, '-gzip' if dynamic_gzip else '')
+                if cache is not None and cache.cacheable(rep_st):
+                    body = f.read()
+                    f.close()
+                    f = None
+                    if dynamic_gzip:
+                        body = gzip_body(body)
+                    cache.put(cache_key, rep_st, body)
+            size = len(body) if body is not None else rep_st.st_size
+            last_modified = self.date_time_string(rep_st.st_mtime)
+            
+            byte_range = None
+            if if_range_matches(self.headers.get('If-Range'), last_modified, etag):
+                try:
+                    byte_range = parse_byte_range(self.headers.get('Range'), size)
+                except RangeNotSatisfiable:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    if f is not None:
+                        f.close()
+                    return None
+            
+            if byte_range:
+                start, end = byte_range
+                self.send_response(HTTPStatus.PARTIAL_CONTENT)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                self.byte_range = (start, end - start + 1)
+            else:
+                self.send_response(HTTPStatus.OK)
+                self.byte_range = (0, size)
+            self.send_header('Content-type', ctype)
+            self.send_header('Content-Length', str(self.byte_range[1]))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            if compressible:
+                self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('ETag', etag)
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+            if body is not None:
+                return MemoryBody(body, *self.byte_range)
+            return f
+        except:
+            if f is not None:
+                f.close()
+            raise
+    
+    def send_image_head(self):
+        """Send headers for a resized /img/<name>?w=&fmt= variant, resizing it on a miss"""
+        if self.image_cache is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        url = urlsplit(self.path)
+        try:
+            variant = parse_image_request(url.path, parse_qs(url.query),
+                                          self.headers.get('Accept'), self.image_cache.widths)
+        except ImageRequestError as e:
+            self.send_error(e.status, e.message)
+            return None
+        vary = 'Accept' if variant.negotiated else None
+        if self.send_not_modified(variant.stat, variant.etag, vary):
+            return None
+        try:
+            f = self.image_cache.open(variant)
+        except Exception as e:
+            self.log_error("Resizing %s failed: %r", variant.source, e)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Couldn't resize image")
+            return None
+        try:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-type', variant.content_type)
+            self.send_header('Content-Length', str(size))
+            self.send_header('Last-Modified', self.date_time_string(variant.stat.st_mtime))
+            self.send_header('ETag', variant.etag)
+            self.send_header('Cache-Control', f'public, max-age={CACHE_MAX_AGE}')
+            if vary:
+                self.send_header('Vary', vary)
+            self.end_headers()
+            self.byte_range = (0, size)
+            return f
+        except:
+            f.close()
+            raise
+    
+    def send_not_modified(self, st, etag, vary=None):
+        """Answer 304 if the client's validators still match the file"""
+        if 'If-None-Match' in self.headers:
+            # If-None-Match takes precedence over If-Modified-Since
+            if not etag_matches(self.headers['If-None-Match'], etag):
+                return False
+        elif 'If-Modified-Since' in self.headers:
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since'])
+            except (TypeError, IndexError, OverflowError, ValueError):
+                return False
+            if since.tzinfo is None or int(st.st_mtime) > since.timestamp():
+                return False
+        else:
+            return False
+        
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+        if vary:
+            self.send_header('Vary', vary)
+        self.end_headers()
+        return True
+    
+    def copyfile(self, source, outputfile):
+        """Send the selected byte range from memory or straight from the file"""
+        if isinstance(source, MemoryBody):
+            outputfile.write(source.view)
+        elif self.byte_range is None:
+            super().copyfile(source, outputfile)
+        else:
+            offset, count = self.byte_range
+            send_file(self.connection, source, offset, count)
+    
+    def send_error(self, code, message=None, explain=None, headers=()):
+        """Send an error page framed with Content-Length
+        
+        Unlike the base class this keeps the connection open when the request
+        was fully read, so a 404 for a missing image doesn't end keep-alive.
+        """
+        try:
+            shortmsg, longmsg = self.responses[code]
+        except KeyError:
+            shortmsg, longmsg = '???', '???'
+        if message is None:
+            message = shortmsg
+        if explain is None:
+            explain = longmsg
+        self.log_error("code %d, message %s", code, message)
+        self.send_response(code, message)
+        if not self.can_keep_alive_after_error(code):
+            self.send_header('Connection', 'close')
+        
+        body = b''
+        if code >= 200 and code not in (HTTPStatus.NO_CONTENT,
+                                        HTTPStatus.RESET_CONTENT,
+                                        HTTPStatus.NOT_MODIFIED):
+            content = (self.error_message_format % {
+                'code': code,
+                'message': html.escape(message, quote=False),
+                'explain': html.escape(explain, quote=False)
+            })
+            body = content.encode('UTF-8', 'replace')
+            self.send_header('Content-Type', self.error_content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD' and body:
+            self.wfile.write(body)
+    
+    def can_keep_alive_after_error(self, code):
+        """Whether the connection is still in a known state after an error"""
+        if code >= 500 or self.command is None or not hasattr(self, 'headers'):
+            # Server failure or the request line/headers could not be parsed
+            return False
+        if self.body_consumed:
+            return True
+        # Any unread request body would be parsed as the next request
+        return (self.headers.get('Content-Length', '0').strip() in ('', '0')
+                and 'Transfer-Encoding' not in self.headers)
+    
     def end_headers(self):
-        """Add CORS headers to all responses"""
+        """Add CORS and connection-management headers to all responses"""
         self.send_header('Access-Control-Allow-Origin', '*')
+        if self.request_id is not None:
+            self.send_header('X-Request-Id', self.request_id)
+        if self.profile is not None:
+            self.send_header('X-Profile-Output', self.profile.path)
+        if self.request_version == 'HTTP/1.1' and not self.close_connection:
+            if (self.requests_handled + 1 >= self.max_keepalive_requests
+                    or getattr(self.server, 'draining', False)):
+                self.send_header('Connection', 'close')
+            else:
+                self.send_header('Keep-Alive',
+                                 f'timeout={int(self.timeout)}, max={self.max_keepalive_requests}')
         super().end_headers()
 
-def run_server():
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded pool of worker threads
+    
+    The accept loop blocks once every worker is busy, so excess connections
+    wait in the kernel listen backlog instead of piling up in memory.
+    """
+    
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, max_workers=DEFAULT_WORKERS,
+                 bind_and_activate=True):
+        self.max_workers = max_workers
+        self.draining = False
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._active = set()            # connections handed to the pool and not yet closed
+        self._active_changed = threading.Condition()
+        # Worker threads start lazily on first submit, so a pre-forked child
+        # never inherits threads from the parent
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='http-worker')
+        super().__init__(server_address, handler_class, bind_and_activate)
+    
+    def process_request(self, request, client_address):
+        """Queue the connection on the worker pool"""
+        if not open_connection(client_address[0]):
+            self.reject_request(request)
+            return
+        self._slots.acquire()
+        with self._active_changed:
+            self._active.add(request)
+        try:
+            self._pool.submit(self._process_request_worker, request, client_address)
+        except Exception:
+            self._slots.release()
+            close_connection(client_address[0])
+            self._forget_request(request)
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+    
+    def reject_request(self, request):
+        """Turn away a client that is over its connection cap"""
+        try:
+            request.sendall(CONNECTION_LIMIT_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+    
+    def _process_request_worker(self, request, client_address):
+        """Run the handler for one connection on a worker thread"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+            close_connection(client_address[0])
+            self._forget_request(request)
+    
+    def _forget_request(self, request):
+        with self._active_changed:
+            self._active.discard(request)
+            self._active_changed.notify_all()
+    
+    def drain(self, timeout):
+        """Stop accepting and wait for open connections, cutting them off after timeout
+        
+        Responses sent meanwhile carry Connection: close; idle keep-alive
+        connections close when their keep-alive timeout expires. Returns
+        how many connections had to be cut off.
+        """
+        self.draining = True
+        self.socket.close()
+        deadline = time.monotonic() + timeout
+        with self._active_changed:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._active_changed.wait(remaining)
+            stragglers = list(self._active)
+        for request in stragglers:
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._pool.shutdown(wait=True)
+        return len(stragglers)
+    
+    def server_close(self):
+        """Close the listening socket and wait for in-flight requests"""
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+def configure_keepalive(handler_class, enabled=True, timeout=KEEPALIVE_TIMEOUT,
+                        max_requests=MAX_KEEPALIVE_REQUESTS):
+    """Apply persistent-connection settings to a handler class"""
+    handler_class.protocol_version = 'HTTP/1.1' if enabled else 'HTTP/1.0'
+    handler_class.timeout = timeout
+    handler_class.max_keepalive_requests = max_requests
+
+def configure_static_cache(handler_class, max_bytes=DEFAULT_CACHE_BYTES,
+                           max_object_bytes=DEFAULT_MAX_OBJECT_BYTES):
+    """Install a hot file cache on a handler class (0 bytes disables it)"""
+    if max_bytes > 0 and max_object_bytes > 0:
+        handler_class.static_cache = StaticFileCache(max_bytes, max_object_bytes)
+    else:
+        handler_class.static_cache = None
+
+def configure_compression(handler_class, enabled=True,
+                          cache_bytes=DEFAULT_COMPRESSED_CACHE_BYTES):
+    """Enable Accept-Encoding negotiation; cache_bytes=0 disables on-the-fly gzip"""
+    handler_class.compression = enabled
+    if enabled and cache_bytes > 0:
+        handler_class.compressed_cache = StaticFileCache(cache_bytes)
+    else:
+        handler_class.compressed_cache = None
+
+def configure_image_cache(handler_class, directory, max_bytes, widths):
+    """Serve /img/ resized variants from a disk cache (0 bytes disables /img/)"""
+    if max_bytes > 0 and not HAS_PIL:
+        print("⚠️  Pillow not installed - /img/ resizing is disabled")
+    if max_bytes > 0 and HAS_PIL:
+        handler_class.image_cache = ImageVariantCache(directory, max_bytes, widths)
+    else:
+        handler_class.image_cache = None
+
+def create_server(host='', port=PORT, mode=DEFAULT_MODE, workers=DEFAULT_WORKERS,
+                  handler_class=ApplicationHTTPHandler, sock=None):
+    """Build the HTTP server for the requested concurrency mode
+    
+    sock is an already listening socket to serve instead of binding one.
+    """
+    if mode not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {mode}")
+    if mode == 'single':
+        httpd = HTTPServer((host, port), handler_class, bind_and_activate=sock is None)
+    else:
+        # 'prefork' children each run their own thread pool on the shared socket
+        httpd = ThreadPoolHTTPServer((host, port), handler_class, max_workers=workers,
+                                     bind_and_activate=sock is None)
+    if sock is not None:
+        httpd.socket.close()
+        httpd.socket = sock
+        httpd.server_address = sock.getsockname()
+        httpd.server_name = socket.getfqdn(httpd.server_address[0])
+        httpd.server_port = httpd.server_address[1]
+    return httpd
+
+def drain_server(httpd, timeout):
+    """Stop accepting and let in-flight requests finish, for at most timeout seconds"""
+    if isinstance(httpd, ThreadPoolHTTPServer):
+        cut = httpd.drain(timeout)
+        if cut:
+            print(f"⚠️  Cut off {cut} connection(s) still open after {timeout:g}s")
+    httpd.server_close()
+
+def install_stop_handlers(httpd):
+    """End serve_forever() on SIGTERM, or on SIGHUP once a replacement is serving
+    
+    Returns a dict whose 'reason' becomes 'shutdown' or 'reload'.
+    """
+    state = {'reason': None}
+    
+    def stop(reason):
+        if reason == 'reload' and spawn_replacement([httpd.socket]) is None:
+            state['reason'] = None
+            return
+        httpd.shutdown()
+    
+    def handle_signal(signum, frame):
+        if state['reason'] is not None:
+            return
+        state['reason'] = 'reload' if signum == signal.SIGHUP else 'shutdown'
+        # shutdown() waits for serve_forever(), which this handler interrupted
+        threading.Thread(target=stop, args=(state['reason'],), daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGHUP, handle_signal)
+    return state
+
+def stop_worker():
+    """Exit a pre-forked worker once its queued log and profile output is written"""
+    close_access_log()
+    stop_sampler()
+    os._exit(0)
+
+def serve_worker(httpd, drain_timeout):
+    """Run one pre-forked worker until SIGTERM, then drain it and exit"""
+    # The parent handles Ctrl+C and SIGHUP and signals us with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=httpd.shutdown, daemon=True).start())
+    start_sampler()
+    try:
+        httpd.serve_forever()
+        drain_server(httpd, drain_timeout)
+        close_storage()
+    finally:
+        stop_worker()
+
+def stop_children(children):
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+def serve_prefork(httpd, processes, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+    """Fork worker processes that all accept on the same listening socket
+    
+    SIGTERM makes every worker drain and exit; SIGHUP does the same once a
+    replacement server has taken over the socket.
+    """
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            serve_worker(httpd, drain_timeout)
+        children.append(pid)
+    
+    def handle_signal(signum, frame):
+        if signum == signal.SIGHUP and spawn_replacement([httpd.socket]) is None:
+            return
+        print(f"\n🛑 {'Reloading' if signum == signal.SIGHUP else 'Shutting down'}: "
+              f"draining workers")
+        stop_children(children)
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGHUP, handle_signal)
+    notify_ready()
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop_children(children)
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        raise
+
+def run_server(host='', port=PORT, mode=DEFAULT_MODE, workers=DEFAULT_WORKERS,
+               processes=DEFAULT_PROCESSES, drain_timeout=DEFAULT_DRAIN_TIMEOUT, sock=None):
     """Start the combined web server"""
-    server_address = ('', PORT)
-    httpd = HTTPServer(server_address, ApplicationHTTPHandler)
+    if mode == 'prefork' and not hasattr(os, 'fork'):
+        print("⚠️  Pre-forked mode needs os.fork(); falling back to threaded mode")
+        mode = 'threaded'
+    
+    httpd = create_server(host, port, mode, workers, sock=sock)
+    handler_class = httpd.RequestHandlerClass
+    metrics.add_collector(metrics.cache_collector('static', lambda: handler_class.static_cache))
+    metrics.add_collector(metrics.cache_collector('compressed',
+                                                  lambda: handler_class.compressed_cache))
+    metrics.add_collector(metrics.cache_collector('images', lambda: handler_class.image_cache))
     
     print("=" * 70)
     print("🏢 PepperTree Townhomes - Application Submission Server")
     print("=" * 70)
-    print(f"✅ Server running on port {PORT}")
-    print(f"🌐 Website: http://localhost:{PORT}")
-    print(f"📝 Application Form: http://localhost:{PORT}/rental-application-form.html")
+    print(f"✅ Server running on port {httpd.server_port}"
+          f"{' (socket inherited from previous process)' if sock else ''}")
+    if mode == 'single':
+        print("⚙️  Mode: single (one request at a time)")
+    elif mode == 'threaded':
+        print(f"⚙️  Mode: threaded ({workers} worker threads)")
+    else:
+        print(f"⚙️  Mode: prefork ({processes} processes x {workers} worker threads)")
+    print(f"🌐 Website: http://localhost:{port}")
+    print(f"📝 Application Form: http://localhost:{port}/rental-application-form.html")
     print(f"📁 Applications saved to: {os.path.abspath(SUBMISSIONS_DIR)}/")
     print("=" * 70)
     print("\n✨ Rental applications will be saved as JSON files")
     print("   No email functionality - files only\n")
-    print("Press Ctrl+C to stop\n")
+    print("Press Ctrl+C to stop (SIGHUP reloads without dropping connections)\n")
     
     try:
-        httpd.serve_forever()
+        if mode == 'prefork':
+            serve_prefork(httpd, processes, drain_timeout)
+        else:
+            stop = install_stop_handlers(httpd)
+            start_sampler()
+            notify_ready()
+            httpd.serve_forever()
+            print(f"\n🛑 {'Reloading' if stop['reason'] == 'reload' else 'Shutting down'}: "
+                  f"draining in-flight requests")
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped")
-        httpd.shutdown()
+        cache = httpd.RequestHandlerClass.static_cache
+        if cache is not None and mode != 'prefork':
+            stats = cache.stats()
+            print(f"📊 Static cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_ratio']:.0%} hit ratio)")
+    finally:
+        if mode == 'prefork':
+            httpd.server_close()
+        else:
+            drain_server(httpd, drain_timeout)
+        close_storage()
+        close_access_log()
+        stop_sampler()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="PepperTree web + application submission server")
+    parser.add_argument('--host', default='', help="Address to bind (default: all interfaces)")
+    parser.add_argument('--port', type=int, default=PORT, help=f"Port to listen on (default: {PORT})")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"Server engine (default: {DEFAULT_ENGINE}); "
+                             "the asyncio engine ignores --mode/--workers/--processes")
+    parser.add_argument('--mode', choices=SERVER_MODES, default=DEFAULT_MODE,
+                        help=f"Concurrency mode (default: {DEFAULT_MODE})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker threads per process (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--no-keepalive', dest='keepalive', action='store_false',
+                        help="Answer as HTTP/1.0 and close the connection after each response")
+    parser.add_argument('--keepalive-timeout', type=float, default=KEEPALIVE_TIMEOUT,
+                        help=f"Seconds an idle connection is kept open (default: {KEEPALIVE_TIMEOUT})")
+    parser.add_argument('--max-keepalive-requests', type=int, default=MAX_KEEPALIVE_REQUESTS,
+                        help=f"Requests served per connection before closing "
+                             f"(default: {MAX_KEEPALIVE_REQUESTS})")
+    parser.add_argument('--max-body-bytes', type=int, default=MAX_BODY_BYTES,
+                        help=f"Largest accepted submission body (default: {MAX_BODY_BYTES})")
+    parser.add_argument('--static-cache-bytes', type=int, default=DEFAULT_CACHE_BYTES,
+                        help=f"In-memory static file cache size, 0 to disable "
+                             f"(default: {DEFAULT_CACHE_BYTES})")
+    parser.add_argument('--static-cache-max-object', type=int, default=DEFAULT_MAX_OBJECT_BYTES,
+                        help=f"Largest file kept in the static cache "
+                             f"(default: {DEFAULT_MAX_OBJECT_BYTES})")
+    parser.add_argument('--no-compression', dest='compression', action='store_false',
+                        help="Always send static files uncompressed")
+    parser.add_argument('--compressed-cache-bytes', type=int,
+                        default=DEFAULT_COMPRESSED_CACHE_BYTES,
+                        help=f"Cache for on-the-fly gzip of files without a precompressed "
+                             f"sibling, 0 to disable (default: {DEFAULT_COMPRESSED_CACHE_BYTES})")
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help=f"Processes in prefork mode (default: {DEFAULT_PROCESSES})")
+    add_admin_arguments(parser)
+    add_storage_arguments(parser)
+    add_index_arguments(parser)
+    add_queue_arguments(parser)
+    add_idempotency_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_access_log_arguments(parser)
+    add_profiling_arguments(parser)
+    add_lifecycle_arguments(parser)
+    add_image_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.processes < 1:
+        parser.error("--workers and --processes must be at least 1")
+    # Threaded and prefork workers are a fixed pool one client mustn't fill
+    pooled = args.engine != 'asyncio' and args.mode != 'single'
+    if args.max_connections_per_ip is None:
+        args.max_connections_per_ip = (max_connections_for_workers(args.workers) if pooled
+                                       else DEFAULT_MAX_CONNECTIONS)
+    elif args.max_connections_per_ip < 0:
+        parser.error("--max-connections-per-ip can't be negative")
+    elif pooled and args.max_connections_per_ip >= args.workers:
+        parser.error("--max-connections-per-ip must be less than --workers")
+    if args.keepalive_timeout <= 0 or args.max_keepalive_requests < 1:
+        parser.error("--keepalive-timeout and --max-keepalive-requests must be positive")
+    if args.queue_size < 0 or args.queue_batch < 1:
+        parser.error("--queue-size can't be negative and --queue-batch must be at least 1")
+    if not 0 <= args.access_log_static_sample <= 1:
+        parser.error("--access-log-static-sample must be between 0 and 1")
+    if min(args.image_widths) < 1:
+        parser.error("--image-widths must be positive")
+    return args
 
 if __name__ == '__main__':
-    run_server()
+    args = parse_args()
+    configure_admin_token(args.admin_token)
+    configure_access_log_from_args(args)
+    configure_profiling(args.profile_requests, args.profile_dir)
+    configure_sampler(args.sample_stacks, args.sample_interval)
+    configure_storage(storage_factory_from_args(args))
+    configure_queue(args.queue_size, args.ack, args.queue_batch)
+    configure_idempotency(args.idempotency_ttl, args.idempotency_entries, args.idempotency_db)
+    configure_rate_limits(rate_limits_from_args(args))
+    configure_index(args.index_path if args.index else None,
+                    watch=args.watch_index, poll=args.watch_poll)
+    listen_sockets = inherited_sockets()
+    if args.engine == 'asyncio':
+        import async_server
+        async_server.run_server(args.host, args.port, args.keepalive_timeout,
+                                args.max_keepalive_requests if args.keepalive else 1,
+                                args.max_body_bytes, args.drain_timeout, listen_sockets)
+    else:
+        configure_keepalive(ApplicationHTTPHandler, args.keepalive, args.keepalive_timeout,
+                            args.max_keepalive_requests)
+        ApplicationHTTPHandler.max_body_bytes = args.max_body_bytes
+        configure_static_cache(ApplicationHTTPHandler, args.static_cache_bytes,
+                               args.static_cache_max_object)
+        configure_compression(ApplicationHTTPHandler, args.compression,
+                              args.compressed_cache_bytes)
+        configure_image_cache(ApplicationHTTPHandler, args.image_cache_dir,
+                              args.image_cache_bytes, args.image_widths)
+        run_server(args.host, args.port, args.mode, args.workers, args.processes,
+                   args.drain_timeout, listen_sockets[0] if listen_sockets else None)
@@ -1,25 +1,36 @@
 #!/bin/bash
 # Start both web server and application submission server
 
+APP_DIR=/home/cshelp/peppertree
+# Full script paths, so these match only our servers (a reloaded server.py
+# is a new process with the same command line)
+WEB_PATTERN="$APP_DIR/server.py"
+APP_PATTERN="$APP_DIR/submit_application.py"
+
 echo "🚀 Starting PepperTree Townhomes Servers..."
 echo ""
 
-# Kill any existing servers
-pkill -9 -f "http.server" 2>/dev/null
-pkill -9 -f "submit_application.py" 2>/dev/null
-sleep 1
+# Stop any existing servers. server.py finishes in-flight requests on
+# SIGTERM (up to its 30s --drain-timeout), so give it time before SIGKILL
+pkill -TERM -f "$WEB_PATTERN" 2>/dev/null
+pkill -TERM -f "$APP_PATTERN" 2>/dev/null
+for i in $(seq 35); do
+    pgrep -f "$WEB_PATTERN|$APP_PATTERN" > /dev/null || break
+    sleep 1
+done
+pkill -9 -f "$WEB_PATTERN|$APP_PATTERN" 2>/dev/null
 
 # Start the web server (port 8000)
 echo "🌐 Starting web server on port 8000..."
-cd /home/cshelp/peppertree
-python3 -m http.server 8000 > /dev/null 2>&1 &
+cd "$APP_DIR"
+python3 "$APP_DIR/server.py" --port 8000 > /dev/null 2>&1 &
 WEB_PID=$!
 
 sleep 2
 
 # Start the application submission server (port 8001)
 echo "📋 Starting application submission server on port 8001..."
-python3 /home/cshelp/peppertree/submit_application.py &
+python3 "$APP_DIR/submit_application.py" &
 APP_PID=$!
 
 sleep 2
@@ -35,5 +46,7 @@ echo "━━━━━━━━━━━━━━━━━━━━━━━━
 echo ""
 echo "📁 Applications will be saved to: ./applications/"
 echo ""
-echo "🛑 To stop servers: pkill -f 'http.server|submit_application'"
+echo "🛑 To stop servers: pkill -f '$WEB_PATTERN|$APP_PATTERN'"
+echo "🔄 To reload the web server without dropping connections:"
+echo "   kill -HUP \$(pgrep -o -f '$WEB_PATTERN')"
 echo ""
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Static file helpers shared by the server engines
+Byte-range parsing, zero-copy file delivery and the hot file cache
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024       # total in-memory cache size
+DEFAULT_MAX_OBJECT_BYTES = 1024 * 1024       # larger files always go through sendfile
+DEFAULT_COMPRESSED_CACHE_BYTES = 8 * 1024 * 1024
+MIN_COMPRESS_BYTES = 1024                    # smaller bodies aren't worth gzipping
+
+# Precompressed siblings written by precompress_assets.py, in preference order
+PRECOMPRESSED_EXTENSIONS = (('br', '.br'), ('gzip', '.gz'))
+
+# Text assets worth compressing
+COMPRESSIBLE_EXTENSIONS = ('.html', '.htm', '.css', '.js', '.json', '.svg', '.txt', '.xml')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                      'application/xml', 'image/svg+xml')
+
+class RangeNotSatisfiable(Exception):
+    """The Range header is valid but selects no bytes of the file"""
+
+def parse_byte_range(header, size):
+    """Parse a single-range ``Range`` header into an inclusive (start, end)
+
+    Returns None when the header should be ignored (missing, malformed,
+    another unit, or several ranges - the full file is sent instead) and
+    raises RangeNotSatisfiable when no byte of the file is selected.
+    """
+    if not header:
+        return None
+    unit, sep, spec = header.partition('=')
+    if not sep or unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else max(start, size - 1)
+            if start < 0 or end < start:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix < 0:
+                return None
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+def if_range_matches(header, last_modified, etag=None):
+    """Whether an ``If-Range`` precondition allows a partial response"""
+    if header is None:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith('W/'):
+        # Weak validators never match for ranges
+        return etag is not None and header == etag and not etag.startswith('W/')
+    return header == last_modified
+
+def send_file(sock, f, offset, count):
+    """Send count bytes of f from offset to a connected socket
+
+    socket.sendfile() uses os.sendfile() where the platform has it (zero-copy
+    from the page cache on Linux) and falls back to send() in chunks
+    otherwise, honouring the socket timeout either way.
+    """
+    if count <= 0:
+        return 0
+    return sock.sendfile(f, offset, count)
+
+def make_etag(st, suffix=''):
+    """Strong entity tag derived from a file's modification time and size"""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+
+def is_compressible(content_type):
+    """Whether a content type benefits from gzip/brotli"""
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def parse_accept_encoding(header):
+    """Content codings the client accepts, most preferred first"""
+    if not header:
+        return []
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if coding == 'x-gzip':
+            coding = 'gzip'
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+    wildcard = weights.pop('*', None)
+    accepted = []
+    for coding, _ in PRECOMPRESSED_EXTENSIONS:
+        q = weights.get(coding, wildcard)
+        if q:
+            accepted.append((q, coding))
+    # Stable sort keeps br ahead of gzip on equal weights
+    accepted.sort(key=lambda item: -item[0])
+    return [coding for _, coding in accepted]
+
+def find_precompressed(path, st, encodings):
+    """Return (encoding, path, stat) of an up-to-date compressed sibling, or None"""
+    extensions = dict(PRECOMPRESSED_EXTENSIONS)
+    for encoding in encodings:
+        variant = path + extensions[encoding]
+        try:
+            vst = os.stat(variant)
+        except OSError:
+            continue
+        if vst.st_mtime_ns >= st.st_mtime_ns:
+            return encoding, variant, vst
+    return None
+
+def gzip_body(data):
+    """Gzip a response body deterministically"""
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+def etag_matches(header, etag):
+    """Whether an ``If-None-Match`` header matches (weak comparison)"""
+    if header is None:
+        return False
+    header = header.strip()
+    if header == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+class CachedFile:
+    """A static file held in memory with its validators"""
+
+    __slots__ = ('mtime_ns', 'size', 'body')
+
+    def __init__(self, mtime_ns, size, body):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.body = body
+
+class MemoryBody:
+    """File-like stand-in for a cached body, sent by the handler's copyfile"""
+
+    def __init__(self, body, offset, count):
+        self.view = memoryview(body)[offset:offset + count]
+
+    def close(self):
+        self.view.release()
+
+class StaticFileCache:
+    """Bounded LRU cache of small static files
+
+    Entries are keyed by path and only returned while the file's mtime and
+    size still match, so an edited file is re-read on its next request.
+    The cached body may be derived from the file (e.g. gzipped) as long as
+    the key says so.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_object_bytes=DEFAULT_MAX_OBJECT_BYTES):
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cacheable(self, st):
+        """Whether a file of this size is worth caching"""
+        return 0 < st.st_size <= self.max_object_bytes
+
+    def get(self, path, st):
+        """Return the cached body for an unchanged file, or None"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.mtime_ns != st.st_mtime_ns or entry.size != st.st_size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry.body
+
+    def put(self, path, st, body):
+        """Store a body derived from the file st describes, evicting LRU entries"""
+        if not self.cacheable(st) or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.current_bytes -= len(old.body)
+            self._entries[path] = CachedFile(st.st_mtime_ns, st.st_size, body)
+            self.current_bytes += len(body)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted.body)
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Shared rental application persistence
+Used by every server engine so submissions are stored the same way
+"""
+
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from application_index import INDEX_PATH, ApplicationIndex
+from application_store import SUBMISSIONS_DIR, FileStore, StoreError
+from idempotency import WAIT_TIMEOUT, get_idempotency_cache
+import metrics
+from index_watcher import SOURCES, IndexWatcher, start_watcher
+
+# Storage backend, created lazily once per process so pre-forked workers
+# each get their own (see configure_storage)
+_store_factory = FileStore
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+def configure_storage(factory):
+    """Set the callable that builds this process's storage backend"""
+    global _store_factory
+    close_storage()
+    with _store_lock:
+        _store_factory = factory
+
+def get_store():
+    """Return this process's storage backend, creating it on first use"""
+    global _store, _store_pid
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            _store = _store_factory()
+            _store_pid = os.getpid()
+        return _store
+
+def close_storage():
+    """Drain the submission queue, then flush and close the storage backend"""
+    global _store, _queue
+    if _queue is not None and _queue_pid == os.getpid():
+        _queue.close()
+    _queue = None
+    with _store_lock:
+        if _store is not None and _store_pid == os.getpid():
+            _store.close()
+        _store = None
+
+# Admin list index, updated on every save (see configure_index)
+_index = None
+
+def configure_index(path=INDEX_PATH, backfill_dir=SUBMISSIONS_DIR, watch=False, poll=False,
+                    appointments_dir=SOURCES['appointments'][0]):
+    """Open the application index (path=None disables it)
+
+    An empty index is backfilled from the JSON files already on disk, and
+    appointments are caught up with appointments_dir, since nothing else in
+    this process indexes them. With watch, a background index watcher
+    instead catches up with and follows every file written to
+    applications/ and appointments/. Call this before forking workers so
+    the backfill or watcher runs once.
+    """
+    global _index
+    if path is None:
+        _index = None
+        return None
+    _index = ApplicationIndex(path)
+    if watch:
+        start_watcher(_index, poll)
+    else:
+        if backfill_dir and _index.count() == 0:
+            indexed = _index.rebuild(backfill_dir)
+            if indexed:
+                print(f"🗂️  Indexed {indexed} existing applications")
+        if appointments_dir:
+            prefix = SOURCES['appointments'][1]
+            indexer = IndexWatcher(_index, {'appointments': (appointments_dir, prefix)})
+            updated, removed = indexer.reconcile()
+            if updated or removed:
+                print(f"🗂️  Appointments indexed: {updated} updated, {removed} removed")
+    return _index
+
+def get_index():
+    """The application index, or None when indexing is disabled"""
+    return _index
+
+def application_filename(application_data, now=None):
+    """Build the timestamped filename for an application"""
+    now = now or datetime.now()
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    applicant_name = f"{application_data.get('firstName', 'Unknown')}_{application_data.get('lastName', 'Unknown')}"
+    applicant_name = applicant_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
+    return f"{timestamp}_{applicant_name}.json"
+
+def stamp_application(application_data, client_ip):
+    """Add the submission metadata; return the intended filename"""
+    now = datetime.now()
+    application_data['submittedAt'] = now.isoformat()
+    application_data['submittedFrom'] = client_ip
+    return application_filename(application_data, now)
+
+def index_applications(saved):
+    """Add stored (filename, application) pairs to the index"""
+    # The applications are already stored; a stale index is fixed by a rebuild
+    if _index is None:
+        return
+    try:
+        with _index.transaction():
+            for filename, application_data in saved:
+                _index.add(filename, application_data)
+    except sqlite3.Error as e:
+        print(f"⚠️  Index update failed for {len(saved)} application(s): {e}")
+
+def saved_response(filename, application_data):
+    """Response body for a stored application"""
+    return {
+        'success': True,
+        'message': 'Application submitted successfully',
+        'filename': filename,
+        'timestamp': application_data['submittedAt']
+    }
+
+def save_application(application_data, client_ip, store=None):
+    """Stamp metadata, persist the application and return the response body"""
+    filename = stamp_application(application_data, client_ip)
+
+    # The backend may adjust the name to keep it unique
+    started = time.perf_counter()
+    filename = (store or get_store()).save(filename, application_data)
+    metrics.observe('application_save_duration_seconds', time.perf_counter() - started,
+                    (('mode', 'inline'),))
+    metrics.inc('applications_saved_total')
+    index_applications([(filename, application_data)])
+    return saved_response(filename, application_data)
+
+# Optional background submission queue (see configure_queue)
+ACK_POLICIES = ('enqueue', 'fsync')
+DEFAULT_ACK = 'fsync'
+DEFAULT_QUEUE_BATCH = 64
+QUEUE_RETRY_AFTER = 2           # seconds suggested to clients when the queue is full
+QUEUE_TIMEOUT = 30              # seconds a request waits for its batch to be saved
+
+class QueueFull(StoreError):
+    """The submission queue can't take more work right now"""
+
+class SubmissionQueue:
+    """Bounded queue drained by one writer thread that saves in batches
+
+    Every batch is written durably. ack='fsync' resolves each submission's
+    future once its batch is durable; ack='enqueue' resolves it as soon as
+    it is queued, so a crash can still lose submissions not yet written.
+    """
+
+    def __init__(self, store, maxsize, ack=DEFAULT_ACK, batch_size=DEFAULT_QUEUE_BATCH):
+        self.store = store
+        self.ack = ack
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='submission-writer',
+                                        daemon=True)
+        self._writer.start()
+
+    def submit(self, application_data, client_ip):
+        """Queue an application; return a Future for its response body
+
+        Raises QueueFull when the queue is full or shutting down.
+        """
+        filename = stamp_application(application_data, client_ip)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise QueueFull("Server is shutting down")
+            try:
+                self._queue.put_nowait((filename, application_data, future))
+            except queue.Full:
+                raise QueueFull("Submission queue is full")
+        if self.ack == 'enqueue':
+            future.set_result(dict(saved_response(filename, application_data),
+                                   message='Application received', queued=True))
+        return future
+
+    def pending(self):
+        """Submissions waiting to be written"""
+        return self._queue.qsize()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        """Persist one batch and resolve its futures"""
+        started = time.perf_counter()
+        try:
+            filenames = self.store.save_batch([(filename, application_data)
+                                               for filename, application_data, _ in batch],
+                                              fsync=True)
+        except Exception as e:
+            print(f"❌ Failed to save {len(batch)} queued application(s): {e}")
+            for filename, _, future in batch:
+                if future.done():
+                    print(f"❌ Lost acknowledged application: {filename}")
+                else:
+                    future.set_exception(e)
+            return
+
+        metrics.observe('application_save_duration_seconds', time.perf_counter() - started,
+                        (('mode', 'batch'),))
+        metrics.inc('applications_saved_total', value=len(batch))
+        saved = [(filename, application_data)
+                 for filename, (_, application_data, _) in zip(filenames, batch)]
+        index_applications(saved)
+        for (filename, application_data), (_, _, future) in zip(saved, batch):
+            if not future.done():
+                future.set_result(saved_response(filename, application_data))
+
+    def close(self):
+        """Stop taking submissions and wait until every queued one is saved"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        pending = self.pending()
+        if pending:
+            print(f"⏳ Draining {pending} queued application(s)...")
+        self._queue.put(None)
+        self._writer.join()
+
+_queue_settings = None
+_queue = None
+_queue_pid = None
+
+def configure_queue(maxsize=0, ack=DEFAULT_ACK, batch_size=DEFAULT_QUEUE_BATCH):
+    """Save submissions through a background queue (maxsize=0 disables it)"""
+    global _queue_settings
+    close_storage()
+    _queue_settings = (maxsize, ack, batch_size) if maxsize > 0 else None
+
+def get_queue():
+    """This process's submission queue, or None when submissions save inline"""
+    global _queue, _queue_pid
+    if _queue_settings is None:
+        return None
+    store = get_store()
+    with _store_lock:
+        if _queue is None or _queue_pid != os.getpid():
+            _queue = SubmissionQueue(store, *_queue_settings)
+            _queue_pid = os.getpid()
+        return _queue
+
+def queue_depth():
+    """Applications waiting in this process's queue (0 without one)"""
+    if _queue is None or _queue_pid != os.getpid():
+        return 0
+    return _queue.pending()
+
+metrics.add_collector(lambda: [('submission_queue_depth', (), queue_depth())])
+
+def accept_application(application_data, client_ip, idempotency_key=None):
+    """Save inline or through the queue; return (HTTP status, response body, replayed)
+
+    For the blocking server engines. A retry of a recent submission gets
+    the original response back (replayed=True) without storing it again.
+    Raises QueueFull when the queue can't take the application and
+    IdempotencyError for a misused key.
+    """
+    cache = get_idempotency_cache()
+    claim = cache.begin(idempotency_key, application_data) if cache is not None else None
+    if claim is not None and not claim.owner:
+        status, response = claim.future.result(WAIT_TIMEOUT)
+        metrics.inc('idempotent_replays_total')
+        return status, response, True
+    try:
+        submission_queue = get_queue()
+        if submission_queue is None:
+            status, response = 200, save_application(application_data, client_ip)
+        else:
+            response = submission_queue.submit(application_data, client_ip).result(QUEUE_TIMEOUT)
+            status = 202 if response.get('queued') else 200
+    except BaseException as e:
+        if claim is not None:
+            cache.abandon(claim, e)
+        raise
+    if claim is not None:
+        cache.finish(claim, status, response)
+    return status, response, False
+
+async def accept_application_async(application_data, client_ip, idempotency_key=None,
+                                   store=None):
+    """asyncio counterpart of accept_application; blocking work runs off the loop"""
+    cache = get_idempotency_cache()
+    claim = cache.begin(idempotency_key, application_data) if cache is not None else None
+    if claim is not None and not claim.owner:
+        status, response = await asyncio.wait_for(asyncio.wrap_future(claim.future),
+                                                  WAIT_TIMEOUT)
+        metrics.inc('idempotent_replays_total')
+        return status, response, True
+    try:
+        submission_queue = get_queue()
+        if submission_queue is None:
+            # Disk writes run on the default executor to keep the loop responsive
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                None, save_application, application_data, client_ip, store)
+            status = 200
+        else:
+            response = await asyncio.wrap_future(
+                submission_queue.submit(application_data, client_ip))
+            status = 202 if response.get('queued') else 200
+    except BaseException as e:
+        if claim is not None:
+            cache.abandon(claim, e)
+        raise
+    if claim is not None:
+        cache.finish(claim, status, response)
+    return status, response, False
+
+def add_queue_arguments(parser):
+    """Add the submission queue options shared by the servers to an argparse parser"""
+    group = parser.add_argument_group('submission queue')
+    group.add_argument('--queue-size', type=int, default=0,
+                       help="Save submissions on a background writer thread with this many "
+                            "waiting at most; when full, clients get 503 (default: 0, save inline)")
+    group.add_argument('--ack', choices=ACK_POLICIES, default=DEFAULT_ACK,
+                       help="With --queue-size, answer once the application is durably saved "
+                            f"(fsync) or as soon as it is queued (enqueue) (default: {DEFAULT_ACK})")
+    group.add_argument('--queue-batch', type=int, default=DEFAULT_QUEUE_BATCH,
+                       help=f"Most applications saved per batch (default: {DEFAULT_QUEUE_BATCH})")
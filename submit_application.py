@@ -5,75 +5,169 @@ Receives form data and stores it in JSON files
 """
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
 import json
 import os
 from datetime import datetime
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlsplit
 import cgi
 
+from request_body import MAX_BODY_BYTES, RequestBodyError, read_json_body
+from access_log import (add_access_log_arguments, close_access_log,
+                        configure_access_log_from_args, log_request, request_id)
+from admin_access import add_admin_arguments, configure_admin_token, is_admin_request
+import metrics
+from application_index import add_index_arguments
+from application_store import add_storage_arguments, storage_factory_from_args
+from idempotency import (IdempotencyError, add_idempotency_arguments,
+                         configure_idempotency)
+from rate_limit import (add_rate_limit_arguments, check_request, configure_rate_limits,
+                        rate_limits_from_args, retry_after_header)
+from submissions import (QUEUE_RETRY_AFTER, SUBMISSIONS_DIR, QueueFull, accept_application,
+                         add_queue_arguments, close_storage, configure_index, configure_queue,
+                         configure_storage)
+
 # Configuration
-SUBMISSIONS_DIR = "applications"
 PORT = 8001
+METRIC_ROUTES = frozenset(['/submit', '/metrics'])
 
 class ApplicationHandler(BaseHTTPRequestHandler):
     """Handle rental application submissions"""
     
+    max_body_bytes = MAX_BODY_BYTES
+    # Don't hold the body back waiting for the client to ACK the headers
+    disable_nagle_algorithm = True
+    
+    def handle_one_request(self):
+        """Handle one request, recording it in the metrics"""
+        self.metrics_started = None
+        self.request_id = None
+        self.response_status = None
+        self.response_bytes = 0
+        try:
+            super().handle_one_request()
+        finally:
+            if self.metrics_started is not None:
+                self.record_request()
+    
+    def parse_request(self):
+        """Parse the request line and headers, then start timing the request"""
+        if not super().parse_request():
+            return False
+        self.metrics_started = metrics.request_started()
+        self.request_id = request_id(self.headers.get('X-Request-Id'))
+        return True
+    
+    def record_request(self):
+        """Count the finished request and write its access log entry"""
+        path = urlsplit(self.path).path
+        route = metrics.route_label(path, METRIC_ROUTES)
+        duration = metrics.request_finished(self.metrics_started, route, self.command,
+                                            self.response_status, self.response_bytes)
+        log_request(self.request_id, self.client_address[0], self.command, path, route,
+                    self.response_status, self.response_bytes, duration)
+    
+    def send_response(self, code, message=None):
+        """Send the status line, remembering the status for metrics"""
+        self.response_status = code
+        super().send_response(code, message)
+    
+    def send_header(self, keyword, value):
+        """Send a header, noting the body size it announces"""
+        if keyword.lower() == 'content-length' and self.command != 'HEAD':
+            self.response_bytes = int(value)
+        super().send_header(keyword, value)
+    
+    def end_headers(self):
+        """Echo the request id on every response"""
+        if self.request_id is not None:
+            self.send_header('X-Request-Id', self.request_id)
+        super().end_headers()
+    
+    def do_GET(self):
+        """Serve the admin Prometheus scrape at /metrics"""
+        url = urlsplit(self.path)
+        if url.path != '/metrics':
+            self.send_error(404, "Endpoint not found")
+            return
+        token = self.headers.get('X-Admin-Token') or parse_qs(url.query).get('token', [None])[0]
+        if not is_admin_request(self.client_address[0], token):
+            self.send_error(403, "Admin access required")
+            return
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', metrics.CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
         self.end_headers()
     
+    def send_json(self, code, payload, headers=()):
+        """Send a JSON response with CORS headers"""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        
+        self.wfile.write(body)
+    
     def do_POST(self):
         """Handle POST request with application data"""
+        wait = check_request(self.client_address[0], 'submit')
+        if wait:
+            print(f"⚠️  Rate limited: {self.client_address[0]}")
+            self.send_json(429, {'success': False, 'message': 'Too many requests'},
+                           [('Retry-After', retry_after_header(wait))])
+            return
         if self.path == '/submit':
             try:
-                # Get content length
-                content_length = int(self.headers.get('Content-Length', 0))
-                
-                # Read and parse JSON data
-                post_data = self.rfile.read(content_length)
-                application_data = json.loads(post_data.decode('utf-8'))
-                
-                # Add metadata
-                application_data['submittedAt'] = datetime.now().isoformat()
-                application_data['submittedFrom'] = self.client_address[0]
-                
-                # Create submissions directory if it doesn't exist
-                if not os.path.exists(SUBMISSIONS_DIR):
-                    os.makedirs(SUBMISSIONS_DIR)
+                # Stream and parse JSON data, bounded by max_body_bytes
+                application_data = read_json_body(self.rfile, self.headers, self.max_body_bytes)
                 
-                # Generate unique filename with timestamp
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                applicant_name = f"{application_data.get('firstName', 'Unknown')}_{application_data.get('lastName', 'Unknown')}"
-                applicant_name = applicant_name.replace(' ', '_').replace('/', '_')
-                filename = f"{timestamp}_{applicant_name}.json"
-                filepath = os.path.join(SUBMISSIONS_DIR, filename)
-                
-                # Save application data to JSON file
-                with open(filepath, 'w') as f:
-                    json.dump(application_data, f, indent=2)
+                # Stamp metadata and save application data to JSON file
+                code, response, replayed = accept_application(
+                    application_data, self.client_address[0], self.headers.get('Idempotency-Key'))
+                filename = response['filename']
+                applicant_name = f"{application_data.get('firstName', 'Unknown')} {application_data.get('lastName', 'Unknown')}"
                 
                 # Log submission
-                print(f"✅ Application received: {applicant_name} - Saved to {filename}")
+                if replayed:
+                    print(f"♻️  Duplicate submission from {applicant_name} - Already saved to {filename}")
+                else:
+                    print(f"✅ Application received: {applicant_name} - "
+                          f"{'Queued as' if code == 202 else 'Saved to'} {filename}")
                 
                 # Send success response
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
+                self.send_json(code, response, [('Idempotent-Replayed', 'true')] if replayed else [])
+                
+            except RequestBodyError as e:
+                # Missing, oversized or malformed body
+                self.send_error(e.status, e.message)
+                print(f"❌ Rejected submission: {e.message}")
+                
+            except IdempotencyError as e:
+                # Malformed key, or a key reused for a different application
+                self.send_error(e.status, e.message)
+                print(f"❌ Rejected submission: {e.message}")
                 
-                response = {
-                    'success': True,
-                    'message': 'Application submitted successfully',
-                    'filename': filename,
-                    'timestamp': application_data['submittedAt']
-                }
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+            except QueueFull as e:
+                # Writer is behind; ask the client to come back shortly
+                self.send_json(503, {'success': False, 'message': str(e)},
+                               [('Retry-After', str(QUEUE_RETRY_AFTER))])
+                print(f"⚠️  Submission refused: {e}")
                 
-            except json.JSONDecodeError as e:
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
                 # JSON parsing error
                 self.send_error(400, f"Invalid JSON: {str(e)}")
                 print(f"❌ JSON Error: {e}")
@@ -85,21 +179,24 @@ class ApplicationHandler(BaseHTTPRequestHandler):
         else:
             self.send_error(404, "Endpoint not found")
     
+    def log_request(self, code='-', size='-'):
+        """Access entries are written by record_request() once the response is sent"""
+    
     def log_message(self, format, *args):
-        """Custom log format"""
+        """Custom log format for errors; requests go to the access log"""
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {format % args}")
 
-def run_server():
+def run_server(host='', port=PORT):
     """Start the application submission server"""
-    server_address = ('', PORT)
+    server_address = (host, port)
     httpd = HTTPServer(server_address, ApplicationHandler)
     
     print("=" * 70)
     print("🏢 PepperTree Townhomes - Application Submission Server")
     print("=" * 70)
-    print(f"✅ Server running on port {PORT}")
+    print(f"✅ Server running on port {port}")
     print(f"📁 Storing applications in: {os.path.abspath(SUBMISSIONS_DIR)}/")
-    print(f"🔗 Endpoint: http://localhost:{PORT}/submit")
+    print(f"🔗 Endpoint: http://localhost:{port}/submit")
     print(f"📋 Ready to receive applications...")
     print("=" * 70)
     print("\nPress Ctrl+C to stop the server\n")
@@ -109,6 +206,36 @@ def run_server():
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped by user")
         httpd.shutdown()
+    finally:
+        close_storage()
+        close_access_log()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="PepperTree application submission server")
+    parser.add_argument('--host', default='', help="Address to bind (default: all interfaces)")
+    parser.add_argument('--port', type=int, default=PORT, help=f"Port to listen on (default: {PORT})")
+    parser.add_argument('--max-body-bytes', type=int, default=MAX_BODY_BYTES,
+                        help=f"Largest accepted submission body (default: {MAX_BODY_BYTES})")
+    add_admin_arguments(parser)
+    add_storage_arguments(parser)
+    add_index_arguments(parser)
+    add_queue_arguments(parser)
+    add_idempotency_arguments(parser)
+    # HTTPServer serves one connection at a time, so there is no per-IP cap to set
+    add_rate_limit_arguments(parser, connection_limit=False)
+    add_access_log_arguments(parser)
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
-    run_server()
+    args = parse_args()
+    configure_admin_token(args.admin_token)
+    configure_access_log_from_args(args)
+    configure_storage(storage_factory_from_args(args))
+    configure_queue(args.queue_size, args.ack, args.queue_batch)
+    configure_idempotency(args.idempotency_ttl, args.idempotency_entries, args.idempotency_db)
+    configure_rate_limits(rate_limits_from_args(args))
+    configure_index(args.index_path if args.index else None,
+                    watch=args.watch_index, poll=args.watch_poll)
+    ApplicationHandler.max_body_bytes = args.max_body_bytes
+    run_server(args.host, args.port)
@@ -0,0 +1,29 @@
+import pytest
+
+import admin_access
+from admin_access import configure_admin_token, is_admin_request
+
+@pytest.fixture
+def token():
+    configure_admin_token('sécret')
+    yield 'sécret'
+    configure_admin_token(None)
+
+def test_loopback_only_without_a_token():
+    assert admin_access.ADMIN_TOKEN is None
+    assert is_admin_request('127.0.0.1', None)
+    assert not is_admin_request('203.0.113.5', None)
+
+@pytest.mark.parametrize('supplied', ['é', 'secret', 'sécret ', '', None])
+def test_wrong_or_non_ascii_tokens_are_refused(token, supplied):
+    assert not is_admin_request('127.0.0.1', supplied)
+
+def test_non_ascii_token_matches(token):
+    assert is_admin_request('203.0.113.5', token)
+
+def test_non_ascii_token_against_an_ascii_one():
+    configure_admin_token('secret')
+    try:
+        assert not is_admin_request('127.0.0.1', 'é')
+    finally:
+        configure_admin_token(None)
@@ -0,0 +1,161 @@
+import base64
+import json
+
+import pytest
+
+from application_index import (ApplicationIndex, QueryError, encode_cursor,
+                               list_applications_response)
+
+def application(n, **fields):
+    data = {'firstName': f'First{n}', 'lastName': f'Last{n}', 'email': f'user{n}@example.com',
+            'cellPhone': f'(555) 010-{n:04d}',
+            # Several applications per second, so the filename breaks ties
+            'submittedAt': f'2025-10-01T12:00:{n // 3:02d}'}
+    data.update(fields)
+    return data
+
+@pytest.fixture
+def index(tmp_path):
+    index = ApplicationIndex(str(tmp_path / 'index.sqlite3'))
+    yield index
+    index.close()
+
+@pytest.fixture
+def filled(index):
+    for n in range(50):
+        index.add(f'app{n:03d}.json', application(n))
+    return index
+
+def all_pages(index, limit, **filters):
+    names = []
+    cursor = None
+    while True:
+        rows, cursor = index.query(limit, cursor, fields=['filename'], **filters)
+        names.extend(row['filename'] for row in rows)
+        if cursor is None:
+            return names
+
+@pytest.mark.parametrize('limit', [1, 7, 10, 49, 50, 51])
+def test_pages_have_no_duplicates_or_gaps(filled, limit):
+    expected = [f'app{n:03d}.json' for n in reversed(range(50))]
+    assert all_pages(filled, limit) == expected
+
+def test_new_submissions_do_not_shift_later_pages(filled):
+    rows, cursor = filled.query(10, fields=['filename'])
+    names = [row['filename'] for row in rows]
+    filled.add('app999.json', application(999, submittedAt='2099-01-01T00:00:00'))
+    while cursor:
+        rows, cursor = filled.query(10, cursor, fields=['filename'])
+        names.extend(row['filename'] for row in rows)
+    assert names == [f'app{n:03d}.json' for n in reversed(range(50))]
+
+def test_last_full_page_has_no_cursor(filled):
+    rows, cursor = filled.query(50)
+    assert len(rows) == 50 and cursor is None
+
+def b64(raw):
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    b64(b'\xff\xfe'),
+    b64(b'{"submitted_at": "x"}'),
+    b64(b'["2025-10-01", "app.json", "extra"]'),
+    b64(b'[1, 2]'),
+    b64(b'null'),
+])
+def test_invalid_cursors(filled, cursor):
+    with pytest.raises(QueryError):
+        filled.query(10, cursor)
+
+def test_tampered_cursor_only_moves_the_start(filled):
+    cursor = encode_cursor({'submitted_at': '2025-10-01T12:00:05', 'filename': 'zzz'})
+    rows, _ = filled.query(100, cursor, fields=['filename'])
+    assert [row['filename'] for row in rows] == [f'app{n:03d}.json'
+                                                 for n in reversed(range(18))]
+
+def test_name_filter_escapes_like_wildcards(index):
+    index.add('a.json', application(1, firstName='100%_Real'))
+    index.add('b.json', application(2, firstName='100xReal'))
+    index.add('c.json', application(3, firstName='_under'))
+    index.add('d.json', application(4, lastName='x\\y'))
+
+    def names(**filters):
+        return sorted(row['filename'] for row in index.query(10, fields=['filename'],
+                                                             **filters)[0])
+
+    assert names(name='100%') == ['a.json']
+    assert names(name='100%_') == ['a.json']
+    assert names(name='100') == ['a.json', 'b.json']
+    assert names(name='_') == ['c.json']
+    assert names(name='%') == []
+    assert names(name='x\\') == ['d.json']
+
+def test_email_filter_escapes_like_wildcards(index):
+    index.add('a.json', application(1, email='a_b@example.com'))
+    index.add('b.json', application(2, email='axb@example.com'))
+    rows, _ = index.query(10, email='a_b', fields=['filename'])
+    assert [row['filename'] for row in rows] == ['a.json']
+
+def test_name_filter_is_a_case_insensitive_prefix(filled):
+    rows, _ = filled.query(100, name='first4', fields=['filename'])
+    assert sorted(row['filename'] for row in rows) == ['app004.json'] + [
+        f'app{n:03d}.json' for n in range(40, 50)]
+
+def test_phone_filter_matches_digit_prefixes(filled):
+    rows, _ = filled.query(100, phone='555-010-001', fields=['filename'])
+    assert sorted(row['filename'] for row in rows) == [f'app{n:03d}.json' for n in range(10, 20)]
+    with pytest.raises(QueryError):
+        filled.query(10, phone='call me')
+
+def test_filters_combine_with_pagination(filled):
+    assert all_pages(filled, 3, name='First4') == all_pages(filled, 100, name='First4')
+
+def test_move_in_filters_read_move_in_date(index):
+    index.add('a.json', application(1, moveInDate='2025-10-31'))
+    index.add('b.json', application(2, desiredMoveIn='2025-12-01'))
+    index.add('c.json', application(3))
+
+    def names(**filters):
+        return sorted(row['filename'] for row in index.query(10, fields=['filename'],
+                                                             **filters)[0])
+
+    assert names(move_in_from='2025-11-01') == ['b.json']
+    assert names(move_in_to='2025-11-01') == ['a.json']
+    assert names(move_in_from='2025-10-01', move_in_to='2025-12-31') == ['a.json', 'b.json']
+
+def test_field_projection(filled):
+    rows, _ = filled.query(1, fields=['email'])
+    assert rows == [{'email': 'user49@example.com'}]
+
+@pytest.mark.parametrize('query', [
+    {'fields': ['email,ssn']},
+    {'move_in_from': ['10/31/2025']},
+    {'cursor': ['garbage']},
+])
+def test_response_rejects_invalid_parameters(filled, query):
+    with pytest.raises(QueryError):
+        list_applications_response(filled, query)
+
+def test_response_pages_by_cursor(filled):
+    first = list_applications_response(filled, {'limit': ['20'], 'fields': ['filename']})
+    second = list_applications_response(filled, {'limit': ['20'], 'fields': ['filename'],
+                                                 'cursor': [first['next_cursor']]})
+    names = [row['filename'] for row in first['applications'] + second['applications']]
+    assert names == [f'app{n:03d}.json' for n in reversed(range(10, 50))]
+    assert second['limit'] == 20
+
+def test_appointments_are_indexed_without_the_watcher(tmp_path):
+    from submissions import configure_index
+    appointments = tmp_path / 'appointments'
+    appointments.mkdir()
+    (appointments / 'apt_1.json').write_text(json.dumps(
+        {'id': 'apt_1', 'submitted_at': '2026-01-01T10:00:00', 'status': 'pending'}))
+    index = configure_index(str(tmp_path / 'index.sqlite3'), None,
+                            appointments_dir=str(appointments))
+    try:
+        assert [a['id'] for a in index.list_appointments()] == ['apt_1']
+        assert index.summary()['appointments_by_status'] == {'pending': 1}
+    finally:
+        configure_index(None)
+        index.close()
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from application_store import (ACTIVE_SUFFIX, RECORD_HEADER, SEALED_SUFFIX, LogStore,
+                               export_log, list_segments, read_segment, segment_is_sealed)
+
+def application(n):
+    return {'firstName': f'Applicant{n}', 'lastName': 'Test', 'notes': 'x' * 100}
+
+def logged(n):
+    """The name LogStore gives app{n}.json in this process"""
+    return f'app{n}_{os.getpid()}.json'
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / 'log')
+
+def write_log(log_dir, count, **kwargs):
+    store = LogStore(log_dir, commit_interval=0.001, **kwargs)
+    try:
+        for n in range(count):
+            store.save(f'app{n}.json', application(n))
+    finally:
+        store.close()
+
+def read_all(log_dir):
+    return [record for path in list_segments(log_dir) for record in read_segment(path)]
+
+def test_records_round_trip(log_dir):
+    write_log(log_dir, 3)
+    assert read_all(log_dir) == [(logged(n), application(n)) for n in range(3)]
+
+def test_reused_filenames_are_made_unique(log_dir):
+    store = LogStore(log_dir, commit_interval=0.001)
+    try:
+        names = store.save_batch([('same.json', application(1)), ('same.json', application(2))])
+    finally:
+        store.close()
+    pid = os.getpid()
+    assert names == [f'same_{pid}.json', f'same_{pid}_2.json']
+
+def test_filenames_are_unique_across_processes(log_dir):
+    script = (f"from application_store import LogStore; "
+              f"store = LogStore({log_dir!r}, commit_interval=0.001); "
+              f"store.save('same.json', {{}}); store.close()")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
+    names = [name for name, _ in read_all(log_dir)]
+    assert len(names) == 2 and len(set(names)) == 2
+
+@pytest.mark.parametrize('cut', [1, RECORD_HEADER.size - 1, RECORD_HEADER.size + 5])
+def test_torn_tail_keeps_earlier_records(log_dir, cut):
+    write_log(log_dir, 3)
+    [path] = list_segments(log_dir)
+    # Drop the last record and append only the first bytes of a new one
+    records = read_all(log_dir)
+    with open(path, 'rb') as f:
+        data = f.read()
+    last = json.dumps({'filename': 'app2.json', 'application': application(2)},
+                      separators=(',', ':')).encode('utf-8')
+    data = data[:-len(last) - RECORD_HEADER.size]
+    tail = RECORD_HEADER.pack(len(last), 0) + last
+    with open(path, 'wb') as f:
+        f.write(data + tail[:cut])
+    assert read_all(log_dir) == records[:2]
+
+def test_corrupt_record_stops_reading(log_dir):
+    write_log(log_dir, 3)
+    [path] = list_segments(log_dir)
+    with open(path, 'r+b') as f:
+        f.seek(-5, os.SEEK_END)
+        f.write(b'#')
+    assert [name for name, _ in read_all(log_dir)] == [logged(0), logged(1)]
+
+def test_not_a_segment_is_skipped(log_dir):
+    os.makedirs(log_dir)
+    with open(os.path.join(log_dir, 'bogus' + SEALED_SUFFIX), 'wb') as f:
+        f.write(b'not a log')
+    assert read_all(log_dir) == []
+
+def test_segments_roll_over_at_the_size_limit(log_dir):
+    write_log(log_dir, 10, segment_bytes=400)
+    segments = list_segments(log_dir)
+    assert len(segments) > 1
+    assert all(path.endswith(SEALED_SUFFIX) for path in segments)
+    assert read_all(log_dir) == [(logged(n), application(n)) for n in range(10)]
+
+def test_active_segment_of_a_live_writer_is_not_sealed(log_dir):
+    store = LogStore(log_dir, commit_interval=0.001)
+    try:
+        store.save('app.json', application(1))
+        [path] = list_segments(log_dir)
+        assert path.endswith(ACTIVE_SUFFIX)
+        assert not segment_is_sealed(path)
+    finally:
+        store.close()
+    [path] = list_segments(log_dir)
+    assert segment_is_sealed(path)
+
+def test_active_segment_of_a_dead_writer_is_sealed(tmp_path):
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    path = tmp_path / f'20250101_000000-{child.pid}-0001{ACTIVE_SUFFIX}'
+    assert segment_is_sealed(str(path))
+    assert segment_is_sealed(str(tmp_path / f'malformed{ACTIVE_SUFFIX}'))
+
+def test_export_is_idempotent(log_dir, tmp_path):
+    output_dir = tmp_path / 'out'
+    write_log(log_dir, 3)
+    export_log(log_dir, str(output_dir))
+    export_log(log_dir, str(output_dir))
+    assert sorted(os.listdir(output_dir)) == [logged(0), logged(1), logged(2)]
+
+def test_export_next_to_a_different_file_is_idempotent(log_dir, tmp_path):
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    (output_dir / logged(0)).write_text(json.dumps({'firstName': 'Someone else'}))
+    write_log(log_dir, 1)
+    export_log(log_dir, str(output_dir))
+    export_log(log_dir, str(output_dir))
+    renamed = logged(0).replace('.json', '_2.json')
+    assert sorted(os.listdir(output_dir)) == [logged(0), renamed]
+    assert json.loads((output_dir / renamed).read_text()) == application(0)
+
+def test_compact_removes_only_exported_sealed_segments(log_dir, tmp_path):
+    write_log(log_dir, 10, segment_bytes=400)
+    store = LogStore(log_dir, commit_interval=0.001)
+    try:
+        store.save('live.json', application(99))
+        export_log(log_dir, str(tmp_path / 'out'), compact=True)
+        [path] = list_segments(log_dir)
+        assert path.endswith(ACTIVE_SUFFIX)
+    finally:
+        store.close()
+    assert len(os.listdir(tmp_path / 'out')) == 11
@@ -0,0 +1,51 @@
+import asyncio
+import re
+
+import pytest
+
+from async_server import AsyncApplicationServer
+
+async def exchange(app, raw):
+    """Send raw bytes to a fresh connection and return everything it answers"""
+    server = await asyncio.start_server(app.handle_connection, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+
+def statuses(response):
+    return re.findall(r'HTTP/1\.1 (\d{3}) ', response.decode('latin-1'))
+
+SMUGGLED = b'GET /smuggled HTTP/1.1\r\nHost: x\r\n\r\n'
+
+@pytest.fixture
+def app(tmp_path):
+    (tmp_path / 'smuggled').write_text('smuggled')
+    (tmp_path / 'index.html').write_text('index')
+    return AsyncApplicationServer(str(tmp_path), keepalive_timeout=2)
+
+@pytest.mark.parametrize('method, path', [('POST', '/unknown'), ('PUT', '/index.html')])
+def test_unread_body_closes_the_connection(app, method, path):
+    raw = (f'{method} {path} HTTP/1.1\r\nHost: x\r\n'
+           f'Content-Length: {len(SMUGGLED)}\r\n\r\n').encode() + SMUGGLED
+    response = asyncio.run(exchange(app, raw))
+    assert len(statuses(response)) == 1
+    assert b'Connection: close' in response
+    assert b'smuggled' not in response.split(b'\r\n\r\n', 1)[1]
+
+def test_unread_chunked_body_closes_the_connection(app):
+    raw = (b'POST /unknown HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n'
+           b'%x\r\n%s\r\n0\r\n\r\n' % (len(SMUGGLED), SMUGGLED))
+    response = asyncio.run(exchange(app, raw))
+    assert statuses(response) == ['404']
+
+def test_pipelined_requests_without_bodies_stay_alive(app):
+    raw = (b'GET /index.html HTTP/1.1\r\nHost: x\r\n\r\n'
+           b'POST /unknown HTTP/1.1\r\nHost: x\r\nContent-Length: 0\r\n\r\n'
+           b'GET /index.html HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+    response = asyncio.run(exchange(app, raw))
+    assert statuses(response) == ['200', '404', '200']
@@ -0,0 +1,13 @@
+import pytest
+
+from build_responsive_images import WIDTHS, target_widths
+
+@pytest.mark.parametrize('width, expected', [
+    (1600, [400, 800, 1200, 1600]),     # exactly the largest width
+    (3000, [400, 800, 1200, 1600]),
+    (800, [400, 800]),
+    (1000, [400, 800, 1000]),           # the full size, never upscaled
+    (300, [300]),
+])
+def test_target_widths(width, expected):
+    assert target_widths(width, WIDTHS) == expected
@@ -0,0 +1,127 @@
+import asyncio
+import io
+import json
+from http import HTTPStatus
+
+import pytest
+
+from request_body import (CHUNK_SIZE, MAX_CHUNK_LINE, RequestBodyError, iter_body,
+                          read_json_body, read_json_body_async, read_text_body)
+
+def body(raw, headers, max_bytes=1024):
+    return b''.join(iter_body(io.BytesIO(raw), headers, max_bytes))
+
+def chunked(*chunks, trailer=b''):
+    return b''.join(b'%x\r\n%s\r\n' % (len(c), c) for c in chunks) + b'0\r\n' + trailer + b'\r\n'
+
+CHUNKED = {'transfer-encoding': 'chunked'}
+
+def test_content_length_body():
+    assert body(b'{"a": 1}extra', {'content-length': '8'}) == b'{"a": 1}'
+
+def test_large_body_is_read_in_bounded_chunks():
+    raw = b'x' * (CHUNK_SIZE * 2 + 10)
+    pieces = list(iter_body(io.BytesIO(raw), {'content-length': str(len(raw))}, len(raw)))
+    assert b''.join(pieces) == raw
+    assert max(map(len, pieces)) <= CHUNK_SIZE
+
+def test_missing_content_length_is_an_empty_body():
+    assert body(b'ignored', {}) == b''
+    with pytest.raises(json.JSONDecodeError):
+        read_json_body(io.BytesIO(b'ignored'), {})
+
+@pytest.mark.parametrize('value', ['abc', '-1', '1.5'])
+def test_invalid_content_length(value):
+    with pytest.raises(RequestBodyError) as e:
+        body(b'', {'content-length': value})
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+
+def test_content_length_over_the_cap_is_rejected_before_reading():
+    rfile = io.BytesIO(b'x' * 2000)
+    with pytest.raises(RequestBodyError) as e:
+        list(iter_body(rfile, {'content-length': '2000'}, 1024))
+    assert e.value.status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert rfile.tell() == 0
+
+def test_chunked_body_over_the_cap():
+    with pytest.raises(RequestBodyError) as e:
+        body(chunked(b'x' * 600, b'y' * 600), CHUNKED)
+    assert e.value.status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+def test_truncated_body():
+    with pytest.raises(RequestBodyError) as e:
+        body(b'{"a"', {'content-length': '8'})
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+
+def test_chunked_body_with_extensions():
+    raw = b'4;name=value\r\nabcd\r\n3\r\nefg\r\n0\r\n\r\n'
+    assert body(raw, CHUNKED) == b'abcdefg'
+
+def test_chunk_trailers_are_skipped():
+    rfile = io.BytesIO(chunked(b'abc', trailer=b'X-Checksum: 1\r\nX-Other: 2\r\n') + b'NEXT')
+    assert b''.join(iter_body(rfile, CHUNKED)) == b'abc'
+    assert rfile.read() == b'NEXT'
+
+def test_unterminated_trailer():
+    with pytest.raises(RequestBodyError):
+        body(b'3\r\nabc\r\n0\r\nX-Checksum: 1\r\n', CHUNKED)
+
+@pytest.mark.parametrize('raw', [
+    b'zz\r\nabc\r\n0\r\n\r\n',                      # not hex
+    b'\r\nabc\r\n0\r\n\r\n',                        # empty size
+    b'-1\r\n' + b'x' * 2000,                        # negative size
+    b'0x3\r\nabc\r\n0\r\n\r\n',                     # hex prefix
+    b'+3\r\nabc\r\n0\r\n\r\n',                      # signed size
+    b'3',                                           # no line ending
+    b'1' * (MAX_CHUNK_LINE + 10) + b'\r\n',         # overlong size line
+    b'3\r\nabcX\r\n0\r\n\r\n',                      # chunk longer than its size
+])
+def test_malformed_chunks(raw):
+    with pytest.raises(RequestBodyError) as e:
+        body(raw, CHUNKED)
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+
+def test_unsupported_transfer_encoding():
+    with pytest.raises(RequestBodyError) as e:
+        body(b'', {'transfer-encoding': 'gzip, chunked'})
+    assert e.value.status == HTTPStatus.NOT_IMPLEMENTED
+
+def test_utf8_split_across_chunks():
+    text = 'Zoë Ångström'
+    encoded = text.encode('utf-8')
+    raw = chunked(encoded[:3], encoded[3:])
+    assert read_text_body(io.BytesIO(raw), CHUNKED) == text
+
+def test_invalid_utf8_is_reported_after_the_whole_body_is_read():
+    raw = b'{"a": "\xff' + b'x' * (CHUNK_SIZE * 2) + b'"}'
+    rfile = io.BytesIO(raw + b'NEXT')
+    with pytest.raises(UnicodeDecodeError):
+        read_text_body(rfile, {'content-length': str(len(raw))}, len(raw))
+    assert rfile.read() == b'NEXT'
+
+def read_async(raw, headers, max_bytes=1024):
+    async def run():
+        reader = asyncio.StreamReader(limit=MAX_CHUNK_LINE)
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_json_body_async(reader, headers, max_bytes)
+    return asyncio.run(run())
+
+def test_async_chunked_json():
+    assert read_async(chunked(b'{"a":', b' 1}', trailer=b'X: y\r\n'), CHUNKED) == {'a': 1}
+
+def test_async_size_cap():
+    with pytest.raises(RequestBodyError) as e:
+        read_async(chunked(b'x' * 600, b'y' * 600), CHUNKED)
+    assert e.value.status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+def test_async_overlong_chunk_line():
+    with pytest.raises(RequestBodyError) as e:
+        read_async(b'1' * (MAX_CHUNK_LINE * 2) + b'\r\n', CHUNKED)
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+
+def test_async_negative_chunk_size():
+    with pytest.raises(RequestBodyError) as e:
+        read_async(b'-1\r\n' + b'x' * 2000, CHUNKED)
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+    assert e.value.message == "Malformed chunk size"